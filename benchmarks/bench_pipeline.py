@@ -0,0 +1,449 @@
+"""
+No Cap BookBot - Pipeline Benchmark
+
+Runs books through the whole pipeline (extraction, cleanup, stats, chunking and
+every summarization stage) against a local mock OpenAI server, and reports end-to-end
+latency, throughput, peak memory and LLM calls per book. Nothing leaves the
+machine, so it runs offline in CI.
+
+Synthetic books are swept across sizes and extracted from TXT, EPUB and PDF
+versions; the sample library's real excerpts, and any books in --fixtures, are
+run as well. Each run happens in a fresh process so peak RSS belongs to that
+book alone.
+
+Results can be saved with --output and compared against a saved baseline with
+--baseline, which exits non-zero when a case gets slower or makes more LLM calls
+than allowed.
+
+Usage:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sizes 10000,100000 --repeat 1 --output bench.json
+    python -m benchmarks.bench_pipeline --baseline bench.json --max-slowdown 1.25
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.fixtures import (
+    make_epub,
+    make_pdf,
+    sample_library,
+    synthetic_book,
+    write_fixture,
+)
+from benchmarks.mock_server import MockLLMServer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+logger = logging.getLogger("bench_pipeline")
+
+DEFAULT_SIZES = [10_000, 100_000, 500_000, 2_000_000]
+DEFAULT_FORMATS = [".txt", ".epub", ".pdf"]
+BENCH_RATE_LIMIT = 1e9  # Requests and tokens per minute; the mock server is the limit
+
+
+def run_case(
+    path: str,
+    base_url: str,
+    max_concurrency: int,
+    max_chunk_tokens: Optional[int],
+    hedge_budget: float = 0.0,
+) -> Dict:
+    """
+    Run one book through the pipeline. Runs in a fresh worker process.
+
+    Args:
+        path: Path to the book file.
+        base_url: Mock server endpoint.
+        max_concurrency: Chunk summaries requested at once.
+        max_chunk_tokens: Chunk size override, or None for the default.
+        hedge_budget: Share of requests that may be hedged; 0 turns hedging off.
+
+    Returns:
+        Dict: Stage timings in seconds, word count, requests, tokens removed
+            by cleanup and peak RSS.
+    """
+    import src.extract as extract
+    import src.stats as stats
+    from src.BookSummarizer import BookSummarizer
+    from src.chunking import join_text
+    from src.cleanup import CleanupReport, clean_pieces
+    from src.hedging import HedgePolicy
+    from src.metrics import Metrics
+    from src.prompt import GENZ_PROMPT
+    from src.scheduler import RequestScheduler
+
+    metrics = Metrics()
+    summarizer = BookSummarizer(
+        "benchmark",
+        max_concurrency=max_concurrency,
+        base_url=base_url,
+        scheduler=RequestScheduler(
+            BENCH_RATE_LIMIT, BENCH_RATE_LIMIT, base_delay=0.01, max_delay=0.1
+        ),
+        metrics=metrics,
+        hedging=HedgePolicy(budget_ratio=hedge_budget) if hedge_budget > 0 else None,
+    )
+    if max_chunk_tokens:
+        summarizer.max_chunk_tokens = max_chunk_tokens
+
+    with metrics.activate():
+        started = time.perf_counter()
+        pieces = list(extract.iter_text_from_file(path, sections=True))
+        extracted = time.perf_counter()
+        report = CleanupReport(summarizer.model)
+        pieces = list(clean_pieces(pieces, report))
+        cleaned = time.perf_counter()
+        profile = stats.get_text_profile(join_text(pieces))
+        profiled = time.perf_counter()
+        summarizer.process_stream(pieces, GENZ_PROMPT)
+        finished = time.perf_counter()
+
+    return {
+        "words": profile.word_count,
+        "extract_seconds": extracted - started,
+        "cleanup_seconds": cleaned - extracted,
+        "stats_seconds": profiled - cleaned,
+        "summarize_seconds": finished - profiled,
+        "total_seconds": finished - started,
+        "requests": metrics.totals()["requests"],
+        "hedged": metrics.totals()["hedged"],
+        "tokens_saved": report.tokens_saved,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of a list of values.
+
+    Args:
+        values: The samples.
+        fraction: Percentile as a fraction (e.g., 0.95).
+
+    Returns:
+        float: The percentile, or 0.0 for no samples.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * fraction // 1))
+    return ordered[int(rank) - 1]
+
+
+def build_cases(
+    directory: str, sizes: List[int], formats: List[str], fixtures: Optional[str]
+) -> List[Tuple[str, str]]:
+    """
+    Write the benchmark books to disk.
+
+    Args:
+        directory: Where to write generated books.
+        sizes: Word counts of the synthetic books.
+        formats: File extensions to generate synthetic books in.
+        fixtures: Optional directory of real books to include as they are.
+
+    Returns:
+        List[Tuple[str, str]]: (case name, file path) for every book.
+    """
+    cases = []
+    builders = {
+        ".txt": lambda text, title: text.encode("utf-8"),
+        ".epub": make_epub,
+        ".pdf": make_pdf,
+    }
+
+    for size in sizes:
+        text = synthetic_book(size, seed=size)
+        for extension in formats:
+            name = f"synthetic-{size}{extension}"
+            logger.info("Generating %s", name)
+            cases.append(
+                (name, write_fixture(directory, name, builders[extension](text, name)))
+            )
+
+    library = "\n\n\n".join(
+        f"{title}\n\n{text}" for title, text in sample_library().items()
+    )
+    for extension in (".epub", ".pdf"):
+        name = f"sample-library{extension}"
+        cases.append(
+            (name, write_fixture(directory, name, builders[extension](library, name)))
+        )
+
+    if fixtures:
+        from summarize_library import find_books
+
+        for path in find_books(fixtures):
+            cases.append((os.path.relpath(path, fixtures), path))
+
+    return cases
+
+
+def run_benchmarks(args: argparse.Namespace) -> List[Dict]:
+    """
+    Run every case against a mock server and summarize the samples.
+
+    Args:
+        args: Parsed command-line arguments.
+
+    Returns:
+        List[Dict]: One result row per case.
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bookbot-bench-") as directory, MockLLMServer(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        slow_rate=args.slow_rate,
+        slow_factor=args.slow_factor,
+    ) as server:
+        cases = build_cases(directory, args.sizes, args.formats, args.fixtures)
+        context = multiprocessing.get_context("spawn")
+
+        for name, path in cases:
+            server.reset()
+            runs = []
+            for _ in range(args.repeat):
+                # A fresh process per run, so peak RSS is this book's alone
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    runs.append(
+                        pool.submit(
+                            run_case,
+                            path,
+                            server.url,
+                            args.max_concurrency,
+                            args.max_chunk_tokens,
+                            args.hedge_budget,
+                        ).result()
+                    )
+
+            totals = [run["total_seconds"] for run in runs]
+            words = runs[0]["words"]
+            request_times = server.service_times()
+            row = {
+                "case": name,
+                "words": words,
+                "p50_seconds": percentile(totals, 0.5),
+                "p95_seconds": percentile(totals, 0.95),
+                "words_per_second": words / percentile(totals, 0.5),
+                "extract_seconds": percentile([r["extract_seconds"] for r in runs], 0.5),
+                "cleanup_seconds": percentile([r["cleanup_seconds"] for r in runs], 0.5),
+                "stats_seconds": percentile([r["stats_seconds"] for r in runs], 0.5),
+                "summarize_seconds": percentile(
+                    [r["summarize_seconds"] for r in runs], 0.5
+                ),
+                "llm_calls": runs[0]["requests"],
+                "hedged": runs[0]["hedged"],
+                "tokens_saved": runs[0]["tokens_saved"],
+                "http_requests": server.request_count / args.repeat,
+                "request_p50_ms": percentile(request_times, 0.5) * 1000,
+                "request_p95_ms": percentile(request_times, 0.95) * 1000,
+                "peak_rss_mb": max(
+                    (r["peak_rss_bytes"] or 0 for r in runs), default=0
+                )
+                / 2**20,
+            }
+            results.append(row)
+            logger.info(
+                "%s: %.2fs p50, %.0f words/s, %d LLM calls",
+                name,
+                row["p50_seconds"],
+                row["words_per_second"],
+                row["llm_calls"],
+            )
+
+    return results
+
+
+def format_table(results: List[Dict]) -> str:
+    """
+    Lay out results as a plain-text table.
+
+    Args:
+        results: Result rows from `run_benchmarks`.
+
+    Returns:
+        str: The table.
+    """
+    header = (
+        f"{'case':<28} {'words':>9} {'p50 s':>8} {'p95 s':>8} {'words/s':>10} "
+        f"{'extract s':>9} {'clean s':>8} {'stats s':>8} {'LLM calls':>9} "
+        f"{'saved tok':>9} {'req p95 ms':>10} {'peak MB':>8}"
+    )
+    lines = [header, "-" * len(header)]
+    for row in results:
+        lines.append(
+            f"{row['case']:<28} {row['words']:>9} {row['p50_seconds']:>8.2f} "
+            f"{row['p95_seconds']:>8.2f} {row['words_per_second']:>10.0f} "
+            f"{row['extract_seconds']:>9.2f} {row['cleanup_seconds']:>8.2f} "
+            f"{row['stats_seconds']:>8.2f} {row['llm_calls']:>9} "
+            f"{row['tokens_saved']:>9} {row['request_p95_ms']:>10.1f} "
+            f"{row['peak_rss_mb']:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def compare_to_baseline(
+    results: List[Dict], baseline: List[Dict], max_slowdown: float
+) -> List[str]:
+    """
+    Find cases that regressed against a saved baseline.
+
+    A case regresses if its median time grows by more than `max_slowdown`
+    times, or if it needs more LLM calls than before.
+
+    Args:
+        results: Result rows from this run.
+        baseline: Result rows from the baseline run.
+        max_slowdown: Largest allowed ratio of new to old median time.
+
+    Returns:
+        List[str]: A description of each regression.
+    """
+    previous = {row["case"]: row for row in baseline}
+    regressions = []
+    for row in results:
+        before = previous.get(row["case"])
+        if before is None:
+            continue
+        ratio = row["p50_seconds"] / max(before["p50_seconds"], 1e-9)
+        if ratio > max_slowdown:
+            regressions.append(
+                f"{row['case']}: {before['p50_seconds']:.2f}s -> "
+                f"{row['p50_seconds']:.2f}s ({ratio:.2f}x)"
+            )
+        if row["llm_calls"] > before["llm_calls"]:
+            regressions.append(
+                f"{row['case']}: {before['llm_calls']} -> {row['llm_calls']} LLM calls"
+            )
+    return regressions
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(float(item)) for item in value.split(",") if item]
+
+
+def _extension_list(value: str) -> List[str]:
+    return [f".{item.strip().lstrip('.').lower()}" for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the summarization pipeline against a mock LLM server."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=_int_list,
+        default=DEFAULT_SIZES,
+        help="Comma-separated word counts of the synthetic books (default: 10k to 2M).",
+    )
+    parser.add_argument(
+        "--formats",
+        type=_extension_list,
+        default=DEFAULT_FORMATS,
+        help="Comma-separated formats to extract synthetic books from (default: txt,epub,pdf).",
+    )
+    parser.add_argument(
+        "--fixtures", help="Directory of real EPUB, PDF and TXT books to include."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per book (default: 3)."
+    )
+    parser.add_argument(
+        "--latency", type=float, default=50, help="Mock request latency in ms (default: 50)."
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=20, help="Latency jitter in ms (default: 20)."
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of mock requests that fail with 429 or 500 (default: 0).",
+    )
+    parser.add_argument(
+        "--slow-rate",
+        type=float,
+        default=0.0,
+        help="Share of mock requests that straggle (default: 0).",
+    )
+    parser.add_argument(
+        "--slow-factor",
+        type=float,
+        default=10.0,
+        help="How many times longer a straggler takes (default: 10).",
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=0.0,
+        help="Share of requests that may be hedged (default: 0, no hedging).",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Mock server seed.")
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=8,
+        help="Chunk summaries requested at once (default: 8).",
+    )
+    parser.add_argument(
+        "--max-chunk-tokens", type=int, help="Override the chunk size in tokens."
+    )
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    parser.add_argument(
+        "--baseline", help="Compare against results saved with --output."
+    )
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=1.25,
+        help="Largest allowed ratio of new to baseline median time (default: 1.25).",
+    )
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    args.repeat = max(1, args.repeat)
+
+    results = run_benchmarks(args)
+    print(format_table(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare_to_baseline(results, json.load(file), args.max_slowdown)
+        if regressions:
+            print("\nRegressions:\n" + "\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Book fixtures for No Cap BookBot benchmarks.
+
+Builds deterministic synthetic books of any length, plus EPUB and PDF versions
+of a text, so extraction and summarization can be benchmarked without shipping
+large binary files. The vocabulary comes from the sample library, which keeps
+word frequencies and sentence shapes close to real prose.
+"""
+
+import os
+import random
+import re
+import zipfile
+from io import BytesIO
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+
+import pymupdf
+
+from src.sample_books import sample_books
+
+WORDS_PER_CHAPTER = 3000
+WORDS_PER_PARAGRAPH = (40, 160)
+WORDS_PER_SENTENCE = (6, 24)
+PDF_CHARS_PER_LINE = 95
+PDF_LINES_PER_PAGE = 60
+
+_CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+
+def synthetic_book(word_count: int, seed: int = 0) -> str:
+    """
+    Generate a deterministic book of roughly `word_count` words.
+
+    The text has chapter headings, paragraphs and sentences, so chunking breaks
+    on the same boundaries it would in a real book.
+
+    Args:
+        word_count: Number of words in the book body.
+        seed: Seed for the word choices; the same seed gives the same book.
+
+    Returns:
+        str: The book text.
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary()
+    words = rng.choices(vocabulary, k=word_count)
+
+    chapters = []
+    for chapter_start in range(0, word_count, WORDS_PER_CHAPTER):
+        chapter_words = words[chapter_start : chapter_start + WORDS_PER_CHAPTER]
+        paragraphs = []
+        i = 0
+        while i < len(chapter_words):
+            paragraph_length = rng.randint(*WORDS_PER_PARAGRAPH)
+            paragraph_words = chapter_words[i : i + paragraph_length]
+            i += paragraph_length
+
+            sentences = []
+            j = 0
+            while j < len(paragraph_words):
+                sentence_length = rng.randint(*WORDS_PER_SENTENCE)
+                sentence = " ".join(paragraph_words[j : j + sentence_length])
+                j += sentence_length
+                sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+            paragraphs.append(" ".join(sentences))
+
+        number = chapter_start // WORDS_PER_CHAPTER + 1
+        chapters.append(f"Chapter {number}\n\n" + "\n\n".join(paragraphs))
+
+    return "\n\n\n".join(chapters)
+
+
+def sample_library() -> Dict[str, str]:
+    """
+    Get the real book excerpts from the sample library.
+
+    Returns:
+        Dict[str, str]: Text of each sample book, by title.
+    """
+    return {title: text for title, text in sample_books.items() if text.strip()}
+
+
+def make_epub(text: str, title: str = "Benchmark Book") -> bytes:
+    """
+    Package a text as a minimal EPUB, one XHTML document per chapter.
+
+    A navigation document lists each chapter under its first line, as the
+    table of contents of a real EPUB 3 book would.
+
+    Args:
+        text: The book text; chapters are separated by two or more blank lines.
+        title: Title recorded in the package metadata.
+
+    Returns:
+        bytes: The EPUB file.
+    """
+    chapters = [chapter for chapter in re.split(r"\n{3,}", text) if chapter.strip()]
+    manifest = [
+        '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml"'
+        ' properties="nav"/>'
+    ]
+    spine = []
+    toc = []
+
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+        archive.writestr("META-INF/container.xml", _CONTAINER_XML)
+
+        for number, chapter in enumerate(chapters, start=1):
+            name = f"chapter{number:04d}.xhtml"
+            paragraphs = "\n".join(
+                f"<p>{escape(paragraph.strip())}</p>"
+                for paragraph in chapter.split("\n\n")
+                if paragraph.strip()
+            )
+            archive.writestr(
+                f"OEBPS/{name}",
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml">'
+                f"<head><title>{escape(title)}</title></head>"
+                f"<body>\n{paragraphs}\n</body></html>",
+            )
+            manifest.append(
+                f'<item id="c{number}" href="{name}" media-type="application/xhtml+xml"/>'
+            )
+            spine.append(f'<itemref idref="c{number}"/>')
+            heading = chapter.strip().split("\n", 1)[0]
+            toc.append(f'<li><a href="{name}">{escape(heading[:80])}</a></li>')
+
+        archive.writestr(
+            "OEBPS/nav.xhtml",
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml"'
+            ' xmlns:epub="http://www.idpf.org/2007/ops">'
+            "<head><title>Contents</title></head>"
+            f'<body><nav epub:type="toc"><ol>{"".join(toc)}</ol></nav></body></html>',
+        )
+
+        archive.writestr(
+            "OEBPS/content.opf",
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f"<dc:title>{escape(title)}</dc:title></metadata>"
+            f"<manifest>{''.join(manifest)}</manifest>"
+            f"<spine>{''.join(spine)}</spine></package>",
+        )
+
+    return buffer.getvalue()
+
+
+def make_pdf(text: str, running_header: Optional[str] = None) -> bytes:
+    """
+    Typeset a text as a plain PDF with fixed-width lines and pages.
+
+    Chapters (separated by two or more blank lines) are bookmarked in the
+    outline under their first line.
+
+    Args:
+        text: The book text.
+        running_header: Optional line printed at the top of every page, which
+            also gets a page number at the bottom, like most printed books.
+
+    Returns:
+        bytes: The PDF file.
+    """
+    lines = []
+    bookmarks = []  # (line index, title) of each chapter start
+    blank_lines = 2  # The first line starts a chapter
+    for paragraph in text.split("\n"):
+        if not paragraph.strip():
+            blank_lines += 1
+        elif blank_lines >= 2:
+            bookmarks.append((len(lines), paragraph.strip()[:80]))
+            blank_lines = 0
+        else:
+            blank_lines = 0
+        lines.extend(_wrap(paragraph, PDF_CHARS_PER_LINE))
+
+    doc = pymupdf.open()
+    try:
+        for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+            page_lines = lines[start : start + PDF_LINES_PER_PAGE]
+            if running_header:
+                number = start // PDF_LINES_PER_PAGE + 1
+                page_lines = [running_header, *page_lines, str(number)]
+            page = doc.new_page()
+            page.insert_text((40, 40), "\n".join(page_lines), fontsize=8)
+        if len(bookmarks) > 1:
+            doc.set_toc(
+                [[1, title, line // PDF_LINES_PER_PAGE + 1] for line, title in bookmarks]
+            )
+        return doc.tobytes(garbage=1, deflate=True)
+    finally:
+        doc.close()
+
+
+def write_fixture(directory: str, name: str, data: bytes) -> str:
+    """
+    Write a fixture file, returning its path.
+
+    Args:
+        directory: Directory to write into.
+        name: File name, including the extension that selects the parser.
+        data: File contents.
+
+    Returns:
+        str: Path of the written file.
+    """
+    path = os.path.join(directory, name)
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
+
+
+def _vocabulary() -> List[str]:
+    """Every word in the sample library, with repeats, in reading order."""
+    text = " ".join(sample_library().values())
+    return re.findall(r"[A-Za-z']+", text)
+
+
+def _wrap(paragraph: str, width: int) -> List[str]:
+    """Greedily wrap a paragraph into lines of at most `width` characters."""
+    lines = []
+    line = ""
+    for word in paragraph.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return lines
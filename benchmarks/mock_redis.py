@@ -0,0 +1,199 @@
+"""
+Mock Redis server for No Cap BookBot benchmarks.
+
+A local in-memory stand-in for the shared result store: it answers the handful
+of commands `RedisStorage` sends (PING, AUTH, SELECT, GET and SET with EX) over
+the Redis protocol, so shared storage can be exercised offline without
+installing Redis. Values live in memory and are lost when the server stops.
+
+Usage:
+    python -m benchmarks.mock_redis --port 6379
+    BOOKBOT_STORAGE_URL=redis://127.0.0.1:6379/0 streamlit run main.py
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class MockRedisServer:
+    """
+    Threaded Redis-compatible server running in the background.
+
+    Attributes:
+        password: Password clients must AUTH with, or None for no password.
+        url: URL to pass to `open_storage`, once started.
+        command_count: Commands received, including failed ones.
+        connection_count: Client connections accepted.
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, password: Optional[str] = None
+    ):
+        """
+        Configure the server; call `start` (or use it as a context manager) to run it.
+
+        Args:
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free one.
+            password: Optional password clients must AUTH with.
+        """
+        self.password = password
+        self.command_count = 0
+        self.connection_count = 0
+        # (database, key) -> (value, expiry time or None)
+        self._data: Dict[Tuple[int, bytes], Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(
+            (host, port), _make_handler(self)
+        )
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}{host}:{port}/0"
+
+    def start(self) -> "MockRedisServer":
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mock-redis", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def keys(self, db: int = 0) -> List[str]:
+        """Keys currently stored in a database, in insertion order."""
+        with self._lock:
+            return [key.decode("utf-8") for d, key in self._data if d == db]
+
+    def __enter__(self) -> "MockRedisServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _get(self, db: int, key: bytes) -> Optional[bytes]:
+        with self._lock:
+            value, expires = self._data.get((db, key), (None, None))
+            if expires is not None and expires <= time.monotonic():
+                del self._data[(db, key)]
+                return None
+            return value
+
+    def _set(self, db: int, key: bytes, value: bytes, ttl: Optional[int]) -> None:
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[(db, key)] = (value, expires)
+
+
+def _make_handler(server: MockRedisServer) -> type:
+    """Build a request handler class bound to a server's data."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            with server._lock:
+                server.connection_count += 1
+            db = 0
+            authenticated = server.password is None
+            while True:
+                try:
+                    command = self._read_command()
+                except (ValueError, OSError):
+                    return
+                if command is None:
+                    return
+                with server._lock:
+                    server.command_count += 1
+
+                name = command[0].upper() if command else b""
+                args = command[1:]
+                if name == b"AUTH" and len(args) == 1:
+                    authenticated = args[0].decode("utf-8") == server.password
+                    self._reply_status_or_error(
+                        authenticated, "WRONGPASS invalid password"
+                    )
+                elif not authenticated:
+                    self._write(b"-NOAUTH Authentication required.\r\n")
+                elif name == b"PING":
+                    self._write(b"+PONG\r\n")
+                elif name == b"SELECT" and len(args) == 1 and args[0].isdigit():
+                    db = int(args[0])
+                    self._write(b"+OK\r\n")
+                elif name == b"GET" and len(args) == 1:
+                    self._write_bulk(server._get(db, args[0]))
+                elif name == b"SET" and len(args) in (2, 4):
+                    ttl = None
+                    if len(args) == 4:
+                        if args[2].upper() != b"EX" or not args[3].isdigit():
+                            self._write(b"-ERR syntax error\r\n")
+                            continue
+                        ttl = int(args[3])
+                    server._set(db, args[0], args[1], ttl)
+                    self._write(b"+OK\r\n")
+                else:
+                    message = (
+                        f"-ERR unsupported command '{name.decode('utf-8', 'replace')}'"
+                    )
+                    self._write(message.encode("utf-8") + b"\r\n")
+
+        def _read_command(self) -> Optional[List[bytes]]:
+            """Read one command as an array of bulk strings; None at end of stream."""
+            line = self.rfile.readline()
+            if not line:
+                return None
+            if not line.startswith(b"*"):
+                return line.split()  # Inline command, as typed into telnet
+            arguments = []
+            for _ in range(int(line[1:])):
+                header = self.rfile.readline()
+                if not header.startswith(b"$"):
+                    raise ValueError("Expected a bulk string")
+                length = int(header[1:])
+                arguments.append(self.rfile.read(length + 2)[:-2])
+            return arguments
+
+        def _reply_status_or_error(self, ok: bool, error: str):
+            self._write(b"+OK\r\n" if ok else f"-{error}\r\n".encode("utf-8"))
+
+        def _write_bulk(self, value: Optional[bytes]):
+            if value is None:
+                self._write(b"$-1\r\n")
+            else:
+                self._write(f"${len(value)}\r\n".encode("ascii") + value + b"\r\n")
+
+        def _write(self, data: bytes):
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a mock Redis server for the shared result store."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--password", default=None)
+    args = parser.parse_args()
+
+    server = MockRedisServer(args.host, args.port, args.password)
+    print(f"Mock Redis listening on {server.url}")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+"""
+Mock OpenAI-compatible server for No Cap BookBot benchmarks.
+
+Answers `POST /v1/chat/completions` (plain and streaming) with a short canned
+summary after a configurable delay, makes a configurable share of requests
+stragglers that take several times longer, and fails a configurable share of
+requests with 429 or 500 errors, so the full pipeline can be benchmarked offline without
+spending anything. Usage is reported from a character-based token estimate.
+
+The Batch API is mocked too: input files are uploaded to `/v1/files`, jobs are
+created and polled at `/v1/batches`, and results are read back from
+`/v1/files/{id}/content`. A job moves one status further each time it is
+polled, so `--batch` runs of the library tool go through a few polls as well.
+
+Usage:
+    python -m benchmarks.mock_server --port 8000 --latency 200 --jitter 50
+    python summarize_library.py books/ --base-url http://127.0.0.1:8000/v1
+    python summarize_library.py books/ --batch --base-url http://127.0.0.1:8000/v1
+"""
+
+import argparse
+import email.parser
+import email.policy
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from src.chunking import CHARS_PER_TOKEN
+
+COMPLETIONS_PATH = "/v1/chat/completions"
+FILES_PATH = "/v1/files"
+BATCHES_PATH = "/v1/batches"
+WORDS_PER_STREAM_DELTA = 4
+
+
+class MockLLMServer:
+    """
+    Threaded OpenAI-compatible server running in the background.
+
+    Attributes:
+        latency: Mean seconds spent on each request before answering.
+        jitter: Most seconds added to or taken from `latency`, uniformly.
+        error_rate: Share of requests answered with an error (0.0 to 1.0).
+        slow_rate: Share of requests that are stragglers (0.0 to 1.0).
+        slow_factor: How many times longer than usual a straggler takes.
+        url: Base URL to pass as the client's `base_url`, once started.
+        request_count: Requests received, including failed ones and each
+            request inside a batch job.
+        error_count: Requests answered with an injected error.
+        batches_created: Batch jobs created.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        slow_rate: float = 0.0,
+        slow_factor: float = 10.0,
+    ):
+        """
+        Configure the server; call `start` (or use it as a context manager) to run it.
+
+        Args:
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free one.
+            latency: Mean seconds spent on each request before answering.
+            jitter: Most seconds added to or taken from `latency`, uniformly.
+            error_rate: Share of requests answered with an error (0.0 to 1.0).
+            seed: Seed for latency and error draws, for repeatable runs.
+            slow_rate: Share of requests that are stragglers (0.0 to 1.0).
+            slow_factor: How many times longer than usual a straggler takes.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.request_count = 0
+        self.error_count = 0
+        self.batches_created = 0
+        self._service_times: List[float] = []
+        self._files: Dict[str, Tuple[dict, bytes]] = {}
+        self._batches: Dict[str, dict] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="mock-llm", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset(self) -> None:
+        """Zero the request counters and recorded service times."""
+        with self._lock:
+            self.request_count = 0
+            self.error_count = 0
+            self._service_times = []
+
+    def service_times(self) -> List[float]:
+        """Seconds each successful request took to answer, in arrival order."""
+        with self._lock:
+            return list(self._service_times)
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _draw(self) -> Tuple[float, bool]:
+        """Count a request and decide its delay and whether it fails."""
+        with self._lock:
+            self.request_count += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            if self.slow_rate and self._random.random() < self.slow_rate:
+                delay *= self.slow_factor
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.error_count += 1
+            return delay, fail
+
+    def _record(self, seconds: float) -> None:
+        with self._lock:
+            self._service_times.append(seconds)
+
+    def _complete(self, request: dict) -> dict:
+        """Build the chat completion answering a request."""
+        prompt = "".join(
+            str(message.get("content", "")) for message in request.get("messages", [])
+        )
+        content = _canned_summary(len(prompt), request.get("max_tokens") or 100)
+        usage = {
+            "prompt_tokens": -(-len(prompt) // CHARS_PER_TOKEN),
+            "completion_tokens": -(-len(content) // CHARS_PER_TOKEN),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    def _add_file(self, name: str, purpose: str, data: bytes) -> dict:
+        """Store a file and return its file object."""
+        with self._lock:
+            file = {
+                "id": f"file-mock-{len(self._files) + 1}",
+                "object": "file",
+                "bytes": len(data),
+                "created_at": int(time.time()),
+                "filename": name,
+                "purpose": purpose,
+                "status": "processed",
+            }
+            self._files[file["id"]] = (file, data)
+            return file
+
+    def _file_content(self, file_id: str) -> Optional[bytes]:
+        with self._lock:
+            file = self._files.get(file_id)
+        return None if file is None else file[1]
+
+    def _create_batch(self, request: dict) -> Optional[dict]:
+        """Create a batch job for an uploaded input file; None if there is none."""
+        if self._file_content(request.get("input_file_id", "")) is None:
+            return None
+        with self._lock:
+            self.batches_created += 1
+            batch = {
+                "id": f"batch-mock-{self.batches_created}",
+                "object": "batch",
+                "endpoint": request.get("endpoint", COMPLETIONS_PATH),
+                "errors": None,
+                "input_file_id": request["input_file_id"],
+                "completion_window": request.get("completion_window", "24h"),
+                "status": "validating",
+                "output_file_id": None,
+                "error_file_id": None,
+                "created_at": int(time.time()),
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            self._batches[batch["id"]] = batch
+            return dict(batch)
+
+    def _poll_batch(self, batch_id: str) -> Optional[dict]:
+        """Move a batch job one status further and return it; None if unknown."""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+            if batch["status"] == "validating":
+                batch["status"] = "in_progress"
+                return dict(batch)
+            if batch["status"] != "in_progress":
+                return dict(batch)
+
+        outputs, errors = [], []
+        for line in self._file_content(batch["input_file_id"]).splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            _, fail = self._draw()
+            if fail:
+                errors.append(
+                    {
+                        "id": f"batch-req-{len(outputs) + len(errors)}",
+                        "custom_id": record["custom_id"],
+                        "response": None,
+                        "error": {"code": "server_error", "message": "Server error"},
+                    }
+                )
+                continue
+            outputs.append(
+                {
+                    "id": f"batch-req-{len(outputs) + len(errors)}",
+                    "custom_id": record["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "request_id": "req-mock",
+                        "body": self._complete(record["body"]),
+                    },
+                    "error": None,
+                }
+            )
+
+        def jsonl(records: List[dict]) -> bytes:
+            return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+        output_file = self._add_file("output.jsonl", "batch_output", jsonl(outputs))
+        error_file = (
+            self._add_file("errors.jsonl", "batch_output", jsonl(errors))
+            if errors
+            else None
+        )
+        with self._lock:
+            batch.update(
+                status="completed",
+                output_file_id=output_file["id"],
+                error_file_id=error_file["id"] if error_file else None,
+                request_counts={
+                    "total": len(outputs) + len(errors),
+                    "completed": len(outputs),
+                    "failed": len(errors),
+                },
+            )
+            return dict(batch)
+
+
+def _make_handler(server: MockLLMServer) -> type:
+    """Build a request handler class bound to a server's settings."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+        def do_POST(self):
+            started = time.perf_counter()
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            path = self.path.split("?")[0].rstrip("/")
+            if path == FILES_PATH:
+                self._upload(body)
+            elif path == BATCHES_PATH:
+                batch = server._create_batch(json.loads(body or b"{}"))
+                if batch is None:
+                    self._send_json(404, {"error": {"message": "No such file"}})
+                else:
+                    self._send_json(200, batch)
+            elif path == COMPLETIONS_PATH:
+                self._chat_completion(json.loads(body or b"{}"), started)
+            else:
+                self._send_json(404, {"error": {"message": "Not found"}})
+
+        def do_GET(self):
+            path = self.path.split("?")[0].rstrip("/")
+            found = None
+            if path.startswith(FILES_PATH + "/") and path.endswith("/content"):
+                found = server._file_content(path[len(FILES_PATH) + 1 : -len("/content")])
+                if found is not None:
+                    self._send_bytes(200, found, "application/octet-stream")
+            elif path.startswith(BATCHES_PATH + "/"):
+                found = server._poll_batch(path[len(BATCHES_PATH) + 1 :])
+                if found is not None:
+                    self._send_json(200, found)
+            if found is None:
+                self._send_json(404, {"error": {"message": "Not found"}})
+
+        def _chat_completion(self, request: dict, started: float):
+            delay, fail = server._draw()
+            time.sleep(delay)
+
+            if fail:
+                # Alternate the two error kinds the scheduler retries
+                if server.error_count % 2:
+                    self._send_json(
+                        429,
+                        {"error": {"message": "Rate limited", "type": "requests"}},
+                        {"retry-after-ms": "10"},
+                    )
+                else:
+                    self._send_json(500, {"error": {"message": "Server error"}})
+                return
+
+            completion = server._complete(request)
+            if request.get("stream"):
+                include_usage = (request.get("stream_options") or {}).get("include_usage")
+                self._send_stream(
+                    request,
+                    completion["choices"][0]["message"]["content"],
+                    completion["usage"] if include_usage else None,
+                )
+            else:
+                self._send_json(200, completion)
+            server._record(time.perf_counter() - started)
+
+        def _upload(self, body: bytes):
+            """Store a file sent as multipart/form-data, like `files.create`."""
+            header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n"
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                header.encode("latin-1") + body
+            )
+            fields, name, data = {}, "upload", None
+            for part in message.iter_parts():
+                if part.get_filename() is not None:
+                    name, data = part.get_filename(), part.get_payload(decode=True)
+                else:
+                    field = part.get_param("name", header="content-disposition")
+                    fields[field] = part.get_payload(decode=True).decode("utf-8")
+            if data is None:
+                self._send_json(400, {"error": {"message": "No file uploaded"}})
+                return
+            self._send_json(200, server._add_file(name, fields.get("purpose", ""), data))
+
+        def _send_json(
+            self, status: int, payload: dict, headers: Optional[dict] = None
+        ):
+            data = json.dumps(payload).encode("utf-8")
+            self._send_bytes(status, data, "application/json", headers)
+
+        def _send_bytes(
+            self, status: int, data: bytes, content_type: str, headers: dict = None
+        ):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, request: dict, content: str, usage: Optional[dict]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def event(choices: list, usage: Optional[dict] = None):
+                payload = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": choices,
+                }
+                if usage is not None:
+                    payload["usage"] = usage
+                self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+            words = content.split(" ")
+            for i in range(0, len(words), WORDS_PER_STREAM_DELTA):
+                piece = " ".join(words[i : i + WORDS_PER_STREAM_DELTA])
+                delta = {"content": piece if i == 0 else " " + piece}
+                event([{"index": 0, "delta": delta, "finish_reason": None}])
+            event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if usage is not None:
+                event([], usage)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+    return Handler
+
+
+def _canned_summary(prompt_chars: int, max_tokens: int) -> str:
+    """
+    Build a deterministic stand-in summary for a prompt.
+
+    The summary is about a third of `max_tokens` long, so later stages see
+    realistically sized inputs.
+
+    Args:
+        prompt_chars: Length of the prompt in characters.
+        max_tokens: The request's output limit.
+
+    Returns:
+        str: The summary text.
+    """
+    sentence = f"The story so far covers {prompt_chars} characters of plot, no cap."
+    repeats = max(1, max_tokens * CHARS_PER_TOKEN // 3 // len(sentence))
+    return " ".join([sentence] * repeats)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a mock OpenAI-compatible server for benchmarks."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--latency", type=float, default=50, help="Mean milliseconds per request."
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0, help="Milliseconds of uniform jitter."
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of requests that fail."
+    )
+    parser.add_argument(
+        "--slow-rate", type=float, default=0.0, help="Share of requests that straggle."
+    )
+    parser.add_argument(
+        "--slow-factor",
+        type=float,
+        default=10.0,
+        help="How many times longer a straggler takes.",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        args.host,
+        args.port,
+        args.latency / 1000,
+        args.jitter / 1000,
+        args.error_rate,
+        args.seed,
+        args.slow_rate,
+        args.slow_factor,
+    )
+    print(f"Mock OpenAI API listening on {server.url}")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,29 @@ and contemporary literature using OpenAI's GPT models. Upload EPUB, PDF, or TXT
 files to get summaries that actually hit different.
 """
 
+import functools
+import hashlib
+import time
+import uuid
+from typing import Iterable, Iterator, Optional, Tuple
+
 import streamlit as st
 
 import src.extract as extract
 import src.stats as stats
 from src.BookSummarizer import BookSummarizer
+from src.chunking import Piece
+from src.cleanup import CleanupReport, clean_text
+from src.clients import hash_api_key
+from src.hedging import process_hedge_policy
+from src.jobs import Job, JobManager, JobProgress, JobStatus, make_job_id
+from src.metrics import Metrics, process_metrics
 from src.prompt import GENZ_PROMPT
 from src.sample_books import sample_books
+from src.scheduler import RateLimitedError, RequestError, RequestScheduler
+from src.storage import Storage, open_storage
+
+JOB_POLL_SECONDS = 0.5  # How often a running analysis refreshes the page
 
 st.set_page_config(
     page_title="No Cap BookBot 📚",
@@ -24,20 +40,344 @@ st.set_page_config(
 )
 
 
-def summarize(book_text: str, api_key: str, genz_prompt: str) -> str:
+@st.cache_resource
+def get_storage() -> Storage:
+    """
+    Get the process-wide result store shared by every session.
+
+    Returns:
+        Storage: The store named by `BOOKBOT_STORAGE_URL`, or the local SQLite
+            file if it's unset.
     """
-    Generate a Gen Z-style summary of a book using AI.
+    return open_storage()
+
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """
+    Get the process-wide job manager, so analyses outlive script reruns.
+
+    Returns:
+        JobManager: The manager running every session's analyses.
+    """
+    return JobManager()
+
+
+@st.cache_resource
+def get_request_scheduler(api_key_hash: str) -> RequestScheduler:
+    """
+    Get the request scheduler shared by every session using the same API key.
+
+    Rate limits belong to the account, so sessions with the same key are paced
+    together.
 
     Args:
+        api_key_hash: SHA-256 of the API key, so the key itself is never stored.
+
+    Returns:
+        RequestScheduler: The scheduler for that key.
+    """
+    return RequestScheduler()
+
+
+def get_summarizer(
+    api_key: str, metrics: Optional[Metrics] = None
+) -> BookSummarizer:
+    """
+    Create a summarizer that shares the process-wide store, scheduler, hedging
+    policy and OpenAI client.
+
+    Args:
+        api_key: OpenAI API key for authentication.
+        metrics: Optional collector for this analysis's stage metrics.
+
+    Returns:
+        BookSummarizer: A summarizer for this session.
+    """
+    return BookSummarizer(
+        api_key,
+        cache=get_storage(),
+        scheduler=get_request_scheduler(hash_api_key(api_key)),
+        metrics=metrics,
+        hedging=process_hedge_policy(),
+    )
+
+
+def run_text_analysis(job: Job, summarizer: BookSummarizer, book_text: str):
+    """
+    Job task: summarize pasted or sample text. Runs on a job worker.
+
+    Boilerplate such as license text is stripped before summarizing.
+
+    Args:
+        job: The job to report progress and results on.
+        summarizer: The summarizer for the user's API key.
         book_text: The complete text of the book to summarize.
+    """
+    job.details["metrics"] = summarizer.metrics
+    job.details["cleanup"] = report = CleanupReport(summarizer.model)
+    summarizer.cancellation = job.cancellation
+    with summarizer.metrics.span("analysis"):
+        book_text = clean_text(book_text, report)
+        job.details["stats"] = compute_stats(book_text)
+        summary_stream = summarizer.process_book(
+            book_text, GENZ_PROMPT, stream=True, progress=JobProgress(job)
+        )
+        job.deltas.extend(summary_stream)
+
+
+def run_upload_analysis(job: Job, summarizer: BookSummarizer, uploaded_file):
+    """
+    Job task: summarize an uploaded book while it is being read.
+
+    The file is extracted and cleaned of boilerplate page by page (or chapter by
+    chapter), and chunks are sent to the model as soon as they fill, so parsing
+    overlaps with summarization. The extracted text is cached, and the stats are
+    shown, once the file has been read.
+
+    Args:
+        job: The job to report progress and results on.
+        summarizer: The summarizer for the user's API key.
+        uploaded_file: Streamlit UploadedFile object containing the book.
+
+    Raises:
+        extract.ExtractionError: If the file cannot be read.
+    """
+    job.details["metrics"] = summarizer.metrics
+    job.details["cleanup"] = report = CleanupReport(summarizer.model)
+    summarizer.cancellation = job.cancellation
+    # Extraction records its timings on the active collector
+    with summarizer.metrics.activate(), summarizer.metrics.span("analysis"):
+        pieces = extract.iter_text_from_upload(uploaded_file, report, summarizer.cache)
+        summary_stream = summarizer.process_stream(
+            publish_stats(job, pieces),
+            GENZ_PROMPT,
+            stream=True,
+            progress=JobProgress(job),
+        )
+        job.deltas.extend(summary_stream)
+
+
+def publish_stats(job: Job, pieces: Iterable[Piece]) -> Iterator[Piece]:
+    """
+    Pass a book's pieces through, and publish its stats once all are read.
+
+    The stats are computed from the pieces themselves rather than the
+    extraction cache, which may already have evicted (or never stored) a
+    large book, and they show up while its sections are still being
+    summarized.
+
+    Args:
+        job: The job to publish the stats on.
+        pieces: Consecutive pieces of the book text, possibly with markers.
+
+    Yields:
+        Piece: The same pieces.
+    """
+    text = []
+    for piece in pieces:
+        if isinstance(piece, str):
+            text.append(piece)
+        yield piece
+    job.details["stats"] = compute_stats("".join(text))
+
+
+def start_analysis(final_text: str, uploaded_file, api_key: str, watcher: str) -> Job:
+    """
+    Start analyzing a book in the background, or attach to the same analysis.
+
+    Jobs are identified by the book's content, the prompt, the model and the
+    API key, so clicking Analyze again (or in another tab) doesn't redo work.
+
+    Args:
+        final_text: The book text, used when nothing is uploaded.
+        uploaded_file: Streamlit UploadedFile object, or None for pasted text.
+        api_key: OpenAI API key for authentication.
+        watcher: ID of the session starting the analysis.
+
+    Returns:
+        Job: The running (or finished) analysis.
+    """
+    summarizer = get_summarizer(api_key, Metrics(parent=process_metrics()))
+    if uploaded_file is not None:
+        content = uploaded_file.getvalue()
+        task = functools.partial(
+            run_upload_analysis, summarizer=summarizer, uploaded_file=uploaded_file
+        )
+    else:
+        content = final_text.encode("utf-8")
+        task = functools.partial(
+            run_text_analysis, summarizer=summarizer, book_text=final_text
+        )
+
+    job_id = make_job_id(
+        hashlib.sha256(content).hexdigest(),
+        GENZ_PROMPT,
+        summarizer.model,
+        hash_api_key(api_key),
+    )
+    return get_job_manager().submit(job_id, task, watcher)
+
+
+def analysis_input(final_text: str, uploaded_file, api_key: str) -> str:
+    """
+    Fingerprint what an analysis would be run on, to notice when it changes.
+
+    Args:
+        final_text: The book text, used when nothing is uploaded.
+        uploaded_file: Streamlit UploadedFile object, or None for pasted text.
         api_key: OpenAI API key for authentication.
-        genz_prompt: Custom prompt defining the Gen Z transformation style.
 
     Returns:
-        str: The Gen Z-style summary of the book.
+        str: Hash of the book content and the API key.
     """
-    summarizer = BookSummarizer(api_key)
-    return summarizer.process_book(book_text, genz_prompt)
+    content = (
+        uploaded_file.getvalue()
+        if uploaded_file is not None
+        else final_text.encode("utf-8")
+    )
+    return make_job_id(hashlib.sha256(content).hexdigest(), hash_api_key(api_key))
+
+
+def compute_stats(book_text: str) -> Tuple[int, str]:
+    """
+    Compute the text statistics shown alongside the summary.
+
+    Args:
+        book_text: The complete text of the book.
+
+    Returns:
+        Tuple[int, str]: The word count and the formatted most common words.
+    """
+    return stats.get_word_count(book_text), stats.get_common_words(book_text)
+
+
+def render_stats(word_count: int, common_words: str):
+    """
+    Display the word count, reading time and most common words.
+
+    Args:
+        word_count: Total number of words in the book.
+        common_words: Formatted markdown list of the most common words.
+    """
+    st.subheader("📈 Basic Stats")
+
+    stats_col1, stats_col2 = st.columns(2)
+    with stats_col1:
+        st.metric("📝 Total Words", f"{word_count:,}")
+
+    with stats_col2:
+        st.metric("📚 Estimated Reading Time", f"{word_count // 200} minutes")
+
+    # Word frequency section
+    st.subheader("🔤 Most Common Words")
+    st.markdown(common_words)
+
+
+def show_request_error(error: RequestError):
+    """
+    Explain a failed summary request to the user.
+
+    Args:
+        error: The error raised by the summarizer.
+    """
+    if isinstance(error, RateLimitedError):
+        st.error(
+            "❌ OpenAI is rate limiting us rn, even after a few retries. Give it a minute and try again, no cap."
+        )
+    else:
+        st.error(f"❌ Oops fam, the AI summary failed ({str(error)}). Try again in a bit.")
+
+
+def render_metrics(metrics: Metrics):
+    """
+    Display per-stage timings, token usage and cost for debugging.
+
+    Args:
+        metrics: The analysis's metrics collector.
+    """
+    with st.expander("🐞 Debug metrics"):
+        totals = metrics.totals()
+        st.caption(
+            f"{totals['requests']} requests, {totals['cache_hits']} cache hits, "
+            f"{totals['coalesced']} shared with other sessions, "
+            f"{totals['hedged']} hedged, "
+            f"{totals['prompt_tokens']:,} prompt tokens "
+            f"({totals['cached_tokens']:,} cached), "
+            f"{totals['completion_tokens']:,} completion tokens, "
+            f"~${totals['cost_usd']:.4f}"
+        )
+        st.dataframe(metrics.rows(), use_container_width=True)
+        st.caption("Process totals (Prometheus format)")
+        st.code(process_metrics().to_prometheus(), language="text")
+
+
+def render_job(job: Job, debug: bool = False):
+    """
+    Display an analysis job: progress and partial summary while it runs, then
+    the Gen Z summary, stats and share section.
+
+    Args:
+        job: The job to display.
+        debug: Whether to show the debug metrics panel.
+    """
+    # The job keeps running while this renders, so draw one consistent state
+    status = job.status
+    if debug and "metrics" in job.details:
+        render_metrics(job.details["metrics"])
+
+    summary_section = st.container()
+    stats_section = st.container()
+
+    with summary_section:
+        if status == JobStatus.CANCELLED:
+            st.warning(
+                "🛑 This analysis got dropped before it finished. Smash analyze again and it picks up where it left off, no cap."
+            )
+            return
+
+        if status == JobStatus.FAILED:
+            if isinstance(job.error, extract.ExtractionError):
+                st.error(
+                    f"❌ Could not read the file ({str(job.error)}). Make sure it's a valid text file, or we're so cooked."
+                )
+            elif isinstance(job.error, RequestError):
+                show_request_error(job.error)
+            else:
+                st.error(f"❌ Oops fam, something broke ({str(job.error)}).")
+            return
+
+        if status == JobStatus.DONE:
+            st.success("✨ Analysis complete! Here's the tea:")
+        else:
+            st.progress(job.progress)
+            st.text(job.message or "Say less, let me cook... 👨🏻‍🍳🔥")
+
+        if job.deltas:
+            st.subheader("🎭 Gen Z Summary")
+            st.markdown(f"*{job.summary.strip()}*")
+
+    if "stats" in job.details:
+        with stats_section:
+            render_stats(*job.details["stats"])
+            tokens_saved = job.details["cleanup"].tokens_saved
+            if tokens_saved:
+                st.caption(
+                    f"🧹 Skipped {tokens_saved:,} tokens of boilerplate (license text, headers, contents pages) before summarizing"
+                )
+            chunk_stats = job.details["metrics"].snapshot().get("summarize_chunk")
+            if status == JobStatus.DONE and chunk_stats and chunk_stats.cache_hits:
+                st.caption(
+                    f"♻️ Reused {chunk_stats.cache_hits} of {chunk_stats.calls} section summaries from an earlier analysis, so only the parts that changed were re-summarized"
+                )
+
+    if status == JobStatus.DONE:
+        with stats_section:
+            # Share section
+            st.subheader("📱 Share This Banger Analysis")
+            st.info(
+                "Screenshot this analysis and share it on social media! Don't forget to tag #NoCapBookBot 📚✨"
+            )
 
 
 def main():
@@ -47,6 +387,9 @@ def main():
     Sets up the Streamlit UI with file upload, text input, API key configuration,
     and displays analysis results including Gen Z summaries and text statistics.
     """
+    # Identifies this browser session to the jobs it watches
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
     # Header
     st.title("📚 No Cap BookBot")
     st.subheader("*Book analysis that hits different, no cap fr fr*")
@@ -62,6 +405,11 @@ def main():
     st.sidebar.header("📖 Try a Sample")
     selected_sample = st.sidebar.selectbox("Sample Books", list(sample_books.keys()))
 
+    debug = st.sidebar.checkbox(
+        "🐞 Show debug metrics",
+        help="Timings, token usage and estimated cost of each pipeline stage",
+    )
+
     # Main content area
     col1, col2 = st.columns([1, 1])
 
@@ -91,56 +439,55 @@ def main():
 
         final_text = ""
         if uploaded_file is not None:
-            uploaded_text = extract.extract_text_from_upload(uploaded_file)
+            # Uploads are parsed when analyzed, unless they already have been
+            uploaded_text = extract.get_cached_text(uploaded_file, get_storage())
             if uploaded_text:
                 final_text = uploaded_text
                 st.success(
-                    f"✅ File uploaded! GG! ({len(uploaded_text.split())} words)"
+                    f"✅ File uploaded! GG! ({stats.get_word_count(uploaded_text)} words)"
                 )
             else:
-                st.error(
-                    "❌ Could not read the file. Make sure it's a valid text file, or we're so cooked."
+                st.success(
+                    f"✅ File uploaded! GG! ({uploaded_file.size / 1_000_000:.1f} MB)"
                 )
         elif book_text.strip():
             final_text = book_text
 
         if st.button("🚀 Analyze This Book", type="primary"):
-            if not final_text.strip():
+            if uploaded_file is None and not final_text.strip():
                 st.error(
                     "❌ Sus... Please upload a file or paste some text first, bestie!"
                 )
             elif not api_key:
                 st.error("❌ Yikes, please add your OpenAI API key in the sidebar!")
             else:
-                with st.spinner("Say less, let me cook... 👨🏻‍🍳🔥"):
-                    # Summary section
-                    genz_summary = summarize(final_text, api_key, GENZ_PROMPT)
-                    st.success("✨ Analysis complete! Here's the tea:")
-                    st.subheader("🎭 Gen Z Summary")
-                    st.markdown(f"*{genz_summary}*")
-
-                    # Stats section
-                    word_count = stats.get_word_count(final_text)
-                    st.subheader("📈 Basic Stats")
-
-                    stats_col1, stats_col2 = st.columns(2)
-                    with stats_col1:
-                        st.metric("📝 Total Words", f"{word_count:,}")
-
-                    with stats_col2:
-                        st.metric(
-                            "📚 Estimated Reading Time", f"{word_count // 200} minutes"
-                        )
-
-                    # Word frequency section
-                    st.subheader("🔤 Most Common Words")
-                    st.markdown(stats.get_common_words(final_text))
-
-                    # Share section
-                    st.subheader("📱 Share This Banger Analysis")
-                    st.info(
-                        "Screenshot this analysis and share it on social media! Don't forget to tag #NoCapBookBot 📚✨"
-                    )
+                job = start_analysis(final_text, uploaded_file, api_key, session_id)
+                previous_job_id = st.session_state.get("job_id")
+                if previous_job_id not in (None, job.id):
+                    get_job_manager().release(previous_job_id, session_id)
+                st.session_state["job_id"] = job.id
+                st.session_state["job_input"] = analysis_input(
+                    final_text, uploaded_file, api_key
+                )
+
+        # The analysis runs in the background; reruns just pick up its state
+        job = None
+        job_finished = True
+        if "job_id" in st.session_state:
+            job = get_job_manager().watch(st.session_state["job_id"], session_id)
+        if (
+            job is not None
+            and not job.finished
+            and analysis_input(final_text, uploaded_file, api_key)
+            != st.session_state.get("job_input")
+        ):
+            # The input changed mid-run, so nobody is waiting for this result
+            get_job_manager().release(job.id, session_id)
+            del st.session_state["job_id"]
+            job = None
+        if job is not None:
+            job_finished = job.finished
+            render_job(job, debug)
 
     # Footer
     st.markdown("---")
@@ -151,6 +498,10 @@ def main():
         "**How to use:** Upload a file (or use a sample from the side bar), add your OpenAI API key, and smash that analyze button!"
     )
 
+    if not job_finished:
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+
 
 if __name__ == "__main__":
     main()
@@ -5,10 +5,51 @@ This module handles intelligent chunking of large texts and uses OpenAI's GPT mo
 to generate summaries, including custom Gen Z-style summaries.
 """
 
-from typing import List, Optional
+import contextlib
+import functools
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
 
 import openai
-import streamlit as st
+
+from src.cache import make_cache_key
+from src.cancellation import AnalysisCancelled, CancellationToken
+from src.chunking import (
+    ChunkPlan,
+    Piece,
+    SectionStart,
+    TokenChunker,
+    chunk_token_budget,
+    count_tokens,
+    join_text,
+    tokenizer_name,
+)
+from src.clients import get_client
+from src.hedging import HedgePolicy
+from src.metrics import Metrics, process_metrics
+from src.progress import ProgressReporter
+from src.scheduler import RequestError, RequestScheduler, estimate_request_tokens
+from src.singleflight import SingleFlight, process_single_flight
+from src.storage import Storage
 
 
 class BookSummarizer:
@@ -20,100 +61,513 @@ class BookSummarizer:
     and finally transforming it into the desired style (e.g., Gen Z slang).
 
     Attributes:
-        client: OpenAI API client instance.
-        chunk_size: Maximum words per chunk (default: 100,000).
-        overlap_size: Word overlap between chunks to maintain context (default: 1,000).
+        client: OpenAI API client, borrowed from the shared client registry
+            unless one was passed in.
+        max_chunk_tokens: Maximum tokens of book text per chunk (default: 16,000).
+        overlap_tokens: Token overlap between chunks to maintain context (default: 500).
+        chunk_boundary: Preferred break point, "paragraph" or "sentence".
+        content_defined_chunks: Whether chunks may end early at content-defined
+            points, so an edited book reuses the cached summaries of every chunk
+            the edit didn't touch (default: True).
         max_output_tokens_per_chunk: Max tokens for chunk summaries (default: 1,000).
         final_summary_max_tokens: Max tokens for final summary (default: 500).
+        max_concurrency: Max chunk summaries requested in parallel (default: 8).
+        reduce_fan_in: Max summaries combined by a single reduce request (default: 8).
+        model: OpenAI model used for every request (default: "gpt-4o-mini").
+        cache: Optional store of model responses (see `src.storage`).
+        request_slots: Optional semaphore shared with other summarizers (even in
+            other processes) that caps how many API requests run at once.
+        scheduler: Paces requests under the account's rate limits and retries
+            transient failures; share one between summarizers using the same key.
+        metrics: Collects timings, token usage and cost for each pipeline stage.
+        single_flight: Coalesces identical requests that are in flight at once,
+            e.g. from several sessions analyzing the same book.
+        cancellation: Token that stops the analysis early once cancelled:
+            queued chunk work is dropped and streamed responses are cut off.
+        hedging: Optional policy for duplicating requests that are slow to
+            answer, to cut tail latency; None sends every request once.
     """
 
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = 8,
+        cache: Optional[Storage] = None,
+        request_slots: Optional[ContextManager] = None,
+        base_url: Optional[str] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        client: Optional[openai.OpenAI] = None,
+        metrics: Optional[Metrics] = None,
+        single_flight: Optional[SingleFlight] = None,
+        cancellation: Optional[CancellationToken] = None,
+        hedging: Optional[HedgePolicy] = None,
+    ):
         """
         Initialize the BookSummarizer with OpenAI API credentials.
 
         Args:
             api_key: OpenAI API key for authentication.
+            max_concurrency: Maximum number of chunk summaries to request at once.
+            cache: Optional persistent cache; identical requests are answered from
+                it instead of calling the API again.
+            request_slots: Optional semaphore-like context manager held for the
+                duration of every API request, to cap concurrency globally.
+            base_url: Optional OpenAI-compatible API endpoint to use instead of
+                the default (e.g., a local fake server for testing).
+            scheduler: Optional shared request scheduler; a private one with the
+                default rate limits is used if omitted.
+            client: Optional client to use instead of the shared one for
+                `api_key` (e.g., a fake for testing).
+            metrics: Optional collector for stage timings and usage; defaults
+                to the process-wide collector.
+            single_flight: Optional coalescing group; defaults to the
+                process-wide one, so every summarizer shares requests.
+            cancellation: Optional token for abandoning the analysis; one that
+                is never cancelled is used if omitted.
+            hedging: Optional hedging policy; share one between summarizers
+                so it learns from all their requests (see
+                `hedging.process_hedge_policy`).
         """
-        self.client = openai.OpenAI(api_key=api_key)
-        self.chunk_size = 100000  # Max words per chunk to stay within context limits
-        self.overlap_size = 1000  # Word overlap to maintain narrative continuity
+        self._api_key = api_key
+        self._base_url = base_url
+        self._client = client
+        self.model = "gpt-4o-mini"
+        self.cache = cache
+        self.request_slots = request_slots or contextlib.nullcontext()
+        self.scheduler = scheduler or RequestScheduler()
+        self.metrics = metrics or process_metrics()
+        self.single_flight = single_flight or process_single_flight()
+        self.cancellation = cancellation or CancellationToken()
+        self.hedging = hedging
+        self.max_chunk_tokens = 16000  # Keeps each request well inside the context
+        self.overlap_tokens = 500  # Token overlap to maintain narrative continuity
+        self.chunk_boundary = "paragraph"  # Prefer breaking between paragraphs
+        self.content_defined_chunks = True  # Edits only change nearby chunks
         self.max_output_tokens_per_chunk = 1000  # Detailed chunk summaries
         self.final_summary_max_tokens = 500  # Concise final output
+        self.max_concurrency = max(1, max_concurrency)  # Parallel map-stage requests
+        self.reduce_fan_in = 8  # Summaries combined per reduce request
+        self.master_summary_max_tokens = 800  # Full story arc, before styling
+
+    @property
+    def client(self) -> openai.OpenAI:
+        """
+        The OpenAI client to send requests with.
+
+        The shared client is looked up on every use, which keeps it from being
+        closed as idle while this summarizer is still working.
+        """
+        return self._client or get_client(self._api_key, self._base_url)
 
     def model_response(self, prompt: str, max_tokens: int, temperature: float) -> str:
         """
         Send a prompt to OpenAI's GPT model and return the response.
 
+        Responses are served from and stored in `cache` when one is configured.
+        Identical requests already in flight (from this or another summarizer)
+        are waited on instead of sent again. Requests are paced and retried by
+        `scheduler`, and hedged according to `hedging` when it is set. A request
+        that is already on its way when the analysis is cancelled still
+        completes, and its response is cached for next time.
+
         Args:
             prompt: The text prompt to send to the model.
             max_tokens: Maximum number of tokens in the response.
             temperature: Sampling temperature (0.0 = deterministic, 1.0 = creative).
 
         Returns:
-            str: The model's response text, or an error message if the API call fails.
+            str: The model's response text.
+
+        Raises:
+            RequestError: If the request fails after any retries.
+            AnalysisCancelled: If `cancellation` is cancelled before the request
+                is sent.
         """
-        try:
+        self.cancellation.raise_if_cancelled()
+        cache_key = make_cache_key(
+            prompt, self.model, max_tokens, temperature, tokenizer_name(self.model)
+        )
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.metrics.add_cache_hit()
+                return cached
+
+        while True:
+            try:
+                content, shared = self.single_flight.do(
+                    cache_key,
+                    lambda: self._fetch_response(
+                        prompt, max_tokens, temperature, cache_key
+                    ),
+                    self.cancellation,
+                )
+            except AnalysisCancelled:
+                if self.cancellation.cancelled:
+                    raise
+                continue  # Another analysis led the request and was cancelled
+            if shared:
+                self.metrics.add_coalesced()
+            return content
+
+    def _fetch_response(
+        self, prompt: str, max_tokens: int, temperature: float, cache_key: str
+    ) -> str:
+        """
+        Request a response that isn't cached, as the leader of its single flight.
+
+        The cache is checked once more first: the previous leader for the key,
+        in this or another process, may have just stored the response.
+
+        Args:
+            prompt: The text prompt to send to the model.
+            max_tokens: Maximum number of tokens in the response.
+            temperature: Sampling temperature.
+            cache_key: The request's cache key.
+
+        Returns:
+            str: The model's response text.
+
+        Raises:
+            RequestError: If the request fails after any retries.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.metrics.add_cache_hit()
+                return cached
+
+        if self.hedging is None:
+            response = self._send(prompt, max_tokens, temperature, self.cancellation)
+        else:
+            response = self._send_hedged(prompt, max_tokens, temperature)
+        self.metrics.add_usage(self.model, getattr(response, "usage", None))
+        content = (response.choices[0].message.content or "").strip()
+        if not content:
+            raise RequestError("The model returned an empty response")
+
+        if self.cache is not None:
+            self.cache.set(cache_key, content)
+        return content
+
+    def _send(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        cancellation: CancellationToken,
+        admitted: Optional[threading.Event] = None,
+    ) -> Any:
+        """
+        Send one request through the scheduler, holding a request slot.
+
+        The latency of an answered request is reported to `hedging`.
+
+        Args:
+            prompt: The text prompt to send to the model.
+            max_tokens: Maximum number of tokens in the response.
+            temperature: Sampling temperature.
+            cancellation: Token that stops the request from being sent.
+            admitted: Optional event set once the request holds a slot and the
+                scheduler lets it go out, i.e. once it stops waiting its turn.
+
+        Returns:
+            Any: The chat completion.
+
+        Raises:
+            RequestError: If the request fails after any retries.
+            AnalysisCancelled: If `cancellation` is cancelled before the request
+                is sent.
+        """
+
+        def send() -> Any:
+            if admitted is not None:
+                admitted.set()
+            started = time.perf_counter()
             response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+                model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=max_tokens,
                 temperature=temperature,
             )
-            return response.choices[0].message.content.strip()
+            if self.hedging is not None:
+                self.hedging.observe(max_tokens, time.perf_counter() - started)
+            return response
 
-        except Exception as e:
-            return f"Oops fam, the AI summary failed: {str(e)}"
+        with self.request_slots:
+            return self.scheduler.call(
+                send, estimate_request_tokens(prompt, max_tokens), cancellation
+            )
 
-    def create_chunks(self, words: List[str]) -> List[str]:
+    def _send_hedged(self, prompt: str, max_tokens: int, temperature: float) -> Any:
         """
-        Split a list of words into overlapping chunks for processing.
+        Send a request, and a duplicate if the first is slow; the first answer wins.
 
-        Creates chunks of configurable size with overlap to maintain context
-        between chunks for better summarization continuity.
+        The duplicate (a hedge) is sent once the request has been out longer
+        than `hedging`'s threshold for requests of its size, if the hedge budget
+        allows. Time spent waiting for a request slot or for the scheduler
+        doesn't count: a request queued behind others isn't slow, and a
+        duplicate would only queue behind it. The other request is then
+        cancelled: it is dropped if it is still waiting to be sent, and
+        otherwise answered in the background, with its usage recorded under
+        the "hedge_loser" stage.
 
         Args:
-            words: List of words from the book text.
+            prompt: The text prompt to send to the model.
+            max_tokens: Maximum number of tokens in the response.
+            temperature: Sampling temperature.
 
         Returns:
-            List[str]: List of text chunks, each as a joined string.
+            Any: The chat completion that arrived first.
+
+        Raises:
+            RequestError: If every request sent failed.
+            AnalysisCancelled: If `cancellation` is cancelled before an answer.
         """
-        chunks = []
-        start = 0
-        while start < len(words):
-            end = min(start + self.chunk_size, len(words))
-            chunk_text = " ".join(words[start:end])
-            chunks.append(chunk_text)
+        self.hedging.earn()
+        delay = self.hedging.threshold(max_tokens)
+        if delay is None:
+            return self._send(prompt, max_tokens, temperature, self.cancellation)
 
-            if end >= len(words):
-                break
+        metrics = self.metrics  # May be swapped for the next book meanwhile
+        tokens = [CancellationToken(), CancellationToken()]
+        admitted = threading.Event()
+        attempts: List[Future] = []
+        winner = None
+
+        def cancel_attempts() -> None:
+            for token in tokens:
+                token.cancel(self.cancellation.reason)
+
+        def record_loser(attempt: Future) -> None:
+            if attempt.cancelled() or attempt.exception() is not None:
+                return
+            with metrics.span("hedge_loser"):
+                metrics.add_usage(self.model, getattr(attempt.result(), "usage", None))
+
+        executor = self.hedging.executor
+        with self.cancellation.on_cancel(cancel_attempts):
+            send = functools.partial(self._send, prompt, max_tokens, temperature)
+            attempts.append(executor.submit(send, tokens[0], admitted))
+            # A request that ends before it is sent (e.g. cancelled) is admitted
+            attempts[0].add_done_callback(lambda _: admitted.set())
+            admitted.wait()
+            done, _ = wait(attempts, timeout=delay)
+            if not done and self.hedging.spend():
+                metrics.add_hedged()
+                attempts.append(executor.submit(send, tokens[1]))
+
+            pending = set(attempts)
+            while winner is None and pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                winner = next((a for a in done if a.exception() is None), None)
+
+        if winner is None:
+            raise attempts[0].exception()  # Every attempt failed
+        for attempt, token in zip(attempts, tokens):
+            if attempt is not winner:
+                token.cancel("hedged")
+                attempt.add_done_callback(record_loser)
+        return winner.result()
+
+    def model_response_stream(
+        self, prompt: str, max_tokens: int, temperature: float
+    ) -> Iterator[str]:
+        """
+        Send a prompt to OpenAI's GPT model and yield the response as it arrives.
 
-            start += self.chunk_size - self.overlap_size
+        The request is only sent once iteration starts. A cached response is
+        yielded in one piece, and a completed stream is stored in `cache`.
+        Cancelling `cancellation` closes the stream mid-response.
 
-        return chunks
+        Args:
+            prompt: The text prompt to send to the model.
+            max_tokens: Maximum number of tokens in the response.
+            temperature: Sampling temperature (0.0 = deterministic, 1.0 = creative).
+
+        Yields:
+            str: Successive pieces of the model's response text.
+
+        Raises:
+            RequestError: If the request fails, including part way through the
+                stream (only failures before the stream starts are retried).
+            AnalysisCancelled: If `cancellation` is cancelled before the
+                response is complete.
+        """
+        self.cancellation.raise_if_cancelled()
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(
+                prompt, self.model, max_tokens, temperature, tokenizer_name(self.model)
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.metrics.add_cache_hit()
+                yield cached
+                return
 
-    def summarize_chunk(self, chunk: str, chunk_number: int, total_chunks: int) -> str:
+        pieces = []
+        with self.request_slots:
+            stream = self.scheduler.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                ),
+                estimate_request_tokens(prompt, max_tokens),
+                self.cancellation,
+            )
+
+            # Closing the stream from the cancelling thread ends the read here
+            close = getattr(stream, "close", lambda: None)
+            try:
+                with self.cancellation.on_cancel(close):
+                    for chunk in stream:
+                        if getattr(chunk, "usage", None) is not None:
+                            self.metrics.add_usage(self.model, chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if not delta:
+                            continue
+                        if not pieces:
+                            delta = delta.lstrip()
+                            if not delta:
+                                continue
+                        pieces.append(delta)
+                        yield delta
+            except AnalysisCancelled:
+                close()
+                raise
+            except Exception as e:  # API errors and dropped connections alike
+                self.cancellation.raise_if_cancelled()
+                raise RequestError(f"The response stream broke off: {e}") from e
+            # Closing the stream may end it quietly instead of with an error
+            self.cancellation.raise_if_cancelled()
+
+        if cache_key is not None and pieces:
+            self.cache.set(cache_key, "".join(pieces).strip())
+
+    def chunk_token_budget(self, prompt: str, output_tokens: int) -> int:
+        """
+        Work out how many tokens of book text fit alongside a prompt.
+
+        Args:
+            prompt: The prompt text that will surround the book text.
+            output_tokens: Tokens reserved for the model's response.
+
+        Returns:
+            int: Maximum tokens of book text per request.
+        """
+        return chunk_token_budget(
+            self.model,
+            count_tokens(prompt, self.model),
+            output_tokens,
+            self.max_chunk_tokens,
+        )
+
+    def create_chunks(self, book_text: str) -> ChunkPlan:
+        """
+        Split book text into token-budgeted chunks for processing.
+
+        Chunks are sized in model tokens so that each request leaves room for the
+        chunk prompt and its output, break on paragraph or sentence boundaries,
+        and overlap slightly to maintain context between chunks. Boundaries are
+        content-defined (see `content_defined_chunks`), so after an edit only the
+        chunks around it change. Only chunk boundaries are computed here; each
+        chunk's text is sliced out of `book_text` when it is sent to the model.
+
+        Args:
+            book_text: The complete book text.
+
+        Returns:
+            ChunkPlan: Lazy sequence of text chunks, in book order.
+        """
+        with self.metrics.span("create_chunks", characters=len(book_text)):
+            return self._chunker().plan(book_text)
+
+    def chunk_stream(self, pieces: Iterable[Piece]) -> Iterator[str]:
+        """
+        Split a book arriving as a stream of pieces into token-budgeted chunks.
+
+        Books with `SectionStart` markers (see `extract.iter_text`) are packed
+        whole chapter by chapter, so the same chapters always land in the same
+        chunks and their summaries can be reused from the cache; chapters too
+        long for one chunk are split like `create_chunks` would.
+
+        Args:
+            pieces: Consecutive pieces of the book text, possibly with markers.
+
+        Returns:
+            Iterator[str]: Text chunks, in book order, each yielded as it fills.
+        """
+        return self._chunker().iter_chunks(pieces)
+
+    def _chunker(self) -> TokenChunker:
+        """Build a chunker sized to leave room for the chunk prompt and output."""
+        budget = self.chunk_token_budget(
+            self.build_chunk_prompt("", 1, 1), self.max_output_tokens_per_chunk
+        )
+        return TokenChunker(
+            self.model,
+            budget,
+            self.overlap_tokens,
+            self.chunk_boundary,
+            self.content_defined_chunks,
+        )
+
+    def summarize_chunk(
+        self, chunk: str, chunk_number: int, total_chunks: Optional[int] = None
+    ) -> str:
         """
         Summarize a single chunk of text with positional context.
 
         Args:
             chunk: The text chunk to summarize.
             chunk_number: The position of this chunk (1-indexed).
-            total_chunks: Total number of chunks in the book.
+            total_chunks: Total number of chunks in the book, if known.
 
         Returns:
             str: A detailed summary of the chunk focusing on plot, characters, and themes.
         """
+        chunk_prompt = self.build_chunk_prompt(chunk, chunk_number, total_chunks)
+        with self.metrics.span("summarize_chunk", chunk=chunk_number):
+            return self.model_response(
+                chunk_prompt, self.max_output_tokens_per_chunk, 0.3
+            )
+
+    def build_chunk_prompt(
+        self, chunk: str, chunk_number: int, total_chunks: Optional[int] = None
+    ) -> str:
+        """
+        Build the prompt asking for a summary of a single chunk.
+
+        Middle chunks get the same prompt wherever they fall, so a chunk that
+        moves (because text was added or removed before it) is still answered
+        from the cache.
+
+        Args:
+            chunk: The text chunk to summarize.
+            chunk_number: The position of this chunk (1-indexed).
+            total_chunks: Total number of chunks in the book, if known. Only the
+                last chunk needs it, since chunks may be summarized before the
+                rest of the book has been read.
+
+        Returns:
+            str: The chunk summary prompt, including positional context.
+        """
         position_context = ""
         if chunk_number == 1:
             position_context = "This is the beginning of the book."
         elif chunk_number == total_chunks:
             position_context = "This is the end of the book."
         else:
-            position_context = (
-                f"This is part {chunk_number} of {total_chunks} of the book."
-            )
+            position_context = "This is a part from the middle of the book."
 
-        chunk_prompt = f"""
+        return f"""
         {position_context} Provide a detailed summary of this section of the book. 
 
         Focus on:
@@ -129,23 +583,301 @@ class BookSummarizer:
         {chunk}
         """
 
-        return self.model_response(chunk_prompt, self.max_output_tokens_per_chunk, 0.3)
+    def summarize_chunks(
+        self,
+        chunks: Iterable[str],
+        on_chunk_done: Optional[Callable[[int, int, bool], None]] = None,
+    ) -> List[str]:
+        """
+        Summarize chunks concurrently as they arrive, preserving chunk order.
+
+        Chunk requests are spread over a thread pool bounded by `max_concurrency`,
+        so wall time approaches the slowest chunk rather than the sum of them all.
+        `chunks` may be a lazy stream (e.g., fed by a file that is still being
+        parsed): each chunk is submitted as soon as the next one arrives, which
+        is how the last chunk is recognized. At most twice `max_concurrency`
+        chunks are queued at once, so a fast producer cannot run ahead unbounded.
+        Once `cancellation` is cancelled, no more chunks are read and queued
+        chunks are dropped.
+
+        Args:
+            chunks: Text chunks to summarize, in book order.
+            on_chunk_done: Optional callback invoked from the calling thread with
+                (completed chunks, submitted chunks, whether all chunks have
+                been submitted) each time a chunk finishes.
+
+        Returns:
+            List[str]: Chunk summaries in the same order as `chunks`.
 
-    def create_master_summary(self, chunk_summaries: List[str]) -> str:
+        Raises:
+            RequestError: As soon as any chunk fails; queued chunks are dropped.
+            AnalysisCancelled: If `cancellation` is cancelled before every chunk
+                is summarized.
+        """
+        futures = []
+        pending = set()
+        completed = 0
+        all_submitted = False
+        queue_slots = threading.BoundedSemaphore(self.max_concurrency * 2)
+
+        def collect(block: bool) -> None:
+            nonlocal completed
+            self.cancellation.raise_if_cancelled()
+            finished = (
+                as_completed(list(pending))
+                if block
+                else [future for future in pending if future.done()]
+            )
+            for future in finished:
+                pending.discard(future)
+                if future.exception() is not None:
+                    raise future.exception()
+                completed += 1
+                if on_chunk_done is not None:
+                    on_chunk_done(completed, len(futures), all_submitted)
+
+        def submit(chunk: str, total_chunks: Optional[int]) -> None:
+            while not queue_slots.acquire(timeout=0.2):
+                collect(block=False)
+            future = executor.submit(
+                self.summarize_chunk, chunk, len(futures) + 1, total_chunks
+            )
+            future.add_done_callback(lambda _: queue_slots.release())
+            futures.append(future)
+            pending.add(future)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            try:
+                held = None
+                for chunk in chunks:
+                    if held is not None:
+                        submit(held, None)
+                    held = chunk
+                    collect(block=False)
+
+                if held is not None:
+                    submit(held, len(futures) + 1)
+                all_submitted = True
+                collect(block=True)
+            except BaseException:
+                # Drop queued chunks; only those already running are waited for
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        return [future.result() for future in futures]
+
+    def _map_concurrently(
+        self,
+        task: Callable[[int], str],
+        count: int,
+        on_done: Optional[Callable[[int], None]] = None,
+    ) -> List[str]:
+        """
+        Run `task(0)` ... `task(count - 1)` on a bounded thread pool.
+
+        Args:
+            task: Function producing the result for a given index.
+            count: Number of indices to run.
+            on_done: Optional callback invoked from the calling thread with the
+                number of completed tasks each time one finishes.
+
+        Returns:
+            List[str]: Results ordered by index, regardless of completion order.
+
+        Raises:
+            RequestError: As soon as any task fails; queued tasks are dropped.
+            AnalysisCancelled: If `cancellation` is cancelled while tasks run.
+        """
+        results: List[Optional[str]] = [None] * count
+
+        workers = min(self.max_concurrency, count) or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(task, i): i for i in range(count)}
+            for completed, future in enumerate(as_completed(futures), 1):
+                if future.exception() is not None:
+                    for queued in futures:
+                        queued.cancel()
+                    raise future.exception()
+                results[futures[future]] = future.result()
+                if on_done is not None:
+                    on_done(completed)
+
+        return results
+
+    def reduce_levels(self, summary_count: int) -> int:
+        """
+        Estimate how many reduce levels a set of summaries needs.
+
+        Args:
+            summary_count: Number of chunk summaries to combine.
+
+        Returns:
+            int: Expected number of levels, including the final master summary.
+        """
+        fan_in = max(2, self.reduce_fan_in)
+        if summary_count <= fan_in:
+            return 1
+        return math.ceil(math.log(summary_count, fan_in))
+
+    def group_summaries(self, summaries: List[str]) -> List[List[str]]:
+        """
+        Group consecutive summaries into batches for a single reduce request.
+
+        Each batch holds at most `reduce_fan_in` summaries and fits the token
+        budget of a reduce prompt whenever it holds more than two.
+
+        Args:
+            summaries: Summaries to group, in book order.
+
+        Returns:
+            List[List[str]]: Batches of consecutive summaries.
+        """
+        fan_in = max(2, self.reduce_fan_in)
+        budget = self.chunk_token_budget(
+            self.build_master_prompt(""), self.master_summary_max_tokens
+        )
+
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        batch_tokens = 0
+        for summary in summaries:
+            tokens = count_tokens(summary, self.model)
+            # Batches always take at least two summaries so each level shrinks
+            over_budget = len(batch) >= 2 and batch_tokens + tokens > budget
+            if len(batch) >= fan_in or over_budget:
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(summary)
+            batch_tokens += tokens
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def create_master_summary(
+        self,
+        chunk_summaries: List[str],
+        on_level_progress: Optional[Callable[[int, int, int], None]] = None,
+    ) -> str:
         """
         Combine multiple chunk summaries into a cohesive master summary.
 
+        Summaries are reduced as a tree: consecutive summaries are grouped into
+        batches of at most `reduce_fan_in`, each batch is combined in parallel, and
+        this repeats until a single batch remains for the final master summary.
+        The number of sequential reduce calls grows logarithmically with book
+        length.
+
         Args:
             chunk_summaries: List of individual chunk summaries to combine.
+            on_level_progress: Optional callback invoked from the calling thread
+                with (level, completed batches, total batches) as the tree reduces.
 
         Returns:
             str: A comprehensive narrative summary capturing the complete story arc.
         """
-        combined_summaries = "\n\n".join(
-            [f"Section {i + 1}: {summary}" for i, summary in enumerate(chunk_summaries)]
+        with self.metrics.span(
+            "create_master_summary", summaries=len(chunk_summaries)
+        ):
+            summaries = chunk_summaries
+            level = 1
+            batches = self.group_summaries(summaries)
+            while len(batches) > 1:
+                total_batches = len(batches)
+
+                def on_batch_done(completed: int, level: int = level) -> None:
+                    if on_level_progress is not None:
+                        on_level_progress(level, completed, total_batches)
+
+                summaries = self._map_concurrently(
+                    lambda i, batches=batches: self.combine_summaries(batches[i]),
+                    total_batches,
+                    on_batch_done,
+                )
+                batches = self.group_summaries(summaries)
+                level += 1
+
+            if on_level_progress is not None:
+                on_level_progress(level, 0, 1)
+            master_summary = self.model_response(
+                self.build_master_prompt(self.format_summaries(batches[0])),
+                self.master_summary_max_tokens,
+                0.3,
+            )
+            if on_level_progress is not None:
+                on_level_progress(level, 1, 1)
+            return master_summary
+
+    def combine_summaries(self, summaries: List[str]) -> str:
+        """
+        Combine a batch of consecutive section summaries into one summary.
+
+        Used for the intermediate levels of the reduce tree, so the result keeps
+        enough detail to be combined again.
+
+        Args:
+            summaries: Consecutive section summaries, in book order.
+
+        Returns:
+            str: A single detailed summary covering every section in the batch.
+        """
+        with self.metrics.span("combine_summaries", summaries=len(summaries)):
+            return self.model_response(
+                self.build_combine_prompt(summaries),
+                self.max_output_tokens_per_chunk,
+                0.3,
+            )
+
+    def build_combine_prompt(self, summaries: List[str]) -> str:
+        """
+        Build the prompt asking for one summary of a batch of section summaries.
+
+        Args:
+            summaries: Consecutive section summaries, in book order.
+
+        Returns:
+            str: The intermediate reduce prompt.
+        """
+        return f"""
+        Below are summaries of consecutive sections of a book. Combine them into one 
+        detailed summary of this part of the book, in the order events happen.
+
+        Keep:
+        - Key plot points and story developments
+        - Character introductions, developments, or changes
+        - Major themes or conflicts
+        - Any resolution or cliffhangers
+
+        Section summaries:
+        {self.format_summaries(summaries)}
+        """
+
+    @staticmethod
+    def format_summaries(summaries: List[str]) -> str:
+        """
+        Label and join section summaries for use in a prompt.
+
+        Args:
+            summaries: Section summaries, in book order.
+
+        Returns:
+            str: The summaries as numbered sections separated by blank lines.
+        """
+        return "\n\n".join(
+            [f"Section {i + 1}: {summary}" for i, summary in enumerate(summaries)]
         )
 
-        master_prompt = f"""
+    def build_master_prompt(self, combined_summaries: str) -> str:
+        """
+        Build the prompt asking for the final master summary.
+
+        Args:
+            combined_summaries: Labeled section summaries from `format_summaries`.
+
+        Returns:
+            str: The master summary prompt.
+        """
+        return f"""
         Below are summaries of different sections of a book. Create a comprehensive, 
         cohesive summary that captures the complete story arc, main characters, 
         key themes, and plot resolution.
@@ -163,89 +895,281 @@ class BookSummarizer:
         {combined_summaries}
         """
 
-        return self.model_response(master_prompt, 800, 0.3)
-
-    def get_genz_summary(self, master_summary: str, genz_prompt: str) -> str:
+    def get_genz_summary(
+        self, master_summary: str, genz_prompt: str, stream: bool = False
+    ) -> Union[str, Iterator[str]]:
         """
         Transform a master summary into Gen Z style using a custom prompt.
 
         Args:
             master_summary: The comprehensive book summary to transform.
             genz_prompt: Custom prompt defining the Gen Z transformation style.
+            stream: If True, return an iterator of text deltas instead of waiting
+                for the whole response.
 
         Returns:
-            str: The summary rewritten in Gen Z slang and style.
+            Union[str, Iterator[str]]: The summary rewritten in Gen Z slang and
+                style, or an iterator over its pieces when streaming.
         """
-        final_prompt = f"""
-        {genz_prompt}
+        final_prompt = self.build_genz_prompt(master_summary, genz_prompt)
+        return self._genz_response(final_prompt, stream, "get_genz_summary")
 
-        Book summary: {master_summary}
+    def get_genz_summary_simple(
+        self, book_text: str, genz_prompt: str, stream: bool = False
+    ) -> Union[str, Iterator[str]]:
+        """
+        Generate a Gen Z summary directly from book text (for shorter books).
+
+        Skips the chunking process for books that fit in a single request.
+
+        Args:
+            book_text: The complete book text.
+            genz_prompt: Custom prompt defining the Gen Z transformation style.
+            stream: If True, return an iterator of text deltas instead of waiting
+                for the whole response.
+
+        Returns:
+            Union[str, Iterator[str]]: Gen Z-style summary generated directly from
+                the full text, or an iterator over its pieces when streaming.
+        """
+        final_prompt = self.build_genz_prompt_simple(book_text, genz_prompt)
+        return self._genz_response(final_prompt, stream, "get_genz_summary_simple")
+
+    def _genz_response(
+        self, final_prompt: str, stream: bool, stage: str
+    ) -> Union[str, Iterator[str]]:
         """
+        Send a Gen Z style prompt, timed as a metrics span.
 
-        return self.model_response(final_prompt, self.final_summary_max_tokens, 0.8)
+        Args:
+            final_prompt: The complete style prompt.
+            stream: If True, return an iterator of text deltas.
+            stage: Name of the metrics span.
 
-    def get_genz_summary_simple(self, book_text: str, genz_prompt: str) -> str:
+        Returns:
+            Union[str, Iterator[str]]: The response, or an iterator over its
+                pieces when streaming.
         """
-        Generate a Gen Z summary directly from book text (for shorter books).
+        if stream:
+            return self._stream_in_span(final_prompt, stage)
+        with self.metrics.span(stage):
+            return self.model_response(
+                final_prompt, self.final_summary_max_tokens, 0.8
+            )
+
+    def _stream_in_span(self, final_prompt: str, stage: str) -> Iterator[str]:
+        """Stream a Gen Z style response, keeping its span open until it ends."""
+        with self.metrics.span(stage):
+            yield from self.model_response_stream(
+                final_prompt, self.final_summary_max_tokens, 0.8
+            )
+
+    @staticmethod
+    def build_genz_prompt(master_summary: str, genz_prompt: str) -> str:
+        """
+        Build the prompt asking for a Gen Z rewrite of a master summary.
 
-        Skips the chunking process for books under the chunk size threshold.
+        Args:
+            master_summary: The comprehensive book summary to transform.
+            genz_prompt: Custom prompt defining the Gen Z transformation style.
+
+        Returns:
+            str: The final style prompt.
+        """
+        return f"""
+        {genz_prompt}
+
+        Book summary: {master_summary}
+        """
+
+    @staticmethod
+    def build_genz_prompt_simple(book_text: str, genz_prompt: str) -> str:
+        """
+        Build the prompt asking for a Gen Z summary straight from the book text.
 
         Args:
             book_text: The complete book text.
             genz_prompt: Custom prompt defining the Gen Z transformation style.
 
         Returns:
-            str: Gen Z-style summary generated directly from the full text.
+            str: The single-request style prompt.
         """
-        final_prompt = f"""
+        return f"""
         {genz_prompt}
 
         Book text: {book_text}
         """
-        return self.model_response(final_prompt, 500, 0.8)
 
-    def process_book(self, book_text: str, genz_prompt: str) -> str:
+    def fits_single_request(self, book_tokens: int, genz_prompt: str) -> bool:
+        """
+        Check whether a book is short enough to summarize in one request.
+
+        Args:
+            book_tokens: Length of the book text, in model tokens.
+            genz_prompt: Custom prompt defining the Gen Z transformation style.
+
+        Returns:
+            bool: True if the simple path can be used instead of chunking.
+        """
+        return book_tokens <= self.chunk_token_budget(
+            genz_prompt, self.final_summary_max_tokens
+        )
+
+    def process_book(
+        self,
+        book_text: str,
+        genz_prompt: str,
+        stream: bool = False,
+        progress: Optional[ProgressReporter] = None,
+    ) -> Union[str, Iterator[str]]:
         """
         Main entry point for processing a book and generating a Gen Z summary.
 
         Automatically chooses between simple (short books) and chunked (long books)
-        processing based on book length. Displays progress indicators for long books.
+        processing based on the book's length in tokens. Reports progress for
+        long books.
+
+        When streaming, the chunk and master summaries are still produced before
+        this returns; only the final Gen Z rewrite is streamed.
 
         Args:
             book_text: The complete book text to summarize.
             genz_prompt: Custom prompt defining the Gen Z transformation style.
+            stream: If True, return an iterator of text deltas for the final
+                summary instead of waiting for the whole response.
+            progress: Optional reporter that receives progress updates for
+                long books (e.g., a StreamlitProgress in the web app).
 
         Returns:
-            str: The final Gen Z-style summary of the book.
+            Union[str, Iterator[str]]: The final Gen Z-style summary of the book,
+                or an iterator over its pieces when streaming.
         """
-        words = book_text.split()
-        if len(words) <= self.chunk_size:
-            return self.get_genz_summary_simple(book_text, genz_prompt)
+        book_tokens = count_tokens(book_text, self.model)
+        if self.fits_single_request(book_tokens, genz_prompt):
+            return self.get_genz_summary_simple(book_text, genz_prompt, stream)
+
+        return self.process_chunks(
+            self.create_chunks(book_text), genz_prompt, stream, progress
+        )
 
-        chunks = self.create_chunks(words)
-        total_chunks = len(chunks)
+    def process_stream(
+        self,
+        pieces: Iterable[Piece],
+        genz_prompt: str,
+        stream: bool = False,
+        progress: Optional[ProgressReporter] = None,
+    ) -> Union[str, Iterator[str]]:
+        """
+        Summarize a book whose text arrives as a stream of pieces.
 
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        Pieces (such as pages or chapters from `extract.iter_text_from_upload`)
+        are chunked as they arrive, and each chunk is sent to the model as soon
+        as it fills, so parsing the rest of the file overlaps with summarization.
+        Books that turn out to fit in a single request use the simple path, and
+        books with chapter markers are chunked by chapter (see `chunk_stream`).
 
-        chunk_summaries = []
-        for i, chunk in enumerate(chunks, 1):
-            status_text.text(f"📖 Processing section {i} of {total_chunks}...")
-            progress_bar.progress(
-                i / (total_chunks + 2)
-            )  # +2 for master summary and final Gen Z conversion
-            chunk_summary = self.summarize_chunk(chunk, i, total_chunks)
-            chunk_summaries.append(chunk_summary)
+        Args:
+            pieces: Consecutive pieces of the book text, possibly with markers.
+            genz_prompt: Custom prompt defining the Gen Z transformation style.
+            stream: If True, return an iterator of text deltas for the final
+                summary instead of waiting for the whole response.
+            progress: Optional reporter that receives progress updates for
+                long books (e.g., a StreamlitProgress in the web app).
 
-        status_text.text("🔗 Combining sections into master summary...")
-        progress_bar.progress((total_chunks + 1) / (total_chunks + 2))
-        master_summary = self.create_master_summary(chunk_summaries)
+        Returns:
+            Union[str, Iterator[str]]: The final Gen Z-style summary of the book,
+                or an iterator over its pieces when streaming.
+        """
+        pieces = iter(pieces)
+        head = []
+        head_tokens = 0
+        for piece in pieces:
+            self.cancellation.raise_if_cancelled()
+            head.append(piece)
+            if isinstance(piece, SectionStart):
+                continue
+            head_tokens += count_tokens(piece, self.model)
+            if not self.fits_single_request(head_tokens, genz_prompt):
+                break
+        else:
+            return self.get_genz_summary_simple(join_text(head), genz_prompt, stream)
 
-        status_text.text("✨ Transforming to Gen Z style...")
-        progress_bar.progress(1.0)
-        genz_summary = self.get_genz_summary(master_summary, genz_prompt)
+        chunks = self.chunk_stream(itertools.chain(head, pieces))
+        return self.process_chunks(chunks, genz_prompt, stream, progress)
 
-        progress_bar.empty()
-        status_text.empty()
+    def process_chunks(
+        self,
+        chunks: Iterable[str],
+        genz_prompt: str,
+        stream: bool = False,
+        progress: Optional[ProgressReporter] = None,
+    ) -> Union[str, Iterator[str]]:
+        """
+        Run the chunked pipeline: chunk summaries, master summary, Gen Z rewrite.
+
+        Reports progress while the chunk and master summaries are produced, and
+        checks `cancellation` between stages.
+
+        Args:
+            chunks: Text chunks of the book, in order; may be a lazy stream.
+            genz_prompt: Custom prompt defining the Gen Z transformation style.
+            stream: If True, return an iterator of text deltas for the final
+                summary instead of waiting for the whole response.
+            progress: Optional reporter that receives progress updates for
+                long books (e.g., a StreamlitProgress in the web app).
+
+        Returns:
+            Union[str, Iterator[str]]: The final Gen Z-style summary of the book,
+                or an iterator over its pieces when streaming.
+
+        Raises:
+            RequestError: If any request fails after retrying. When streaming,
+                the returned iterator may also raise it.
+            AnalysisCancelled: If `cancellation` is cancelled before the summary
+                is complete. When streaming, the returned iterator may also
+                raise it.
+        """
+        progress = progress or ProgressReporter()
+
+        def on_chunk_done(completed: int, submitted: int, all_submitted: bool) -> None:
+            if all_submitted:
+                message = f"📖 Processed {completed} of {submitted} sections..."
+            else:
+                message = (
+                    f"📖 Processed {completed} sections, still reading the book..."
+                )
+            # +2 for master summary and final Gen Z conversion
+            progress.update(completed / (submitted + 2), message)
+
+        total_chunks = levels = 0  # Known once every chunk is summarized
+
+        def on_level_progress(level: int, completed: int, total_batches: int) -> None:
+            if total_batches > 1:
+                message = (
+                    f"🔗 Combining sections (level {level}): "
+                    f"{completed} of {total_batches} groups..."
+                )
+            else:
+                message = "🔗 Combining sections into master summary..."
+            reduced = min(1.0, (level - 1 + completed / total_batches) / levels)
+            progress.update((total_chunks + reduced) / (total_chunks + 2), message)
+
+        try:
+            progress.update(0.0, "📖 Processing sections...")
+            with self.metrics.span("summarize_chunks"):
+                chunk_summaries = self.summarize_chunks(chunks, on_chunk_done)
+            total_chunks = len(chunk_summaries)
+            levels = self.reduce_levels(total_chunks)
+
+            self.cancellation.raise_if_cancelled()
+            master_summary = self.create_master_summary(
+                chunk_summaries, on_level_progress
+            )
+            self.cancellation.raise_if_cancelled()
+            if stream:
+                return self.get_genz_summary(master_summary, genz_prompt, stream=True)
 
-        return genz_summary
+            progress.update(1.0, "✨ Transforming to Gen Z style...")
+            return self.get_genz_summary(master_summary, genz_prompt)
+        finally:
+            progress.close()
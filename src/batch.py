@@ -0,0 +1,538 @@
+"""
+Offline bulk summarization for No Cap BookBot using the OpenAI Batch API.
+
+Every stage of the pipeline (chunk summaries, each level of the reduce tree, the
+master summary and the Gen Z rewrite) is sent as one Batch API job covering all
+books at once, instead of as interactive requests. Batch jobs are billed at a
+discount and draw on a separate rate limit, at the cost of up to a day of latency
+per stage, which suits overnight library runs.
+
+Prompts are built by `BookSummarizer`, so a book summarized in bulk gets exactly
+the same requests as one summarized interactively, and results are stored in the
+same summary cache.
+
+A run that is interrupted while a job is in flight doesn't pay for it twice: on
+restart, earlier stages come back from the cache, so the interrupted stage
+writes the same input file again, and the runner re-attaches to the job that
+was already submitted for it (see `BatchRunner.submitted`).
+"""
+
+import hashlib
+import json
+import logging
+import tempfile
+import time
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from src.BookSummarizer import BookSummarizer
+from src.cache import make_cache_key
+from src.chunking import Piece, count_tokens, join_text, tokenizer_name
+from src.metrics import BATCH_PRICE_FACTOR, Metrics, process_metrics
+from src.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+MAX_REQUESTS_PER_BATCH = 50000  # Batch API limit on requests per input file
+MAX_BYTES_PER_BATCH = 190 * 1024 * 1024  # Stays under the 200 MB input file limit
+POLL_INTERVAL_SECONDS = 30
+FINISHED_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+
+class BatchError(Exception):
+    """Raised when a batch job cannot be submitted or finishes without output."""
+
+
+class BatchRequest(NamedTuple):
+    """
+    One chat completion request inside a batch job.
+
+    Attributes:
+        custom_id: Identifier used to match the response to the request.
+        prompt: The text prompt to send to the model.
+        max_tokens: Maximum number of tokens in the response.
+        temperature: Sampling temperature of the request.
+    """
+
+    custom_id: str
+    prompt: str
+    max_tokens: int
+    temperature: float
+
+
+class BatchRunner:
+    """
+    Runs groups of chat completion requests as Batch API jobs and waits for them.
+
+    Requests are streamed to temporary JSONL files, split to respect the Batch
+    API's size limits, and all resulting jobs are polled together. Requests
+    already in the cache are answered from it and never submitted.
+
+    Each job is identified by a hash of its input file. Uploads and jobs are
+    reported to `on_submit` as they happen, and an input file whose hash is in
+    `submitted` is not submitted again: the runner re-attaches to its job, or
+    creates one from the file uploaded earlier.
+
+    Attributes:
+        client: OpenAI client (or any client exposing `files` and `batches`).
+        model: Model used for every request.
+        cache: Optional summary cache shared with interactive runs.
+        poll_interval: Seconds to wait between status checks.
+        metrics: Collects timings, token usage and cost for each stage.
+        submitted: Jobs submitted by earlier runs, by input file hash, as
+            records with "input_sha256", "input_file_id" and, once the job was
+            created, "batch_id".
+        on_submit: Optional callback given each new or updated record of
+            `submitted`, so it can be saved for the next run.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        cache: Optional[Storage] = None,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+        metrics: Optional[Metrics] = None,
+        submitted: Optional[Iterable[Dict[str, str]]] = None,
+        on_submit: Optional[Callable[[Dict[str, str]], None]] = None,
+    ):
+        """
+        Initialize the runner.
+
+        Args:
+            client: OpenAI client (or any client exposing `files` and `batches`).
+            model: Model used for every request.
+            cache: Optional summary cache shared with interactive runs.
+            poll_interval: Seconds to wait between status checks.
+            metrics: Optional collector for stage timings and usage; defaults
+                to the process-wide collector.
+            submitted: Optional records passed to `on_submit` by an earlier
+                run; later records for the same input replace earlier ones.
+            on_submit: Optional callback given the record of each upload and
+                each job created.
+        """
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.metrics = metrics or process_metrics()
+        self.submitted: Dict[str, Dict[str, str]] = {
+            record["input_sha256"]: record for record in submitted or ()
+        }
+        self.on_submit = on_submit
+
+    def run(
+        self, requests: Iterable[BatchRequest], stage: str = "batch"
+    ) -> Dict[str, str]:
+        """
+        Get responses for a group of requests, submitting cache misses as batches.
+
+        Args:
+            requests: The requests to run; may be a lazy stream.
+            stage: Pipeline stage the requests belong to, for metrics.
+
+        Returns:
+            Dict[str, str]: Response text by custom_id. Requests that failed are
+                missing from the result.
+        """
+        with self.metrics.span(f"batch_{stage}"):
+            results: Dict[str, str] = {}
+            cache_keys: Dict[str, str] = {}
+            batch_ids = []
+
+            for batch_file, digest in self._write_batch_files(
+                requests, results, cache_keys
+            ):
+                with batch_file:
+                    batch_ids.append(self._submit(batch_file, digest))
+
+            for batch in self._wait(batch_ids):
+                for custom_id, content in self._read_results(batch):
+                    results[custom_id] = content
+                    if self.cache is not None:
+                        self.cache.set(cache_keys[custom_id], content)
+
+            return results
+
+    def _submit(self, batch_file, digest: str) -> str:
+        """
+        Submit a batch job for an input file, unless one was submitted before.
+
+        A job from an earlier run is re-attached to unless it failed without
+        producing any output, in which case it is submitted again.
+
+        Args:
+            batch_file: Open file holding the job's input.
+            digest: SHA-256 of the input file.
+
+        Returns:
+            str: The ID of the job.
+        """
+        record = self.submitted.get(digest, {})
+        if "batch_id" in record:
+            batch = self.client.batches.retrieve(record["batch_id"])
+            if batch.status != "failed" or batch.output_file_id:
+                logger.info("Re-attached to batch %s", batch.id)
+                return batch.id
+            record = {}
+
+        if "input_file_id" not in record:
+            batch_file.seek(0)
+            uploaded = self.client.files.create(
+                file=("requests.jsonl", batch_file), purpose="batch"
+            )
+            record = self._record(
+                {"input_sha256": digest, "input_file_id": uploaded.id}
+            )
+
+        batch = self.client.batches.create(
+            input_file_id=record["input_file_id"],
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+        )
+        logger.info("Submitted batch %s", batch.id)
+        self._record(dict(record, batch_id=batch.id))
+        return batch.id
+
+    def _record(self, record: Dict[str, str]) -> Dict[str, str]:
+        """Remember a submission, and pass it on to `on_submit`."""
+        self.submitted[record["input_sha256"]] = record
+        if self.on_submit is not None:
+            self.on_submit(record)
+        return record
+
+    def _write_batch_files(
+        self,
+        requests: Iterable[BatchRequest],
+        results: Dict[str, str],
+        cache_keys: Dict[str, str],
+    ) -> Iterator[Tuple]:
+        """
+        Write uncached requests to JSONL files that each fit in one batch job.
+
+        Args:
+            requests: The requests to write.
+            results: Filled in with responses found in the cache.
+            cache_keys: Filled in with the cache key of every written request.
+
+        Yields:
+            Tuple: An open temporary file holding one batch job's input, and
+                the SHA-256 of its contents.
+        """
+        batch_file = None
+        digest = None
+        count = size = 0
+        for request in requests:
+            cache_key = make_cache_key(
+                request.prompt,
+                self.model,
+                request.max_tokens,
+                request.temperature,
+                tokenizer_name(self.model),
+            )
+            cached = self.cache.get(cache_key) if self.cache is not None else None
+            if cached is not None:
+                self.metrics.add_cache_hit()
+                results[request.custom_id] = cached
+                continue
+
+            line = json.dumps(
+                {
+                    "custom_id": request.custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {
+                        "model": self.model,
+                        "messages": [{"role": "user", "content": request.prompt}],
+                        "max_tokens": request.max_tokens,
+                        "temperature": request.temperature,
+                    },
+                },
+                ensure_ascii=False,
+            ).encode("utf-8") + b"\n"
+
+            if batch_file is not None and (
+                count >= MAX_REQUESTS_PER_BATCH
+                or size + len(line) > MAX_BYTES_PER_BATCH
+            ):
+                yield batch_file, digest.hexdigest()
+                batch_file = None
+            if batch_file is None:
+                batch_file = tempfile.TemporaryFile()
+                digest = hashlib.sha256()
+                count = size = 0
+
+            batch_file.write(line)
+            digest.update(line)
+            cache_keys[request.custom_id] = cache_key
+            count += 1
+            size += len(line)
+
+        if batch_file is not None:
+            yield batch_file, digest.hexdigest()
+
+    def _wait(self, batch_ids: List[str]) -> Iterator:
+        """
+        Poll batch jobs until each one finishes.
+
+        Args:
+            batch_ids: IDs of the submitted batch jobs.
+
+        Yields:
+            Batch objects, as each job reaches a final status.
+        """
+        waiting = list(batch_ids)
+        while waiting:
+            still_waiting = []
+            for batch_id in waiting:
+                batch = self.client.batches.retrieve(batch_id)
+                if batch.status in FINISHED_STATUSES:
+                    logger.info("Batch %s %s", batch_id, batch.status)
+                    yield batch
+                else:
+                    still_waiting.append(batch_id)
+            waiting = still_waiting
+            if waiting:
+                time.sleep(self.poll_interval)
+
+    def _read_results(self, batch) -> Iterator[Tuple[str, str]]:
+        """
+        Read the successful responses of a finished batch job.
+
+        Expired and cancelled jobs still return whatever completed in time.
+        Failed requests are logged and skipped.
+
+        Args:
+            batch: A finished Batch object.
+
+        Yields:
+            Tuple[str, str]: custom_id and response text of each success.
+
+        Raises:
+            BatchError: If the job failed validation and produced no output.
+        """
+        if batch.status == "failed" and not batch.output_file_id:
+            errors = getattr(batch, "errors", None)
+            raise BatchError(f"Batch {batch.id} failed: {errors}")
+
+        if batch.error_file_id:
+            for line in self.client.files.content(batch.error_file_id).text.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    logger.warning(
+                        "Request %s failed: %s", record["custom_id"], record.get("error")
+                    )
+
+        if not batch.output_file_id:
+            return
+
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                logger.warning(
+                    "Request %s failed: %s",
+                    record["custom_id"],
+                    record.get("error") or response.get("body"),
+                )
+                continue
+            body = response["body"]
+            self.metrics.add_usage(
+                self.model, body.get("usage"), price_factor=BATCH_PRICE_FACTOR
+            )
+            content = body["choices"][0]["message"]["content"]
+            yield record["custom_id"], content.strip()
+
+
+class BulkSummarizer:
+    """
+    Summarizes many books at once, one Batch API job per pipeline stage.
+
+    Chunk prompts for every book go into the first job, together with the
+    single-request prompts of books short enough to skip chunking. Each later
+    job holds the next reduce level for every book that still needs one, then
+    the master summaries, then the Gen Z rewrites. A book whose request fails
+    is dropped and reported in `failures`; the other books carry on.
+
+    Attributes:
+        summarizer: Supplies the model, chunking settings and prompts.
+        runner: Runs each stage's requests as batch jobs.
+        failures: Book IDs that could not be summarized, with the reason.
+    """
+
+    def __init__(self, summarizer: BookSummarizer, runner: BatchRunner):
+        """
+        Initialize the bulk summarizer.
+
+        Args:
+            summarizer: Supplies the model, chunking settings and prompts.
+            runner: Runs each stage's requests as batch jobs.
+        """
+        self.summarizer = summarizer
+        self.runner = runner
+        self.failures: Dict[str, str] = {}
+
+    def summarize_books(
+        self,
+        books: Iterable[Tuple[str, Union[str, Iterable[Piece]]]],
+        genz_prompt: str,
+    ) -> Dict[str, str]:
+        """
+        Summarize a collection of books through the Batch API.
+
+        Book texts are only needed while the first job is written, so `books`
+        can be a lazy stream that extracts each book on demand. Books are
+        chunked exactly as `BookSummarizer.process_stream` would chunk them,
+        chapter by chapter when they carry section markers.
+
+        Args:
+            books: (book ID, book text) pairs, where the text may also be given
+                as pieces with section markers; IDs must be unique.
+            genz_prompt: Custom prompt defining the Gen Z transformation style.
+
+        Returns:
+            Dict[str, str]: The final Gen Z-style summary of each book that
+                succeeded, by book ID.
+        """
+        summarizer = self.summarizer
+        book_ids: List[str] = []
+        chunk_counts: Dict[int, int] = {}  # Chunked books only, by index
+        simple: List[int] = []
+
+        def map_requests() -> Iterator[BatchRequest]:
+            for index, (book_id, book) in enumerate(books):
+                pieces = [book] if isinstance(book, str) else list(book)
+                book_text = join_text(pieces)
+                book_ids.append(book_id)
+                book_tokens = count_tokens(book_text, summarizer.model)
+                if summarizer.fits_single_request(book_tokens, genz_prompt):
+                    simple.append(index)
+                    yield BatchRequest(
+                        f"{index}:final",
+                        summarizer.build_genz_prompt_simple(book_text, genz_prompt),
+                        summarizer.final_summary_max_tokens,
+                        0.8,
+                    )
+                    continue
+
+                chunks = list(summarizer.chunk_stream(pieces))
+                chunk_counts[index] = len(chunks)
+                for i, chunk in enumerate(chunks):
+                    yield BatchRequest(
+                        f"{index}:chunk:{i}",
+                        summarizer.build_chunk_prompt(chunk, i + 1, len(chunks)),
+                        summarizer.max_output_tokens_per_chunk,
+                        0.3,
+                    )
+
+        results = self.runner.run(map_requests(), "map")
+        logger.info(
+            "Map stage done: %d books, %d chunked", len(book_ids), len(chunk_counts)
+        )
+
+        summaries: Dict[str, str] = {}
+        for index in simple:
+            self._collect(summaries, book_ids, index, results.get(f"{index}:final"))
+
+        # Chunk summaries per book, in order; books with a failed chunk are dropped
+        levels: Dict[int, List[str]] = {}
+        for index, count in chunk_counts.items():
+            chunk_summaries = [results.get(f"{index}:chunk:{i}") for i in range(count)]
+            if None in chunk_summaries:
+                self.failures[book_ids[index]] = "a chunk summary failed"
+            else:
+                levels[index] = chunk_summaries
+
+        # Reduce every book's tree one level per job, until one batch is left each
+        batches = {index: summarizer.group_summaries(s) for index, s in levels.items()}
+        level = 1
+        while any(len(groups) > 1 for groups in batches.values()):
+            requests = [
+                BatchRequest(
+                    f"{index}:reduce{level}:{i}",
+                    summarizer.build_combine_prompt(group),
+                    summarizer.max_output_tokens_per_chunk,
+                    0.3,
+                )
+                for index, groups in batches.items()
+                if len(groups) > 1
+                for i, group in enumerate(groups)
+            ]
+            results = self.runner.run(requests, "reduce")
+            for index, groups in list(batches.items()):
+                if len(groups) == 1:
+                    continue
+                combined = [
+                    results.get(f"{index}:reduce{level}:{i}") for i in range(len(groups))
+                ]
+                if None in combined:
+                    self.failures[book_ids[index]] = "a reduce step failed"
+                    del batches[index]
+                else:
+                    batches[index] = summarizer.group_summaries(combined)
+            level += 1
+
+        results = self.runner.run(
+            (
+                BatchRequest(
+                    f"{index}:master",
+                    summarizer.build_master_prompt(
+                        summarizer.format_summaries(groups[0])
+                    ),
+                    summarizer.master_summary_max_tokens,
+                    0.3,
+                )
+                for index, groups in batches.items()
+            ),
+            "master",
+        )
+        masters = {}
+        for index in batches:
+            master_summary = results.get(f"{index}:master")
+            if master_summary is None:
+                self.failures[book_ids[index]] = "the master summary failed"
+            else:
+                masters[index] = master_summary
+
+        results = self.runner.run(
+            (
+                BatchRequest(
+                    f"{index}:final",
+                    summarizer.build_genz_prompt(master_summary, genz_prompt),
+                    summarizer.final_summary_max_tokens,
+                    0.8,
+                )
+                for index, master_summary in masters.items()
+            ),
+            "style",
+        )
+        for index in masters:
+            self._collect(summaries, book_ids, index, results.get(f"{index}:final"))
+
+        return summaries
+
+    def _collect(
+        self,
+        summaries: Dict[str, str],
+        book_ids: List[str],
+        index: int,
+        summary: Optional[str],
+    ) -> None:
+        """Record a book's final summary, or its failure if there is none."""
+        if summary is None:
+            self.failures[book_ids[index]] = "the Gen Z summary failed"
+        else:
+            summaries[book_ids[index]] = summary
@@ -0,0 +1,114 @@
+"""
+Caching utilities for No Cap BookBot.
+
+Builds the keys model responses are stored under (see `src.storage`): a hash of
+everything that determines the response (prompt text, model name, max_tokens,
+temperature and the tokenizer the book was chunked with), so repeat analyses of
+the same book skip the LLM entirely. Also provides a small in-memory cache for
+values that are expensive to recompute within a process, such as extracted book
+text. It is bounded by total stored size and evicts least recently used entries
+first.
+"""
+
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def make_cache_key(
+    prompt: str, model: str, max_tokens: int, temperature: float, tokenizer: str
+) -> str:
+    """
+    Build a content-addressed cache key for a model request.
+
+    Args:
+        prompt: The full prompt text sent to the model.
+        model: The model name (e.g., "gpt-4o-mini").
+        max_tokens: Maximum number of tokens in the response.
+        temperature: Sampling temperature of the request.
+        tokenizer: Tokenizer the text was measured with (see
+            `chunking.tokenizer_name`).
+
+    Returns:
+        str: Hex SHA-256 digest identifying the request.
+    """
+    payload = json.dumps(
+        {
+            "prompt": prompt,
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "tokenizer": tokenizer,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """
+    Thread-safe, size-bounded in-memory LRU cache.
+
+    Intended to be shared by every Streamlit session in the process. Sizes are
+    measured with `sys.getsizeof`, which is exact for strings and bytes.
+
+    Attributes:
+        max_bytes: Total size of stored values before eviction kicks in.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Create an empty cache.
+
+        Args:
+            max_bytes: Total size of stored values before eviction kicks in.
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a value and mark it as recently used.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached value, or None on a cache miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value, evicting least recently used entries if over budget.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+        """
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+
+            self._entries[key] = (value, size)
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
@@ -0,0 +1,119 @@
+"""
+Cooperative cancellation for No Cap BookBot.
+
+An analysis runs on worker threads long after the script that started it has
+moved on, so when its result is no longer wanted (the user changed the input,
+started another analysis, or closed the tab) it has to be told to stop. Work
+checks a shared `CancellationToken` between steps; anything that blocks for a
+while, such as a wait for the rate limit or a streamed response, waits on the
+token or registers a callback, so it stops as soon as the token is cancelled.
+"""
+
+import contextlib
+import logging
+import threading
+from typing import Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCancelled(Exception):
+    """Raised inside work whose cancellation token has been cancelled."""
+
+
+class CancellationToken:
+    """
+    Lets one thread ask work running on others to stop early.
+
+    A token that is never cancelled costs next to nothing to check, so one is
+    used by default wherever work can be cancelled.
+
+    Attributes:
+        reason: Why the work was cancelled, once it has been.
+    """
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token has been cancelled."""
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """
+        Cancel the token and run the callbacks registered with `on_cancel`.
+
+        Args:
+            reason: Why the work is being cancelled (e.g., "superseded").
+
+        Returns:
+            bool: False if the token had already been cancelled.
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:  # One broken callback mustn't stop the rest
+                logger.warning("Cancellation callback failed: %s", e)
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Stop the calling work if the token has been cancelled.
+
+        Raises:
+            AnalysisCancelled: If the token has been cancelled.
+        """
+        if self._event.is_set():
+            raise AnalysisCancelled(self.reason)
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Wait for `seconds`, or until the token is cancelled.
+
+        Args:
+            seconds: How long to wait.
+
+        Raises:
+            AnalysisCancelled: If the token is cancelled before or while waiting.
+        """
+        if self._event.wait(max(0.0, seconds)):
+            raise AnalysisCancelled(self.reason)
+
+    @contextlib.contextmanager
+    def on_cancel(self, callback: Callable[[], None]) -> Iterator[None]:
+        """
+        Call `callback` if the token is cancelled while the block runs.
+
+        Meant for interrupting blocking work from the cancelling thread, e.g.
+        closing a response stream that another thread is reading.
+
+        Args:
+            callback: Function to call on cancellation; it runs on the thread
+                that cancels the token.
+
+        Yields:
+            None: Once the callback is registered.
+
+        Raises:
+            AnalysisCancelled: If the token has already been cancelled.
+        """
+        with self._lock:
+            self.raise_if_cancelled()
+            self._callbacks.append(callback)
+        try:
+            yield
+        finally:
+            with self._lock:
+                with contextlib.suppress(ValueError):
+                    self._callbacks.remove(callback)
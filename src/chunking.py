@@ -0,0 +1,765 @@
+"""
+Token-aware text chunking for No Cap BookBot.
+
+Measures text in model tokens (using tiktoken when it is available, with a
+character-based estimate as a fallback) and packs paragraphs or sentences into
+chunks that fit a per-model token budget, leaving room for the prompt and the
+model's output. Chunks are recorded as character offsets into the original text
+and only sliced out when they are needed.
+
+Books whose structure is known (chapters from an EPUB table of contents or a PDF
+outline) arrive as streams with `SectionStart` markers, and are packed whole
+section by section instead, so chapters are never cut mid-scene.
+
+Chunk boundaries can also be content-defined: a chunk may end early after a
+paragraph whose hash says so, which depends only on that paragraph. An edit then
+only changes the chunks around it, and every other chunk (and its cached
+summary) comes out exactly as before.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import deque
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from src.storage import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Input context window, in tokens, for the models we know about
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+CHARS_PER_TOKEN = 4  # Rough average for English prose when no tokenizer is available
+SAFETY_MARGIN_TOKENS = 256  # Slack for chat formatting and tokenizer drift
+ENCODING_RETRY_SECONDS = 300  # Wait before trying a tokenizer that failed to load again
+ESTIMATED_TOKENIZER = "estimate"  # Tokenizer name when counts are estimated
+
+# tiktoken downloads its vocabulary files on first use and caches them in a
+# temporary directory; keep them with the other cached files instead, where they
+# survive restarts and can be put ahead of time on hosts without internet access
+os.environ.setdefault("TIKTOKEN_CACHE_DIR", os.path.join(DEFAULT_CACHE_DIR, "tiktoken"))
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+CONTENT_DEFINED_MIN_FILL = 0.7  # Share of a chunk filled before it may end early
+CONTENT_DEFINED_SPREAD = 0.15  # Mean tokens past the minimum, as a share of a chunk
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"'”’)\]])\s+")
+
+
+class SectionStart(NamedTuple):
+    """
+    Marks where a new section (e.g., a chapter) begins in a stream of text pieces.
+
+    Attributes:
+        title: The section's title from the table of contents; may be empty.
+    """
+
+    title: str
+
+
+# A piece of book text, or a marker between sections
+Piece = Union[str, SectionStart]
+
+
+def join_text(pieces: Iterable[Piece]) -> str:
+    """
+    Join a stream of pieces into the full text, dropping section markers.
+
+    Args:
+        pieces: Text pieces, possibly with `SectionStart` markers.
+
+    Returns:
+        str: The concatenated text.
+    """
+    return "".join(piece for piece in pieces if isinstance(piece, str))
+
+
+# Model -> (encoding, or None if it failed to load, and when to try loading again)
+_encodings: Dict[str, Tuple[Any, float]] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str):
+    """
+    Load the tiktoken encoding for a model.
+
+    An encoding that fails to load (e.g., because its vocabulary can't be
+    downloaded) is tried again after `ENCODING_RETRY_SECONDS`, with a warning
+    each time, so a passing network error doesn't estimate every count for the
+    rest of the process.
+
+    Args:
+        model: The model name (e.g., "gpt-4o-mini").
+
+    Returns:
+        The tiktoken Encoding, or None if tiktoken or its vocabulary files are
+        unavailable, in which case token counts are estimated.
+    """
+    entry = _encodings.get(model)
+    if entry is not None and (entry[0] is not None or time.monotonic() < entry[1]):
+        return entry[0]
+
+    with _encodings_lock:
+        entry = _encodings.get(model)
+        if entry is not None and (entry[0] is not None or time.monotonic() < entry[1]):
+            return entry[0]
+        encoding = _load_encoding(model)
+        _encodings[model] = (encoding, time.monotonic() + ENCODING_RETRY_SECONDS)
+    return encoding
+
+
+def _load_encoding(model: str):
+    """Load the tiktoken encoding for a model, or warn and return None."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as error:
+        logger.warning(
+            "Couldn't load the tokenizer for %s, estimating token counts instead: %s",
+            model,
+            error,
+        )
+        return None
+
+
+def tokenizer_name(model: str) -> str:
+    """
+    Name the tokenizer that token counts for a model currently come from.
+
+    Chunk boundaries depend on it, so it is part of the cache key of every
+    request: results chunked with estimated counts aren't served once tiktoken
+    loads, or the other way around.
+
+    Args:
+        model: The model name.
+
+    Returns:
+        str: The tiktoken encoding's name, or `ESTIMATED_TOKENIZER`.
+    """
+    encoding = get_encoding(model)
+    return ESTIMATED_TOKENIZER if encoding is None else encoding.name
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count how many tokens a text uses for the given model.
+
+    Args:
+        text: The text to measure.
+        model: The model name used to pick the tokenizer.
+
+    Returns:
+        int: The exact token count, or an estimate if no tokenizer is available.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def chunk_token_budget(
+    model: str, prompt_tokens: int, output_tokens: int, max_chunk_tokens: int
+) -> int:
+    """
+    Work out how many tokens of book text fit in a single request.
+
+    Args:
+        model: The model name, used to look up its context window.
+        prompt_tokens: Tokens used by the prompt surrounding the text.
+        output_tokens: Tokens reserved for the model's response.
+        max_chunk_tokens: Upper bound on chunk size, regardless of context size.
+
+    Returns:
+        int: The number of text tokens each chunk may contain.
+    """
+    context_tokens = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+    available = context_tokens - prompt_tokens - output_tokens - SAFETY_MARGIN_TOKENS
+    return max(1, min(max_chunk_tokens, available))
+
+
+class TokenChunker:
+    """
+    Packs text into chunks that fit a token budget, breaking on natural boundaries.
+
+    Text is split into paragraphs (or sentences), which are then packed greedily
+    into chunks. Units too large for a single chunk are split into sentences, and
+    sentences that are still too large are cut at token boundaries. Units are
+    tracked as character offsets, so planning never copies the whole text.
+
+    With content-defined boundaries, a chunk that is at least
+    `CONTENT_DEFINED_MIN_FILL` full also ends after any unit whose hash falls
+    under a threshold proportional to its length, so chunks average about
+    `CONTENT_DEFINED_MIN_FILL + CONTENT_DEFINED_SPREAD` of `max_tokens`. After
+    an edit, boundaries fall back into step within a chunk or two.
+
+    Attributes:
+        model: Model name used for token counting.
+        max_tokens: Maximum tokens of text per chunk.
+        overlap_tokens: Approximate tokens repeated from the end of the previous
+            chunk at the start of the next, to maintain narrative continuity.
+            Only used where a chunk boundary falls inside a section.
+        boundary: Preferred unit to break on, either "paragraph" or "sentence".
+        content_defined: Whether chunks may also end at content-defined points,
+            so local edits leave the other chunks unchanged.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_tokens: int,
+        overlap_tokens: int = 0,
+        boundary: str = "paragraph",
+        content_defined: bool = False,
+    ):
+        """
+        Initialize the chunker.
+
+        Args:
+            model: Model name used for token counting.
+            max_tokens: Maximum tokens of text per chunk.
+            overlap_tokens: Approximate tokens of overlap between chunks.
+            boundary: Preferred unit to break on, either "paragraph" or "sentence".
+            content_defined: Whether chunks may also end at content-defined points.
+
+        Raises:
+            ValueError: If `boundary` is not a supported value.
+        """
+        if boundary not in ("paragraph", "sentence"):
+            raise ValueError(f"Unsupported chunk boundary: '{boundary}'")
+
+        self.model = model
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.boundary = boundary
+        self.content_defined = content_defined
+
+    def split(self, text: str) -> List[str]:
+        """
+        Split text into token-budgeted chunks.
+
+        Args:
+            text: The text to split.
+
+        Returns:
+            List[str]: Chunks of text, in order, each within `max_tokens`.
+        """
+        return list(self.plan(text))
+
+    def plan(self, text: str) -> "ChunkPlan":
+        """
+        Work out chunk boundaries without copying any of the text.
+
+        Args:
+            text: The text to split.
+
+        Returns:
+            ChunkPlan: Lazy view over the chunks, each within `max_tokens`.
+        """
+        return self._plan_units(text, self._units(text))
+
+    def _plan_units(
+        self, text: str, units: Iterable[Tuple[int, int, int]]
+    ) -> "ChunkPlan":
+        """
+        Pack measured units of a text into chunks, with overlap between them.
+
+        Args:
+            text: The text the units point into.
+            units: (start, end, tokens) of each unit, in order.
+
+        Returns:
+            ChunkPlan: Lazy view over the chunks, each within `max_tokens`.
+        """
+        boundaries = array("I")
+        packer = _ChunkPacker(self)
+        for start, end, tokens in units:
+            boundaries.extend(packer.add(text, start, end, tokens))
+        boundaries.extend(packer.finish())
+        return ChunkPlan(text, boundaries)
+
+    def iter_chunks(self, pieces: Iterable[Piece]) -> Iterator[str]:
+        """
+        Chunk a stream of text pieces, emitting each chunk as soon as it fills.
+
+        Pieces (pages, chapters, ...) are appended to a buffer, and every unit
+        that later pieces can no longer change (a paragraph followed by the
+        start of another) is packed right away. A chunk is emitted as soon as
+        it is closed, so the chunks are exactly those `plan` would give for the
+        joined text. Paragraphs too long for a chunk are packed sentence by
+        sentence as their sentences complete, so a text with no paragraph
+        breaks still streams.
+
+        Streams that start with a `SectionStart` marker are packed by section
+        instead (see `_iter_section_chunks`). Markers anywhere else are ignored.
+
+        Args:
+            pieces: Consecutive pieces of text, which join to the full text.
+
+        Yields:
+            str: Chunks of text, in order, each within `max_tokens`.
+        """
+        pieces = iter(pieces)
+        first = next(pieces, None)
+        if isinstance(first, SectionStart):
+            yield from self._iter_section_chunks(pieces)
+            return
+
+        pattern = PARAGRAPH_BREAK if self.boundary == "paragraph" else SENTENCE_BREAK
+        packer = _ChunkPacker(self)
+        buffer = first or ""
+        pending = 0  # Start of the text that isn't packed yet
+        long_paragraph = False  # Whether it is packed sentence by sentence
+        # The last sentence break after `pending` with more text after it, and
+        # where to look for later ones
+        sentence_break: Optional[Tuple[int, int]] = None
+        searched = 0
+
+        def pack(units: Iterable[Tuple[int, int, int]]) -> Iterator[str]:
+            for unit in units:
+                closed = packer.add(buffer, *unit)
+                if closed:
+                    yield buffer[closed[0] : closed[1]]
+
+        def pack_complete(last_piece: bool) -> Iterator[str]:
+            nonlocal pending, long_paragraph, sentence_break, searched
+            spans = list(_spans(pattern, buffer, pending, len(buffer)))
+            # The last unit may go on in the next piece
+            unfinished = spans.pop() if spans and not last_piece else None
+            for start, end in spans:
+                if long_paragraph:  # Its first sentences are packed already
+                    yield from pack(self._sentence_units(buffer, start, end))
+                    long_paragraph = False
+                else:
+                    yield from pack(self._span_units(buffer, start, end))
+            if unfinished is None:
+                pending = len(buffer)
+                return
+
+            pending = unfinished[0]
+            if self.boundary != "paragraph":
+                return
+            if not long_paragraph and len(buffer) - pending <= self.max_tokens:
+                return  # Fewer characters than a chunk has tokens
+            if sentence_break is not None and sentence_break[0] < pending:
+                sentence_break = None
+            for match in SENTENCE_BREAK.finditer(buffer, max(pending, searched)):
+                if match.end() < len(buffer):
+                    sentence_break = match.span()
+            # A break may still start in the trailing whitespace
+            searched = len(buffer)
+            while searched > pending and buffer[searched - 1].isspace():
+                searched -= 1
+            if sentence_break is None:
+                return
+            complete = sentence_break[0]  # End of the last sentence that is complete
+            if not long_paragraph and (
+                count_tokens(buffer[pending:complete], self.model) <= self.max_tokens
+            ):
+                return
+            # Too long for one chunk already, so it will be split into sentences
+            long_paragraph = True
+            yield from pack(self._sentence_units(buffer, pending, complete))
+            pending = sentence_break[1]
+
+        for piece in pieces:
+            if isinstance(piece, SectionStart):
+                continue
+            buffer += piece
+            yield from pack_complete(last_piece=False)
+
+            # Drop the text that is packed and no longer in the chunk being filled
+            keep = pending if packer.start is None else min(pending, packer.start)
+            if keep:
+                buffer = buffer[keep:]
+                packer.rebase(keep)
+                pending -= keep
+                searched = max(0, searched - keep)
+                if sentence_break is not None:
+                    sentence_break = (sentence_break[0] - keep, sentence_break[1] - keep)
+
+        yield from pack_complete(last_piece=True)
+        closed = packer.finish()
+        if closed:
+            yield buffer[closed[0] : closed[1]]
+
+    def _iter_section_chunks(self, pieces: Iterator[Piece]) -> Iterator[str]:
+        """
+        Pack whole sections into chunks, emitting each chunk once it is full.
+
+        Consecutive sections share a chunk while they fit in `max_tokens`, so a
+        chapter is only ever cut when it is too long for a chunk on its own, and
+        only then is overlap added. Chunks start and end on section boundaries
+        otherwise, so no text is sent twice.
+
+        Args:
+            pieces: The pieces and markers following the first `SectionStart`.
+
+        Yields:
+            str: Chunks of text, in order, each within `max_tokens`.
+        """
+        packed: List[str] = []
+        packed_tokens = 0  # Tokens of the packed sections, with the joiners between
+        joiner_tokens = count_tokens("\n\n", self.model)
+
+        def close_section(text: str) -> Iterator[str]:
+            nonlocal packed, packed_tokens
+            units = list(self._units(text))
+            if not units:
+                return
+            tokens = sum(unit[2] for unit in units)
+            if packed and packed_tokens + joiner_tokens + tokens > self.max_tokens:
+                yield "\n\n".join(packed)
+                packed, packed_tokens = [], 0
+
+            if tokens <= self.max_tokens:
+                if packed:
+                    packed_tokens += joiner_tokens
+                packed.append(text[units[0][0] : units[-1][1]])
+                packed_tokens += tokens
+            else:
+                yield from self._plan_units(text, units)
+
+        section: List[str] = []
+        for piece in pieces:
+            if isinstance(piece, SectionStart):
+                yield from close_section("".join(section))
+                section = []
+            else:
+                section.append(piece)
+        yield from close_section("".join(section))
+
+        if packed:
+            yield "\n\n".join(packed)
+
+    def _units(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        Break text into (start, end, tokens) spans that each fit a chunk.
+
+        Args:
+            text: The text to break up.
+
+        Yields:
+            Tuple[int, int, int]: Character offsets and token count of each unit,
+                in order.
+        """
+        pattern = PARAGRAPH_BREAK if self.boundary == "paragraph" else SENTENCE_BREAK
+        for start, end in _spans(pattern, text, 0, len(text)):
+            yield from self._span_units(text, start, end)
+
+    def _span_units(
+        self, text: str, start: int, end: int
+    ) -> Iterator[Tuple[int, int, int]]:
+        """
+        Measure one paragraph (or sentence), splitting it up if it is too long.
+
+        Args:
+            text: The full text.
+            start: Offset of the first character of the span.
+            end: Offset just past the last character of the span.
+
+        Yields:
+            Tuple[int, int, int]: Character offsets and token count of each unit.
+        """
+        tokens = count_tokens(text[start:end], self.model)
+        if tokens <= self.max_tokens:
+            yield start, end, tokens
+        else:
+            yield from self._sentence_units(text, start, end)
+
+    def _sentence_units(
+        self, text: str, start: int, end: int
+    ) -> Iterator[Tuple[int, int, int]]:
+        """
+        Measure the sentences of a span, cutting up any that are too long.
+
+        Args:
+            text: The full text.
+            start: Offset of the first character of the span.
+            end: Offset just past the last character of the span.
+
+        Yields:
+            Tuple[int, int, int]: Character offsets and token count of each unit.
+        """
+        for sentence_start, sentence_end in _spans(SENTENCE_BREAK, text, start, end):
+            tokens = count_tokens(text[sentence_start:sentence_end], self.model)
+            if tokens <= self.max_tokens:
+                yield sentence_start, sentence_end, tokens
+            else:
+                yield from self._hard_split(text, sentence_start, sentence_end)
+
+    def _hard_split(
+        self, text: str, start: int, end: int
+    ) -> Iterator[Tuple[int, int, int]]:
+        """
+        Cut a span with no natural boundaries into windows of `max_tokens` tokens.
+
+        Args:
+            text: The full text.
+            start: Offset of the first character of the span.
+            end: Offset just past the last character of the span.
+
+        Yields:
+            Tuple[int, int, int]: Character offsets and token count of each window.
+        """
+        encoding = get_encoding(self.model)
+        if encoding is None:
+            window_chars = self.max_tokens * CHARS_PER_TOKEN
+            for window_start in range(start, end, window_chars):
+                window_end = min(window_start + window_chars, end)
+                yield window_start, window_end, count_tokens(
+                    text[window_start:window_end], self.model
+                )
+            return
+
+        tokens = encoding.encode(text[start:end], disallowed_special=())
+        _, token_offsets = encoding.decode_with_offsets(tokens)
+        for first in range(0, len(tokens), self.max_tokens):
+            last = first + self.max_tokens
+            window_start = start + token_offsets[first]
+            window_end = start + token_offsets[last] if last < len(tokens) else end
+            yield window_start, window_end, len(tokens[first:last])
+
+    def _is_cut_point(self, text: str, start: int, end: int, tokens: int) -> bool:
+        """
+        Decide from its content alone whether a unit may end a chunk.
+
+        Longer units are proportionally more likely to, as if every token were
+        a candidate, so chunk sizes don't depend on paragraph lengths.
+
+        Args:
+            text: The full text.
+            start: Offset of the first character of the unit.
+            end: Offset just past the last character of the unit.
+            tokens: Tokens in the unit.
+
+        Returns:
+            bool: True if the chunk should end after this unit.
+        """
+        spread = max(1.0, self.max_tokens * CONTENT_DEFINED_SPREAD)
+        digest = zlib.crc32(text[start:end].encode("utf-8"))
+        return digest < min(1.0, tokens / spread) * 0xFFFFFFFF
+
+    def _overlap(self, units: deque, room: int) -> deque:
+        """
+        Pick the trailing units of a finished chunk to repeat in the next one.
+
+        Args:
+            units: The units of the chunk that was just completed.
+            room: Tokens left in the next chunk after the unit that starts it.
+
+        Returns:
+            deque: Trailing units totalling at most `overlap_tokens`.
+        """
+        limit = min(self.overlap_tokens, room)
+        overlap: deque = deque()
+        tokens = 0
+        for unit in reversed(units):
+            if tokens + unit[2] > limit:
+                break
+            overlap.appendleft(unit)
+            tokens += unit[2]
+        return overlap
+
+
+class _ChunkPacker:
+    """
+    Packs measured units into chunks one unit at a time, with overlap.
+
+    Shared by `TokenChunker.plan` and `TokenChunker.iter_chunks`, so that a
+    streamed text is cut exactly where the whole text would be.
+
+    Attributes:
+        chunker: The chunker whose budget and boundaries to follow.
+    """
+
+    def __init__(self, chunker: TokenChunker):
+        """
+        Start with an empty chunk.
+
+        Args:
+            chunker: The chunker whose budget and boundaries to follow.
+        """
+        self.chunker = chunker
+        self._current: deque = deque()  # (start, end, tokens) of the chunk's units
+        self._current_tokens = 0
+        self._new_tokens = 0  # Tokens in the chunk besides the overlap
+        self._cut = False  # Whether the last unit ends the chunk early
+
+    @property
+    def start(self) -> Optional[int]:
+        """Offset where the chunk being filled starts, or None if it is empty."""
+        return self._current[0][0] if self._current else None
+
+    def add(self, text: str, start: int, end: int, tokens: int) -> Tuple[int, ...]:
+        """
+        Add the next unit, closing the chunk first if the unit doesn't fit.
+
+        Args:
+            text: The text the unit points into.
+            start: Offset of the first character of the unit.
+            end: Offset just past the last character of the unit.
+            tokens: Tokens in the unit.
+
+        Returns:
+            Tuple[int, ...]: (start, end) offsets of the chunk closed, or an
+                empty tuple if the unit went into the chunk being filled.
+        """
+        chunker = self.chunker
+        closed: Tuple[int, ...] = ()
+        if self._current and (
+            self._cut or self._current_tokens + tokens > chunker.max_tokens
+        ):
+            closed = (self._current[0][0], self._current[-1][1])
+            self._current = chunker._overlap(self._current, chunker.max_tokens - tokens)
+            self._current_tokens = sum(unit[2] for unit in self._current)
+            self._new_tokens = 0
+        self._current.append((start, end, tokens))
+        self._current_tokens += tokens
+        self._new_tokens += tokens
+        self._cut = (
+            chunker.content_defined
+            and self._new_tokens >= chunker.max_tokens * CONTENT_DEFINED_MIN_FILL
+            and chunker._is_cut_point(text, start, end, tokens)
+        )
+        return closed
+
+    def finish(self) -> Tuple[int, ...]:
+        """
+        Close the last chunk.
+
+        Returns:
+            Tuple[int, ...]: Its (start, end) offsets, or an empty tuple if no
+                unit was added since the last chunk closed.
+        """
+        if not self._current:
+            return ()
+        closed = (self._current[0][0], self._current[-1][1])
+        self._current = deque()
+        return closed
+
+    def rebase(self, offset: int) -> None:
+        """
+        Shift the offsets of the chunk being filled, after text before it is dropped.
+
+        Args:
+            offset: Characters dropped from the start of the text.
+        """
+        self._current = deque(
+            (start - offset, end - offset, tokens) for start, end, tokens in self._current
+        )
+
+
+def _spans(
+    pattern: re.Pattern, text: str, start: int, end: int
+) -> Iterator[Tuple[int, int]]:
+    """
+    Find the non-blank pieces of text[start:end] between matches of a pattern.
+
+    Args:
+        pattern: Separator pattern, such as PARAGRAPH_BREAK.
+        text: The full text.
+        start: Offset to start searching from.
+        end: Offset to stop searching at.
+
+    Yields:
+        Tuple[int, int]: Offsets of each piece, with surrounding whitespace trimmed.
+    """
+    piece_start = start
+    for match in pattern.finditer(text, start, end):
+        yield from _trimmed(text, piece_start, match.start())
+        piece_start = match.end()
+    yield from _trimmed(text, piece_start, end)
+
+
+def _trimmed(text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    """
+    Trim whitespace from both ends of a span, skipping it if nothing is left.
+
+    Args:
+        text: The full text.
+        start: Offset of the first character of the span.
+        end: Offset just past the last character of the span.
+
+    Yields:
+        Tuple[int, int]: The trimmed span, if it is not blank.
+    """
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+
+class ChunkPlan:
+    """
+    Lazy, ordered view over the chunks of a text.
+
+    Stores only a pair of character offsets per chunk; a chunk's text is sliced
+    out of the original string when it is accessed.
+
+    Attributes:
+        text: The full text the chunks point into.
+        boundaries: Flattened (start, end) character offsets of every chunk.
+    """
+
+    def __init__(self, text: str, boundaries: array):
+        """
+        Create a view over precomputed chunk boundaries.
+
+        Args:
+            text: The full text the chunks point into.
+            boundaries: Flattened (start, end) character offsets of every chunk.
+        """
+        self.text = text
+        self.boundaries = boundaries
+
+    def __len__(self) -> int:
+        return len(self.boundaries) // 2
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        return self.text[self.boundaries[2 * index] : self.boundaries[2 * index + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def span(self, index: int) -> Tuple[int, int]:
+        """
+        Get the character offsets of a chunk without slicing its text.
+
+        Args:
+            index: The chunk index.
+
+        Returns:
+            Tuple[int, int]: Start and end offsets of the chunk in `text`.
+        """
+        return self.boundaries[2 * index], self.boundaries[2 * index + 1]
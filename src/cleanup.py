@@ -0,0 +1,627 @@
+"""
+Boilerplate removal for No Cap BookBot.
+
+Extracted books carry a lot of text that isn't the story: Project Gutenberg
+license headers and footers, copyright pages, tables of contents, indexes, and
+the running headers, footers and page numbers that PDF extraction returns on
+every page. All of it would otherwise be sent to the model, costing tokens and
+time on every request. This module sits between extraction and summarization
+and drops it, streaming page by page so summarization can still start early.
+It also rejoins words hyphenated across line breaks. `SectionStart` markers
+between chapters are passed through in place.
+
+Every rule is deliberately conservative; when in doubt, text is kept.
+"""
+
+import itertools
+import re
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import (
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from src.chunking import Piece, SectionStart, count_tokens, join_text
+
+GUTENBERG_SEARCH_CHARS = 60_000  # How far into a book the license header may end
+PAGE_WINDOW = 4  # Pages on either side of a page compared for running headers
+EDGE_LINES = 2  # Lines at the top and bottom of a page checked for headers
+MIN_REPEATED_PAGES = 3  # Nearby pages (its own included) a header must be on
+HEADER_PAGE_SHARE = 0.5  # Share of the neighbouring pages a header must be on
+HEADER_MAX_GAP = 2  # Pages to the next copy of a header; 2 allows left/right ones
+MAX_HEADER_CHARS = 80
+MIN_LISTING_LINES = 5  # Consecutive contents or index lines needed to drop them
+FRONT_MATTER_CHARS = 20_000  # Untitled contents are only looked for this early
+MAX_COPYRIGHT_PAGE_WORDS = 300
+MIN_COPYRIGHT_MARKERS = 3  # On one short page; paragraphs need two
+MAX_COPYRIGHT_PARAGRAPH_WORDS = 150
+
+GUTENBERG_START = re.compile(
+    r"\*\*\*\s*START OF (?:THE|THIS) PROJECT GUTENBERG|\*END\*THE SMALL PRINT",
+    re.IGNORECASE,
+)
+GUTENBERG_END = re.compile(
+    r"\*\*\*\s*END OF (?:THE|THIS) PROJECT GUTENBERG"
+    r"|^[ \t]*End of (?:the )?Project Gutenberg",
+    re.IGNORECASE | re.MULTILINE,
+)
+PAGE_NUMBER_LINE = re.compile(
+    r"^\s*(?:(?:page\s+)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?|page\s+[ivxlcdm]{1,7})\s*$",
+    re.IGNORECASE,
+)
+HEADING_LINE = re.compile(r"^\s*(?:chapter|part|book|section|act)\b", re.IGNORECASE)
+CONTENTS_LINE = re.compile(
+    r"^\s*\S.{0,100}?(?:\s*\.{2,}\s*(?:\d{1,4}|[ivxlcdm]{1,7})|\s+\d{1,4})\s*$"
+    r"|^\s*(?:chapter|part|book)\s+(?:\d{1,3}|[ivxlc]{1,7})\b.{0,80}$",
+    re.IGNORECASE,
+)
+INDEX_LINE = re.compile(
+    r"^\s*[^\d\s][^\d]{0,60}[,:]\s*\d{1,4}(?:\s*[-–]\s*\d{1,4})?"
+    r"(?:\s*,\s*\d{1,4}(?:\s*[-–]\s*\d{1,4})?)*\.?\s*$"
+    r"|^\s*[^\d\s].{0,60}\bsee also\b.*$",
+    re.IGNORECASE,
+)
+LISTING_TITLE = re.compile(
+    r"^\s*(?:(?:table of )?contents|index)\s*$", re.IGNORECASE
+)
+CONTENTS_TITLE = re.compile(r"^\s*(?:table of )?contents\s*$", re.IGNORECASE)
+COPYRIGHT_MARKERS = (  # Lowercase; matched by substring, which is much faster
+    "copyright",
+    "©",
+    "all rights reserved",
+    "isbn",
+    "library of congress",
+    "printed in",
+    "first published",
+    "cataloging-in-publication",
+    "cataloging in publication",
+)
+LINE_BREAK_HYPHEN = re.compile(r"\b([A-Za-z]+)-[ \t]*\n[ \t]*([a-z]+)")
+TRAILING_HYPHEN = re.compile(r"([A-Za-z]+)-[ \t]*\n?$")
+LEADING_WORD = re.compile(r"^[ \t]*([a-z]+)")
+WORD = re.compile(r"[A-Za-z]+")
+COMPOUND_PREFIXES = frozenset(("self", "well", "ill", "half", "quasi", "great"))
+PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n)")
+DIGITS = re.compile(r"\d+")
+
+
+# A normalized edge line, and whether it is at the "top" or "bottom" of its page
+EdgeKey = Tuple[str, str]
+
+
+class _Page(NamedTuple):
+    """A page held back for header detection, with its header candidates."""
+
+    lines: List[str]
+    edge_keys: FrozenSet[EdgeKey]
+
+
+@dataclass
+class CleanupReport:
+    """
+    What cleanup removed from a book.
+
+    Attributes:
+        model: Model whose tokenizer measures the savings.
+        tokens_saved: Tokens that no longer reach the model.
+        characters_removed: Characters removed, by reason.
+        hyphens_rejoined: Words rejoined across line breaks.
+    """
+
+    model: str = "gpt-4o-mini"
+    tokens_saved: int = 0
+    characters_removed: Dict[str, int] = field(default_factory=Counter)
+    hyphens_rejoined: int = 0
+
+    def remove(self, reason: str, text: str) -> None:
+        """
+        Account for a piece of text being dropped.
+
+        Args:
+            reason: Why it was dropped (e.g., "gutenberg", "running_header").
+            text: The dropped text.
+        """
+        if text.strip():
+            self.characters_removed[reason] += len(text)
+            self.tokens_saved += count_tokens(text, self.model)
+
+    def rejoin(self, before: str, after: str) -> None:
+        """
+        Account for a hyphenated word being rejoined.
+
+        Args:
+            before: The word as extracted, hyphen and line break included.
+            after: The rejoined word.
+        """
+        self.hyphens_rejoined += 1
+        self.tokens_saved += max(
+            0, count_tokens(before, self.model) - count_tokens(after, self.model)
+        )
+
+    def add(self, other: "CleanupReport") -> None:
+        """
+        Add another report's counts to this one.
+
+        Args:
+            other: The report to add.
+        """
+        self.tokens_saved += other.tokens_saved
+        self.characters_removed.update(other.characters_removed)
+        self.hyphens_rejoined += other.hyphens_rejoined
+
+    def to_dict(self) -> Dict:
+        """The report as plain JSON-serializable values."""
+        return {
+            "tokens_saved": self.tokens_saved,
+            "characters_removed": dict(self.characters_removed),
+            "hyphens_rejoined": self.hyphens_rejoined,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, model: str = "gpt-4o-mini") -> "CleanupReport":
+        """
+        Rebuild a report from `to_dict` output.
+
+        Args:
+            data: The report's values.
+            model: Model whose tokenizer measured the savings.
+
+        Returns:
+            CleanupReport: The report.
+        """
+        return cls(
+            model,
+            data["tokens_saved"],
+            Counter(data["characters_removed"]),
+            data["hyphens_rejoined"],
+        )
+
+
+def clean_text(book_text: str, report: Optional[CleanupReport] = None) -> str:
+    """
+    Remove boilerplate from a complete book text.
+
+    Args:
+        book_text: The book text.
+        report: Optional report to record what was removed on.
+
+    Returns:
+        str: The cleaned text.
+    """
+    return "".join(clean_pieces([book_text], report))
+
+
+def clean_pieces(
+    pieces: Iterable[Piece], report: Optional[CleanupReport] = None
+) -> Iterator[Piece]:
+    """
+    Remove boilerplate from a book arriving as a stream of pieces.
+
+    Pieces are treated as pages (PDF pages or EPUB documents); running headers
+    and footers are only detected across pieces. A line at the top or bottom
+    of a page is a running header if the same line (up to page numbers) sits
+    at the same edge of at least half of the `PAGE_WINDOW` pages on either
+    side, including one of the next pages or so, so it must recur steadily
+    rather than now and then across the book. The following pages are held
+    back so headers can be recognized on the first pages too. Section markers
+    keep their place between pages.
+
+    Args:
+        pieces: Consecutive pieces of the book text, e.g. from `extract.iter_text`.
+        report: Optional report to record what was removed on.
+
+    Yields:
+        Piece: Consecutive pieces of the cleaned text, and the section markers.
+    """
+    report = report if report is not None else CleanupReport()
+    pages = _strip_gutenberg(iter(pieces), report)
+
+    window: Deque[Union[_Page, SectionStart]] = deque()
+    held = 0  # Pages in the window, not counting section markers
+    # Header candidates of the pages already emitted, the most recent last
+    preceding: Deque[FrozenSet[EdgeKey]] = deque(maxlen=PAGE_WINDOW)
+    carry = ""  # Start of a word hyphenated across a page break
+    vocabulary: Set[str] = set()  # Words of the pages read so far, lowercase
+    position = 0  # Characters of the book before the page being emitted
+    in_contents = False  # Whether the last page ended inside a table of contents
+
+    def emit(item: Union[_Page, SectionStart]) -> Iterator[Piece]:
+        nonlocal carry, position, in_contents
+        if isinstance(item, SectionStart):
+            if carry:  # Words don't continue into the next chapter
+                yield carry + "-\n"
+                carry = ""
+            yield item
+            return
+
+        following = [page.edge_keys for page in window if isinstance(page, _Page)]
+        lines = _drop_running_headers(
+            item.lines, list(reversed(preceding)), following, report
+        )
+        preceding.append(item.edge_keys)
+        lines, in_contents = _drop_listings(lines, report, position, in_contents)
+        position += sum(map(len, item.lines))
+        page = _clean_page(lines, report, vocabulary)
+        if carry:
+            match = LEADING_WORD.match(page)
+            if match:
+                word = _rejoin_word(carry, match.group(1), vocabulary)
+                report.rejoin(carry + "-\n" + match.group(1), word)
+                page = word + page[match.end(1) :]
+            else:
+                page = carry + "-\n" + page
+            carry = ""
+
+        match = TRAILING_HYPHEN.search(page, max(0, len(page) - MAX_HEADER_CHARS))
+        if match:
+            carry = match.group(1)
+            page = page[: match.start()]
+        if page:
+            yield page
+
+    for page in pages:
+        if isinstance(page, SectionStart):
+            window.append(page)
+            continue
+
+        # Halves of words split across lines aren't words of the book
+        whole = TRAILING_HYPHEN.sub("", LINE_BREAK_HYPHEN.sub(" ", page))
+        vocabulary.update(word.lower() for word in WORD.findall(whole))
+        lines = page.splitlines(keepends=True)
+        window.append(_Page(lines, _edge_keys(lines)))
+        held += 1
+        while held > PAGE_WINDOW:
+            item = window.popleft()
+            held -= not isinstance(item, SectionStart)
+            yield from emit(item)
+
+    while window:
+        yield from emit(window.popleft())
+    if carry:
+        yield carry + "-\n"
+
+
+def _strip_gutenberg(pieces: Iterator[Piece], report: CleanupReport) -> Iterator[Piece]:
+    """
+    Drop the Project Gutenberg license header and footer, if there are any.
+
+    Pieces are held back until the header's end marker is found, or until
+    `GUTENBERG_SEARCH_CHARS` have gone by without one. Section markers inside
+    the license text are dropped with it, except for the last one before the
+    header's end, which then starts the book.
+
+    Args:
+        pieces: Consecutive pieces of the book text.
+        report: Report to record what was removed on.
+
+    Yields:
+        Piece: The pieces between the markers, or every piece if there are none.
+    """
+    head: List[Piece] = []
+    head_chars = 0
+    for piece in pieces:
+        head.append(piece)
+        if isinstance(piece, SectionStart):
+            continue
+        head_chars += len(piece)
+        text = join_text(head)
+        match = GUTENBERG_START.search(text, 0, GUTENBERG_SEARCH_CHARS)
+        if match:
+            header_end = _line_end(text, match.end())
+            report.remove("gutenberg", text[:header_end])
+            rest = _cut_head(head, header_end)
+            break
+        if head_chars >= GUTENBERG_SEARCH_CHARS:
+            yield from head
+            yield from pieces
+            return
+    else:
+        yield from head
+        return
+
+    # Everything after the footer marker is license text; keep reading so the
+    # extractor finishes, but send none of it on
+    for piece in itertools.chain(rest, pieces):
+        match = None if isinstance(piece, SectionStart) else GUTENBERG_END.search(piece)
+        if match:
+            footer_start = piece.rfind("\n", 0, match.start()) + 1
+            report.remove("gutenberg", piece[footer_start:])
+            if piece[:footer_start]:
+                yield piece[:footer_start]
+            for remaining in pieces:
+                if not isinstance(remaining, SectionStart):
+                    report.remove("gutenberg", remaining)
+            return
+        yield piece
+
+
+def _cut_head(head: List[Piece], cut: int) -> List[Piece]:
+    """
+    Drop the first `cut` characters of text from a list of pieces.
+
+    Args:
+        head: Pieces and section markers, in order.
+        cut: Number of characters of text to drop.
+
+    Returns:
+        List[Piece]: The remaining pieces, led by the last marker that was cut.
+    """
+    section = []
+    rest: List[Piece] = []
+    offset = 0
+    for piece in head:
+        if isinstance(piece, SectionStart):
+            if offset < cut:
+                section = [piece]
+            else:
+                rest.append(piece)
+            continue
+        end = offset + len(piece)
+        if end > cut:
+            rest.append(piece[max(0, cut - offset) :])
+        offset = end
+    return section + rest
+
+
+def _line_end(text: str, position: int) -> int:
+    """Index just past the end of the line containing `position`."""
+    end = text.find("\n", position)
+    return len(text) if end == -1 else end + 1
+
+
+def _edge_lines(lines: List[str]) -> Tuple[List[int], List[int]]:
+    """Indexes of the non-blank lines at the top and at the bottom of a page."""
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    return content[:EDGE_LINES], content[-EDGE_LINES:]
+
+
+def _edge_keys(lines: List[str]) -> FrozenSet[EdgeKey]:
+    """Normalized header candidates at the top and bottom of a page."""
+    top, bottom = _edge_lines(lines)
+    if len(set(top + bottom)) < 2 * EDGE_LINES or not any(
+        line.strip() for line in lines[top[-1] + 1 : bottom[0]]
+    ):
+        return frozenset()  # Too short to tell its edges from its body
+    return frozenset(
+        (edge, _header_key(lines[i]))
+        for edge, indexes in (("top", top), ("bottom", bottom))
+        for i in indexes
+        if len(lines[i].strip()) <= MAX_HEADER_CHARS and not HEADING_LINE.match(lines[i])
+    )
+
+
+def _header_key(line: str) -> str:
+    """Normalize a line so headers differing only by page number match."""
+    return DIGITS.sub("#", " ".join(line.lower().split()))
+
+
+def _is_running_header(
+    key: EdgeKey,
+    preceding: List[FrozenSet[EdgeKey]],
+    following: List[FrozenSet[EdgeKey]],
+) -> bool:
+    """
+    Decide whether an edge line repeats on enough of the pages around it.
+
+    Args:
+        key: The line's edge and normalized text.
+        preceding: Header candidates of the previous pages, nearest first.
+        following: Header candidates of the next pages, nearest first.
+
+    Returns:
+        bool: True if the line is on at least `HEADER_PAGE_SHARE` of the
+            neighbouring pages, `MIN_REPEATED_PAGES` in all, and again within
+            `HEADER_MAX_GAP` pages.
+    """
+    # Pages too short to have edge lines (e.g., ends of chapters) don't count
+    preceding = [keys for keys in preceding if keys]
+    following = [keys for keys in following if keys]
+    neighbours = preceding + following
+    repeats = sum(key in keys for keys in neighbours)
+    # Rounded down, so left and right headers at the ends of a book still count
+    share = int(HEADER_PAGE_SHARE * len(neighbours))
+    if repeats + 1 < MIN_REPEATED_PAGES or repeats < share:
+        return False
+    nearby = preceding[:HEADER_MAX_GAP] + following[:HEADER_MAX_GAP]
+    return any(key in keys for keys in nearby)
+
+
+def _drop_running_headers(
+    lines: List[str],
+    preceding: List[FrozenSet[EdgeKey]],
+    following: List[FrozenSet[EdgeKey]],
+    report: CleanupReport,
+) -> List[str]:
+    """
+    Drop page numbers and repeated header and footer lines from a page.
+
+    Args:
+        lines: Lines of the page, with line endings.
+        preceding: Header candidates of the previous pages, nearest first.
+        following: Header candidates of the next pages, nearest first.
+        report: Report to record what was removed on.
+
+    Returns:
+        List[str]: The remaining lines.
+    """
+    top, bottom = _edge_lines(lines)
+    kept = []
+    for i, line in enumerate(lines):
+        edges = [edge for edge, indexes in (("top", top), ("bottom", bottom)) if i in indexes]
+        if edges:
+            if PAGE_NUMBER_LINE.match(line):
+                report.remove("page_number", line)
+                continue
+            if (
+                len(line.strip()) <= MAX_HEADER_CHARS
+                and not HEADING_LINE.match(line)
+                and any(
+                    _is_running_header((edge, _header_key(line)), preceding, following)
+                    for edge in edges
+                )
+            ):
+                report.remove("running_header", line)
+                continue
+        kept.append(line)
+    return kept
+
+
+def _clean_page(lines: List[str], report: CleanupReport, vocabulary: Set[str]) -> str:
+    """
+    Drop copyright text from a page and rejoin hyphenated words.
+
+    Args:
+        lines: Lines of the page, with line endings.
+        report: Report to record what was removed on.
+        vocabulary: Words of the book so far, lowercase.
+
+    Returns:
+        str: The cleaned page.
+    """
+    page = "".join(lines)
+    markers = _count_copyright_markers(page)
+    if not markers:
+        return _rejoin_hyphens(page, report, vocabulary)
+
+    if (
+        markers >= MIN_COPYRIGHT_MARKERS
+        and len(page.split()) <= MAX_COPYRIGHT_PAGE_WORDS
+    ):
+        report.remove("front_matter", page)
+        return ""
+
+    parts = PARAGRAPH_BREAK.split(page)
+    for i in range(0, len(parts), 2):
+        paragraph = parts[i]
+        if (
+            _count_copyright_markers(paragraph) >= 2
+            and len(paragraph.split()) <= MAX_COPYRIGHT_PARAGRAPH_WORDS
+        ):
+            report.remove("front_matter", paragraph)
+            parts[i] = ""
+    return _rejoin_hyphens("".join(parts), report, vocabulary)
+
+
+def _count_copyright_markers(text: str) -> int:
+    """Count the copyright-page phrases in a text."""
+    lowered = text.lower()
+    return sum(lowered.count(marker) for marker in COPYRIGHT_MARKERS)
+
+
+def _rejoin_hyphens(page: str, report: CleanupReport, vocabulary: Set[str]) -> str:
+    """Rejoin words hyphenated across line breaks within a page."""
+
+    def rejoin(match: re.Match) -> str:
+        word = _rejoin_word(match.group(1), match.group(2), vocabulary)
+        report.rejoin(match.group(0), word)
+        return word
+
+    return LINE_BREAK_HYPHEN.sub(rejoin, page)
+
+
+def _rejoin_word(first: str, second: str, vocabulary: Set[str]) -> str:
+    """
+    Rejoin the halves of a word hyphenated across a line break.
+
+    The hyphen is dropped when it only splits syllables, and kept in compound
+    words such as "well-known". Without a dictionary, the book's own words
+    decide: if the joined word occurs in it, the halves are joined; otherwise
+    the hyphen stays if the first half is a compound prefix ("self", "half",
+    ...) or both halves are words of the book.
+
+    Args:
+        first: The part before the hyphen.
+        second: The part on the next line.
+        vocabulary: Words of the book so far, lowercase.
+
+    Returns:
+        str: The word, with or without its hyphen.
+    """
+    joined = first + second
+    if joined.lower() in vocabulary:
+        return joined
+    lowered = first.lower()
+    if lowered in COMPOUND_PREFIXES or (lowered in vocabulary and second in vocabulary):
+        return first + "-" + second
+    return joined
+
+
+def _drop_listings(
+    lines: List[str], report: CleanupReport, position: int = 0, in_contents: bool = False
+) -> Tuple[List[str], bool]:
+    """
+    Drop runs of table-of-contents or index entries, with their title.
+
+    A run is at least `MIN_LISTING_LINES` lines shaped like contents entries
+    (ending in a page number, or "Chapter N ...") or index entries ("term, 12,
+    45-47"), separated by at most one blank line. Plenty of prose lines end in
+    a number too ("He was born in 1912"), so a contents run is only dropped
+    under a "Contents" title, within the first `FRONT_MATTER_CHARS` of the
+    book, or at the top of a page continuing a table of contents.
+
+    Args:
+        lines: Lines of the page, with line endings.
+        report: Report to record what was removed on.
+        position: Characters of the book before the page.
+        in_contents: Whether the previous page ended inside a table of contents.
+
+    Returns:
+        Tuple[List[str], bool]: The remaining lines, and whether the page ends
+            inside a table of contents.
+    """
+    drop = [False] * len(lines)
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    offsets = list(itertools.accumulate(map(len, lines), initial=position))
+    ends_in_contents = False
+
+    def drop_run(run: List[int], reason: str) -> None:
+        nonlocal ends_in_contents
+        if len(run) < MIN_LISTING_LINES:
+            return
+        start = run[0]
+        title = start - 1  # The nearest non-blank line above the run
+        while title >= 0 and not lines[title].strip():
+            title -= 1
+        titled = title >= 0 and LISTING_TITLE.match(lines[title]) is not None
+        if reason == "contents" and not (
+            (titled and CONTENTS_TITLE.match(lines[title]))
+            or offsets[start] < FRONT_MATTER_CHARS
+            or (in_contents and start == content[0])
+        ):
+            return
+        if titled:
+            start = title
+        if reason == "contents" and run[-1] == content[-1]:
+            ends_in_contents = True
+        for j in range(start, run[-1] + 1):
+            if not drop[j]:
+                drop[j] = True
+                report.remove(reason, lines[j])
+
+    for pattern, reason in ((CONTENTS_LINE, "contents"), (INDEX_LINE, "index")):
+        run: List[int] = []
+        blanks = 0
+        for i, line in enumerate(lines):
+            if not line.strip():
+                blanks += 1
+                continue
+            matches = pattern.match(line) is not None
+            if run and (not matches or blanks >= 2):
+                drop_run(run, reason)
+                run = []
+            if matches:
+                run.append(i)
+            blanks = 0
+        drop_run(run, reason)
+
+    return [line for line, dropped in zip(lines, drop) if not dropped], ends_in_contents
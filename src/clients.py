@@ -0,0 +1,181 @@
+"""
+Shared OpenAI clients for No Cap BookBot.
+
+Creating an `openai.OpenAI` client also creates an HTTP connection pool, so a new
+client per analysis pays for a fresh TLS handshake and throws away warm
+keep-alive connections. Clients are instead kept in a process-wide registry, one
+per API key and endpoint, with bounded connection pools and HTTP/2 when the `h2`
+package is installed. Clients that go unused for a while are closed.
+
+API keys are only ever held by the clients themselves; the registry is keyed by
+a hash of the key, which is safe to log.
+"""
+
+import hashlib
+import importlib.util
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import openai
+
+try:
+    import httpx2 as httpx  # Newer SDK releases are built on httpx2
+except ImportError:
+    import httpx
+
+MAX_CONNECTIONS = 64  # Open sockets per client, i.e. per API key
+MAX_KEEPALIVE_CONNECTIONS = 32
+KEEPALIVE_EXPIRY_SECONDS = 120.0
+CONNECT_TIMEOUT_SECONDS = 10.0
+REQUEST_TIMEOUT_SECONDS = 600.0  # Long chunk summaries can take minutes
+CLIENT_IDLE_SECONDS = 15 * 60  # Close clients unused for this long
+EVICTION_INTERVAL_SECONDS = 60.0
+
+
+def hash_api_key(api_key: str) -> str:
+    """
+    Hash an API key so it can be used as an identifier without revealing it.
+
+    Args:
+        api_key: The API key.
+
+    Returns:
+        str: Hex SHA-256 digest of the key.
+    """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def http2_available() -> bool:
+    """
+    Check whether httpx can speak HTTP/2 (it needs the optional `h2` package).
+
+    Returns:
+        bool: True if HTTP/2 can be enabled.
+    """
+    return importlib.util.find_spec("h2") is not None
+
+
+class ClientRegistry:
+    """
+    Thread-safe registry of OpenAI clients, one per API key and endpoint.
+
+    Attributes:
+        idle_seconds: How long a client may go unused before it is closed.
+        limits: Connection pool limits for every client.
+        http2: Whether clients negotiate HTTP/2.
+    """
+
+    def __init__(
+        self,
+        idle_seconds: float = CLIENT_IDLE_SECONDS,
+        limits: Optional[httpx.Limits] = None,
+    ):
+        """
+        Create an empty registry.
+
+        Args:
+            idle_seconds: How long a client may go unused before it is closed.
+            limits: Connection pool limits for every client; defaults to
+                `MAX_CONNECTIONS` sockets per client.
+        """
+        self.idle_seconds = idle_seconds
+        self.limits = limits or httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        )
+        self.http2 = http2_available()
+        self._clients: Dict[Tuple[str, Optional[str]], list] = {}
+        self._last_eviction = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str, base_url: Optional[str] = None) -> openai.OpenAI:
+        """
+        Get the shared client for an API key, creating it on first use.
+
+        Every call counts as a use, so callers should fetch the client for each
+        request rather than holding on to it.
+
+        Args:
+            api_key: OpenAI API key for authentication.
+            base_url: Optional OpenAI-compatible API endpoint.
+
+        Returns:
+            openai.OpenAI: A client with a warm, bounded connection pool.
+        """
+        key = (hash_api_key(api_key), base_url)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_eviction >= EVICTION_INTERVAL_SECONDS:
+                self._evict_idle(now)
+
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = [self._create(api_key, base_url), now]
+                self._clients[key] = entry
+            entry[1] = now
+            return entry[0]
+
+    def evict_idle(self) -> int:
+        """
+        Close every client that has been unused for `idle_seconds`.
+
+        Returns:
+            int: Number of clients closed.
+        """
+        with self._lock:
+            return self._evict_idle(time.monotonic())
+
+    def close(self) -> None:
+        """Close every client."""
+        with self._lock:
+            for client, _ in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def _create(self, api_key: str, base_url: Optional[str]) -> openai.OpenAI:
+        """Create a client with the registry's connection settings."""
+        http_client = openai.DefaultHttpxClient(
+            limits=self.limits,
+            http2=self.http2,
+            timeout=httpx.Timeout(
+                REQUEST_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS
+            ),
+        )
+        # Retries are handled by the request scheduler, which sees every request
+        return openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=http_client,
+        )
+
+    def _evict_idle(self, now: float) -> int:
+        """Close idle clients; the caller must hold the lock."""
+        self._last_eviction = now
+        idle = [
+            key
+            for key, (_, last_used) in self._clients.items()
+            if now - last_used >= self.idle_seconds
+        ]
+        for key in idle:
+            self._clients.pop(key)[0].close()
+        return len(idle)
+
+
+_registry = ClientRegistry()
+
+
+def get_client(api_key: str, base_url: Optional[str] = None) -> openai.OpenAI:
+    """
+    Get the process-wide shared client for an API key.
+
+    Args:
+        api_key: OpenAI API key for authentication.
+        base_url: Optional OpenAI-compatible API endpoint.
+
+    Returns:
+        openai.OpenAI: The shared client.
+    """
+    return _registry.get(api_key, base_url)
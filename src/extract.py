@@ -2,19 +2,73 @@
 Text extraction module for No Cap BookBot.
 
 This module handles extracting text content from various file formats including
-EPUB, PDF, and TXT files uploaded through the Streamlit interface.
+EPUB, PDF, and TXT files uploaded through the Streamlit interface. Extractors are
+generators that yield text page by page (PDF) or document by document (EPUB), so
+summarization can start before a large file has been fully parsed. When asked,
+they also mark where chapters begin (from the EPUB table of contents or the PDF
+outline) with `SectionStart` markers, so chunking can keep chapters whole.
+Extracted text is cached in memory by a hash of the file contents, so each unique
+file is only parsed once per process no matter how often the script reruns. Given
+a shared result store (see `src.storage`), it is also read through and written to
+the store, so a file parsed by one replica of the app isn't parsed by the others.
 """
 
+import contextlib
+import hashlib
+import json
+import multiprocessing
 import os
+import posixpath
 import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from html.parser import HTMLParser
 from io import BytesIO
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+from xml.etree import ElementTree
 
-import ebooklib
 import pymupdf
 import streamlit as st
-from bs4 import BeautifulSoup
-from ebooklib import epub
+
+try:
+    import lxml.html
+except ImportError:  # Fall back to the streaming stdlib parser
+    lxml = None
+
+from src.cache import MemoryCache
+from src.chunking import Piece, SectionStart, join_text
+from src.cleanup import CleanupReport, clean_pieces
+from src.metrics import timed_iterator
+from src.storage import Storage
+
+EXTRACTION_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Extracted text kept across reruns
+PARALLEL_PDF_PAGE_THRESHOLD = 200  # Smaller PDFs are extracted in a single thread
+PDF_PAGES_PER_TASK = 100  # Upper bound on pages per worker task, for streaming
+PDF_WORKERS = os.cpu_count() or 1
+EPUB_DOCUMENT_TYPES = {"application/xhtml+xml", "text/html"}
+EPUB_OPS_TYPE = "{http://www.idpf.org/2007/ops}type"
+MIN_TOC_SECTIONS = 2  # A table of contents level with fewer entries is skipped
+
+FileType = Enum("FileType", ["EPUB", "PDF", "TXT"])
+SUPPORTED_FILE_TYPES = {
+    ".epub": FileType.EPUB,
+    ".pdf": FileType.PDF,
+    ".txt": FileType.TXT,
+}
+
+# Shared by every session in the process; keyed by file type and content hash
+_extraction_cache = MemoryCache(EXTRACTION_CACHE_MAX_BYTES)
+
+# Worker processes for large PDFs, created on first use and shared by all sessions
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+class ExtractionError(Exception):
+    """Raised when a file cannot be parsed or contains no text."""
 
 
 def extract_text_from_upload(uploaded_file) -> str | None:
@@ -23,6 +77,8 @@ def extract_text_from_upload(uploaded_file) -> str | None:
 
     Automatically detects the file type based on extension and routes to the
     appropriate extraction function. Supports EPUB, PDF, and TXT formats.
+    Results are cached by a hash of the file contents, so re-uploading or
+    rerunning with the same file skips parsing entirely.
 
     Args:
         uploaded_file: Streamlit UploadedFile object containing the file data.
@@ -33,92 +89,574 @@ def extract_text_from_upload(uploaded_file) -> str | None:
     if uploaded_file is None:
         return None
 
-    FileType = Enum("FileType", ["EPUB", "PDF", "TXT"])
-    supported_file_types = {
-        ".epub": FileType.EPUB,
-        ".pdf": FileType.PDF,
-        ".txt": FileType.TXT,
-    }
+    extension = _file_extension(uploaded_file)
+    if extension not in SUPPORTED_FILE_TYPES:
+        st.error(f"❌ Unsupported file type: '{extension}'")
+        st.info("📄 Supported formats: " + ", ".join(SUPPORTED_FILE_TYPES.keys()))
+        return None
+
+    try:
+        return join_text(iter_text_from_upload(uploaded_file))
+
+    except ExtractionError as e:
+        st.error(f"❌ {str(e)}")
+        return None
+
+
+def get_cached_text(uploaded_file, storage: Optional[Storage] = None) -> str | None:
+    """
+    Get the extracted text of an upload if it has already been parsed.
+
+    Args:
+        uploaded_file: Streamlit UploadedFile object containing the file data.
+        storage: Optional shared store to look in if this process hasn't
+            parsed the file.
+
+    Returns:
+        str: The cached text, or None if the file has not been extracted yet.
+    """
+    if uploaded_file is None:
+        return None
+    cache_key = _cache_key(uploaded_file)
+    _load_extraction(cache_key, storage)
+    return _extraction_cache.get(cache_key)
 
+
+def iter_text_from_upload(
+    uploaded_file,
+    report: Optional[CleanupReport] = None,
+    storage: Optional[Storage] = None,
+) -> Iterator[Piece]:
+    """
+    Extract text content from an uploaded file as a stream of pieces.
+
+    Yields text as soon as each page or document is parsed, with boilerplate
+    such as license text and running headers removed (see `src.cleanup`), and a
+    `SectionStart` marker before each chapter of books with a table of contents.
+    Once the whole file has been read, the cleaned text and where its sections
+    start are cached, and later calls yield one piece per section.
+
+    Args:
+        uploaded_file: Streamlit UploadedFile object containing the file data.
+        report: Optional report to record the removed boilerplate on; cached
+            files report what was removed when they were first read.
+        storage: Optional shared store the extraction is read from and
+            written to, alongside the in-memory cache.
+
+    Yields:
+        Piece: Consecutive pieces of the file's text, which join to the full
+            text, and the markers between its sections.
+
+    Raises:
+        ExtractionError: If the file type is unsupported, the file cannot be
+            parsed, or it contains no text.
+    """
+    extension = _file_extension(uploaded_file)
+    if extension not in SUPPORTED_FILE_TYPES:
+        raise ExtractionError(f"Unsupported file type: '{extension}'")
+
+    cache_key = _cache_key(uploaded_file)
+    _load_extraction(cache_key, storage)
+    cached_text = _extraction_cache.get(cache_key)
+    if cached_text is not None:
+        cached_report = _extraction_cache.get(cache_key + ":cleanup")
+        if report is not None and cached_report is not None:
+            report.add(cached_report)
+        sections = _extraction_cache.get(cache_key + ":sections") or ()
+        yield from _split_sections(cached_text, sections)
+        return
+
+    file_report = CleanupReport()
+    pieces = []
+    sections = []  # (offset, title) of each section in the cleaned text
+    offset = 0
+    raw_pieces = iter_text(uploaded_file.getvalue(), extension, sections=True)
+    for piece in clean_pieces(raw_pieces, file_report):
+        if isinstance(piece, SectionStart):
+            sections.append((offset, piece.title))
+        else:
+            pieces.append(piece)
+            offset += len(piece)
+        yield piece
+
+    text = "".join(pieces)
+    _extraction_cache.set(cache_key, text)
+    _extraction_cache.set(cache_key + ":cleanup", file_report)
+    _extraction_cache.set(cache_key + ":sections", tuple(sections))
+    if storage is not None:
+        value = {"text": text, "sections": sections, "cleanup": file_report.to_dict()}
+        storage.set("extraction:" + cache_key, json.dumps(value))
+    if report is not None:
+        report.add(file_report)
+
+
+def iter_text_from_file(path: str, sections: bool = False) -> Iterator[Piece]:
+    """
+    Extract text content from a file on disk as a stream of pieces.
+
+    Used by headless tools; unlike uploads, results are not cached.
+
+    Args:
+        path: Path to an EPUB, PDF, or TXT file.
+        sections: Whether to mark where chapters begin with `SectionStart`.
+
+    Yields:
+        Piece: Consecutive pieces of the file's text, which join to the full
+            text, and the markers between its sections if requested.
+
+    Raises:
+        ExtractionError: If the file type is unsupported, the file cannot be
+            read or parsed, or it contains no text.
+    """
     try:
-        extension = os.path.splitext(uploaded_file.name)[1].lower()
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError as e:
+        raise ExtractionError(f"Could not read '{path}': {str(e)}") from e
+
+    yield from iter_text(data, os.path.splitext(path)[1].lower(), sections)
+
 
-        if extension not in supported_file_types:
-            st.error(f"❌ Unsupported file type: '{extension}'")
-            st.info("📄 Supported formats: " + ", ".join(supported_file_types.keys()))
-            return None
+def iter_text(data: bytes, extension: str, sections: bool = False) -> Iterator[Piece]:
+    """
+    Extract text content from raw file bytes as a stream of pieces.
+
+    Args:
+        data: The raw file bytes.
+        extension: Lowercased file extension used to pick the parser (e.g., ".pdf").
+        sections: Whether to mark where chapters begin with `SectionStart`.
+            Only EPUBs with a table of contents and PDFs with an outline have
+            sections; plain text never does.
+
+    Yields:
+        Piece: Consecutive pieces of the file's text, which join to the full
+            text, and the markers between its sections if requested.
+
+    Raises:
+        ExtractionError: If the file type is unsupported, the file cannot be
+            parsed, or it contains no text.
+    """
+    if extension not in SUPPORTED_FILE_TYPES:
+        raise ExtractionError(f"Unsupported file type: '{extension}'")
 
-        uploaded_file_type = supported_file_types[extension]
-        match uploaded_file_type:
+    file_type = SUPPORTED_FILE_TYPES[extension]
+    has_text = False
+    try:
+        match file_type:
             case FileType.EPUB:
-                return extract_text_from_epub(uploaded_file)
+                stream = iter_epub_text(data, sections)
             case FileType.PDF:
-                return extract_text_from_pdf(uploaded_file)
+                stream = iter_pdf_text(data, sections)
             case FileType.TXT:
-                return extract_text_from_txt(uploaded_file)
-            case _:
-                return None
+                stream = iter_txt_text(data)
+
+        for piece in stream:
+            has_text = has_text or (isinstance(piece, str) and bool(piece.strip()))
+            yield piece
 
     except Exception as e:
-        st.error(f"❌ Error processing file: {str(e)}")
-        return None
+        raise ExtractionError(
+            f"Error processing {file_type.name} file: {str(e)}"
+        ) from e
+
+    if not has_text:
+        raise ExtractionError(f"No text found in {file_type.name} file")
+
+
+def _file_extension(uploaded_file) -> str:
+    """Get the lowercased extension (e.g., ".pdf") of an uploaded file."""
+    return os.path.splitext(uploaded_file.name)[1].lower()
+
+
+def _cache_key(uploaded_file) -> str:
+    """Build the extraction cache key from the file type and content hash."""
+    content_hash = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return f"{_file_extension(uploaded_file)}:{content_hash}"
+
+
+def _load_extraction(cache_key: str, storage: Optional[Storage]) -> None:
+    """
+    Copy an extraction from the shared store into the in-memory cache.
+
+    Does nothing if the extraction is already in memory, or nowhere to be found.
+
+    Args:
+        cache_key: The upload's extraction cache key.
+        storage: Optional shared store to look in.
+    """
+    if storage is None or _extraction_cache.get(cache_key) is not None:
+        return
+    stored = storage.get("extraction:" + cache_key)
+    if stored is None:
+        return
+
+    value = json.loads(stored)
+    _extraction_cache.set(
+        cache_key + ":cleanup", CleanupReport.from_dict(value["cleanup"])
+    )
+    _extraction_cache.set(cache_key + ":sections", tuple(map(tuple, value["sections"])))
+    _extraction_cache.set(cache_key, value["text"])
+
+
+def _split_sections(text: str, sections: Iterable[Tuple[int, str]]) -> Iterator[Piece]:
+    """
+    Rebuild a stream of sections from cached text and section offsets.
+
+    Args:
+        text: The full text.
+        sections: (offset, title) of each section, in order.
+
+    Yields:
+        Piece: A `SectionStart` and the text of each section, or the whole text
+            if it has no sections.
+    """
+    sections = list(sections)
+    if not sections:
+        yield text
+        return
+
+    ends = [offset for offset, _ in sections[1:]] + [len(text)]
+    for (offset, title), end in zip(sections, ends):
+        yield SectionStart(title)
+        if end > offset:
+            yield text[offset:end]
+
+
+def _mark_sections(
+    pieces: Iterable[str], titles: Dict[int, str], split_at_headings: bool = False
+) -> Iterator[Piece]:
+    """
+    Insert a `SectionStart` before each piece that begins a section.
+
+    Pieces before the first section get an untitled one of their own, so a
+    stream with sections always starts with a marker.
+
+    Args:
+        pieces: Documents or pages, in order.
+        titles: Section title by the index of the piece it starts at.
+        split_at_headings: Whether a section may start partway into its piece
+            (as chapters do on PDF pages), in which case the piece is split at
+            the section's heading when the heading can be found.
+
+    Yields:
+        Piece: The pieces, with markers between sections.
+    """
+    started = not titles
+    for index, piece in enumerate(pieces):
+        if index in titles:
+            title = titles[index]
+            start = _heading_start(piece, title) if split_at_headings else 0
+            head, piece = piece[:start], piece[start:]
+            if head:
+                if not started:
+                    yield SectionStart("")
+                yield head
+            yield SectionStart(title)
+            started = True
+        elif not started:
+            yield SectionStart("")
+            started = True
+        yield piece
+
+
+def _heading_start(text: str, title: str) -> int:
+    """
+    Find where a section's heading starts in the piece its section starts in.
+
+    Args:
+        text: The text of the piece.
+        title: The section title.
+
+    Returns:
+        int: Offset of the line holding the heading, or 0 if there is no text
+            before it or it can't be found.
+    """
+    if not title:
+        return 0
+    heading = title.casefold()
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if line.strip().casefold() == heading:
+            return offset if text[:offset].strip() else 0
+        offset += len(line)
+    return 0
+
+
+def _top_toc_level(entries: List[Tuple[int, str, str]]) -> Dict[str, str]:
+    """
+    Pick the outermost useful level of a table of contents.
+
+    Books often wrap their chapters in a single top-level entry (the title, or
+    "Part One"), so the shallowest level with at least `MIN_TOC_SECTIONS`
+    entries is used.
+
+    Args:
+        entries: (depth, title, target) of each entry, in reading order.
+
+    Returns:
+        Dict[str, str]: Title by target, keeping the first entry for each target.
+    """
+    depths = sorted({depth for depth, _, _ in entries})
+    for depth in depths:
+        level = [(title, target) for d, title, target in entries if d == depth]
+        if len(level) >= MIN_TOC_SECTIONS:
+            titles: Dict[str, str] = {}
+            for title, target in level:
+                titles.setdefault(target, title)
+            return titles
+    return {}
 
 
 def extract_text_from_epub(uploaded_file) -> str | None:
     """
     Extract text content from an EPUB file.
 
-    EPUB files are ZIP archives internally, so this function writes the uploaded
-    file to a temporary location for ebooklib to process, then extracts all text
-    from document items while removing script and style tags.
-
     Args:
         uploaded_file: Streamlit UploadedFile object containing EPUB data.
 
     Returns:
         str: Extracted and cleaned text content, or None if extraction fails.
     """
-    tmp_file_path = None
     try:
-        # Write uploaded file to a temporary file
-        # EPUB files are ZIP archives and ebooklib needs filesystem access
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".epub") as tmp_file:
-            uploaded_file.seek(0)
-            tmp_file.write(uploaded_file.read())
-            tmp_file_path = tmp_file.name
-
-        # Read from the temporary file path
-        book = epub.read_epub(tmp_file_path)
-        
-        text = ""
-        for item in book.get_items():
-            if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                soup = BeautifulSoup(item.get_content(), "html.parser")
-                for script in soup(["script", "style"]):
-                    script.decompose()
-                text += soup.get_text() + "\n"
-        
+        text = join_text(iter_epub_text(uploaded_file.getvalue()))
         return text if text.strip() else None
 
     except Exception as e:
         st.error(f"❌ Error processing EPUB file: {str(e)}")
         return None
-    
-    finally:
-        # Clean up the temporary file
-        if tmp_file_path and os.path.exists(tmp_file_path):
-            try:
-                os.unlink(tmp_file_path)
-            except Exception:
-                pass  # Ignore cleanup errors
+
+
+@timed_iterator("extract_epub")
+def iter_epub_text(data: bytes, sections: bool = False) -> Iterator[Piece]:
+    """
+    Extract the text of an EPUB document by document, in reading order.
+
+    EPUB files are ZIP archives internally, so this function opens the archive
+    straight from the raw bytes, reads the OPF package to find the reading order
+    (spine), and extracts the text of each document in that order while skipping
+    script and style content.
+
+    Args:
+        data: The raw EPUB bytes.
+        sections: Whether to mark the documents the table of contents points to
+            with `SectionStart`.
+
+    Yields:
+        Piece: The text of each content document, separated by newlines, and
+            the markers between its sections if requested.
+    """
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        paths, toc = _epub_contents(archive)
+        titles = {i: toc[path] for i, path in enumerate(paths) if path in toc}
+        texts = (
+            ("\n" if i else "") + html_to_text(archive.read(path))
+            for i, path in enumerate(paths)
+        )
+        yield from _mark_sections(texts, titles if sections else {})
+
+
+def _epub_contents(archive: zipfile.ZipFile) -> Tuple[List[str], Dict[str, str]]:
+    """
+    List an EPUB's content documents in reading order, with their chapter titles.
+
+    Follows META-INF/container.xml to the OPF package file and resolves its
+    spine against the manifest. Falls back to every HTML document in archive
+    order, without titles, if the package file is missing or has no spine.
+
+    Args:
+        archive: The open EPUB archive.
+
+    Returns:
+        Tuple[List[str], Dict[str, str]]: Archive paths of the content documents,
+            in reading order, and the table of contents title of each document
+            that starts a chapter.
+    """
+    names = set(archive.namelist())
+    fallback = [
+        name
+        for name in archive.namelist()
+        if name.lower().endswith((".xhtml", ".html", ".htm"))
+    ]
+
+    if "META-INF/container.xml" not in names:
+        return fallback, {}
+
+    container = ElementTree.fromstring(archive.read("META-INF/container.xml"))
+    rootfile = container.find(".//{*}rootfile")
+    opf_path = rootfile.get("full-path") if rootfile is not None else None
+    if not opf_path or opf_path not in names:
+        return fallback, {}
+
+    package = ElementTree.fromstring(archive.read(opf_path))
+    opf_dir = posixpath.dirname(opf_path)
+    manifest = {
+        item.get("id"): item for item in package.iterfind(".//{*}manifest/{*}item")
+    }
+
+    paths = []
+    for itemref in package.iterfind(".//{*}spine/{*}itemref"):
+        item = manifest.get(itemref.get("idref"))
+        if item is None or item.get("media-type") not in EPUB_DOCUMENT_TYPES:
+            continue
+        path = posixpath.normpath(
+            posixpath.join(opf_dir, unquote(item.get("href", "")))
+        )
+        if path in names:
+            paths.append(path)
+
+    if not paths:
+        return fallback, {}
+
+    try:
+        toc = _epub_toc(archive, package, manifest, opf_dir)
+    except ElementTree.ParseError:
+        toc = {}  # A broken table of contents shouldn't stop extraction
+    return paths, toc
+
+
+def _epub_toc(
+    archive: zipfile.ZipFile,
+    package: ElementTree.Element,
+    manifest: Dict[str, ElementTree.Element],
+    opf_dir: str,
+) -> Dict[str, str]:
+    """
+    Read an EPUB's table of contents.
+
+    Uses the EPUB 3 navigation document if there is one, and the EPUB 2 NCX
+    file named by the spine otherwise. Entries pointing inside a document
+    (`chapter.xhtml#part2`) count as pointing at the whole document.
+
+    Args:
+        archive: The open EPUB archive.
+        package: The parsed OPF package.
+        manifest: Manifest items by id.
+        opf_dir: Directory of the OPF file, which manifest hrefs are relative to.
+
+    Returns:
+        Dict[str, str]: Chapter title by archive path of its content document.
+    """
+    names = set(archive.namelist())
+
+    def resolve(base: str, href: str) -> str:
+        href = unquote(href.split("#", 1)[0])
+        return posixpath.normpath(posixpath.join(posixpath.dirname(base), href))
+
+    def item_path(item: ElementTree.Element) -> Optional[str]:
+        path = resolve(opf_dir + "/", item.get("href", ""))
+        return path if path in names else None
+
+    entries: List[Tuple[int, str, str]] = []
+
+    nav_item = next(
+        (
+            item
+            for item in manifest.values()
+            if "nav" in (item.get("properties") or "").split()
+        ),
+        None,
+    )
+    nav_path = item_path(nav_item) if nav_item is not None else None
+    if nav_path:
+        document = ElementTree.fromstring(archive.read(nav_path))
+        navs = list(document.iterfind(".//{*}nav"))
+        toc = next(
+            (nav for nav in navs if "toc" in (nav.get(EPUB_OPS_TYPE) or "").split()),
+            navs[0] if navs else None,
+        )
+
+        def walk_list(element: ElementTree.Element, depth: int) -> None:
+            for entry in element.iterfind("{*}li"):
+                link = entry.find("{*}a")
+                if link is not None and link.get("href"):
+                    title = " ".join("".join(link.itertext()).split())
+                    entries.append((depth, title, resolve(nav_path, link.get("href"))))
+                for sublist in entry.iterfind("{*}ol"):
+                    walk_list(sublist, depth + 1)
+
+        if toc is not None:
+            for top_list in toc.iterfind("{*}ol"):
+                walk_list(top_list, 0)
+
+    spine = package.find(".//{*}spine")
+    ncx_item = manifest.get(spine.get("toc")) if spine is not None else None
+    ncx_path = item_path(ncx_item) if ncx_item is not None else None
+    if not entries and ncx_path:
+        document = ElementTree.fromstring(archive.read(ncx_path))
+
+        def walk_points(element: ElementTree.Element, depth: int) -> None:
+            for point in element.iterfind("{*}navPoint"):
+                label = point.find("{*}navLabel/{*}text")
+                content = point.find("{*}content")
+                if content is not None and content.get("src"):
+                    text = "".join(label.itertext()) if label is not None else ""
+                    target = resolve(ncx_path, content.get("src"))
+                    entries.append((depth, " ".join(text.split()), target))
+                walk_points(point, depth + 1)
+
+        nav_map = document.find("{*}navMap")
+        if nav_map is not None:
+            walk_points(nav_map, 0)
+
+    return _top_toc_level(entries)
+
+
+def html_to_text(content: bytes) -> str:
+    """
+    Extract the visible text of an HTML or XHTML document.
+
+    Uses lxml when it is installed and a streaming stdlib parser otherwise.
+    Script and style content is skipped.
+
+    Args:
+        content: The raw document bytes.
+
+    Returns:
+        str: The document's text content.
+    """
+    if lxml is not None:
+        try:
+            tree = lxml.html.fromstring(content)
+        except Exception:
+            tree = None  # Empty or malformed documents go to the fallback parser
+        if tree is not None:
+            for element in tree.iter("script", "style"):
+                element.drop_tree()
+            return tree.text_content()
+
+    parser = _TextExtractor()
+    parser.feed(content.decode("utf-8", errors="replace"))
+    parser.close()
+    return "".join(parser.parts)
+
+
+class _TextExtractor(HTMLParser):
+    """Streaming HTML parser that collects text outside script and style tags."""
+
+    SKIPPED_TAGS = {"script", "style"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
 
 
 def extract_text_from_pdf(uploaded_file) -> str | None:
     """
     Extract text content from a PDF file.
 
-    Uses PyMuPDF to extract text from all pages of the PDF document.
-
     Args:
         uploaded_file: Streamlit UploadedFile object containing PDF data.
 
@@ -126,10 +664,7 @@ def extract_text_from_pdf(uploaded_file) -> str | None:
         str: Extracted text content from all pages, or None if extraction fails.
     """
     try:
-        uploaded_file.seek(0)
-        doc = pymupdf.open(stream=uploaded_file.read(), filetype="pdf")
-        text = "".join(page.get_text() for page in doc.pages())
-        doc.close()
+        text = join_text(iter_pdf_text(uploaded_file.getvalue()))
         return text if text.strip() else None
 
     except Exception as e:
@@ -137,12 +672,139 @@ def extract_text_from_pdf(uploaded_file) -> str | None:
         return None
 
 
+@timed_iterator("extract_pdf")
+def iter_pdf_text(data: bytes, sections: bool = False) -> Iterator[Piece]:
+    """
+    Extract the text of a PDF in page order.
+
+    Uses PyMuPDF to extract text page by page. PDFs with at least
+    `PARALLEL_PDF_PAGE_THRESHOLD` pages are split into page ranges that are
+    extracted in parallel worker processes and yielded in page order.
+
+    Args:
+        data: The raw PDF bytes.
+        sections: Whether to mark the pages the outline (bookmarks) points to
+            with `SectionStart`.
+
+    Yields:
+        Piece: The text of each page, and the markers between its sections if
+            requested.
+    """
+    doc = pymupdf.open(stream=data, filetype="pdf")
+    page_count = doc.page_count
+    titles = _pdf_section_titles(doc) if sections else {}
+
+    if page_count < PARALLEL_PDF_PAGE_THRESHOLD or PDF_WORKERS < 2:
+        try:
+            pages = (page.get_text() for page in doc.pages())
+            yield from _mark_sections(pages, titles, split_at_headings=True)
+        finally:
+            doc.close()
+        return
+
+    doc.close()
+    pages = _iter_pdf_pages_in_parallel(data, page_count)
+    yield from _mark_sections(pages, titles, split_at_headings=True)
+
+
+def _pdf_section_titles(doc: pymupdf.Document) -> Dict[int, str]:
+    """
+    Read a PDF's outline as chapter titles by the page they start on.
+
+    Args:
+        doc: The open PDF.
+
+    Returns:
+        Dict[int, str]: Chapter title by zero-based page index.
+    """
+    entries = [
+        (level, title.strip(), str(page - 1))
+        for level, title, page, *_ in doc.get_toc(simple=True)
+        if 1 <= page <= doc.page_count
+    ]
+    return {int(page): title for page, title in _top_toc_level(entries).items()}
+
+
+def _iter_pdf_pages_in_parallel(data: bytes, page_count: int) -> Iterator[str]:
+    """
+    Extract a PDF's text by splitting its pages across worker processes.
+
+    The PDF is written to a temporary file once, and workers are only sent its
+    path and their page range, rather than a copy of the whole file per task.
+
+    Args:
+        data: The raw PDF bytes.
+        page_count: Number of pages in the PDF.
+
+    Yields:
+        str: Text of each page, in page order, as soon as its range is ready.
+    """
+    pages_per_task = min(-(-page_count // PDF_WORKERS), PDF_PAGES_PER_TASK)
+    starts = range(0, page_count, pages_per_task)
+    stops = [min(start + pages_per_task, page_count) for start in starts]
+
+    fd, path = tempfile.mkstemp(prefix="bookbot-", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        results = _get_pdf_pool().map(
+            _extract_pdf_page_range, [path] * len(starts), starts, stops
+        )
+        try:
+            for pages in results:
+                yield from pages
+        finally:
+            results.close()  # Cancels the ranges not started yet
+    finally:
+        # A worker may still have it open if we stopped early, which Windows refuses
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+
+def _extract_pdf_page_range(path: str, start: int, stop: int) -> List[str]:
+    """
+    Extract the text of a range of pages; runs inside a worker process.
+
+    Args:
+        path: Location of the PDF file.
+        start: Index of the first page to extract.
+        stop: Index just past the last page to extract.
+
+    Returns:
+        List[str]: Text of each page in the range, in page order; kept apart so
+            cleanup can tell where pages begin and end.
+    """
+    doc = pymupdf.open(path, filetype="pdf")
+    try:
+        return [page.get_text() for page in doc.pages(start, stop)]
+    finally:
+        doc.close()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Get the shared process pool used for parallel PDF extraction.
+
+    Workers are spawned rather than forked, since the Streamlit server process is
+    multi-threaded.
+
+    Returns:
+        ProcessPoolExecutor: The process-wide PDF extraction pool.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_pool
+
+
 def extract_text_from_txt(uploaded_file) -> str | None:
     """
     Extract text content from a plain text file.
 
-    Attempts to decode the file using UTF-8, falling back to Latin-1 if needed.
-
     Args:
         uploaded_file: Streamlit UploadedFile object containing text data.
 
@@ -150,11 +812,28 @@ def extract_text_from_txt(uploaded_file) -> str | None:
         str: Decoded text content, or None if extraction fails.
     """
     try:
-        content = uploaded_file.getvalue().decode("utf-8")
-    except UnicodeDecodeError:
-        content = uploaded_file.getvalue().decode("latin-1")
+        content = "".join(iter_txt_text(uploaded_file.getvalue()))
     except Exception as e:
         st.error(f"❌ Error processing TXT file: {str(e)}")
         return None
 
     return content if content.strip() else None
+
+
+@timed_iterator("extract_txt")
+def iter_txt_text(data: bytes) -> Iterator[str]:
+    """
+    Decode a plain text file.
+
+    Attempts to decode the file using UTF-8, falling back to Latin-1 if needed.
+
+    Args:
+        data: The raw file bytes.
+
+    Yields:
+        str: The decoded text, in a single piece.
+    """
+    try:
+        yield data.decode("utf-8")
+    except UnicodeDecodeError:
+        yield data.decode("latin-1")
@@ -0,0 +1,144 @@
+"""
+Request hedging for No Cap BookBot.
+
+The map stage finishes only when its slowest chunk request does, and now and
+then a single request takes many times the usual latency. A hedged request
+fights that tail: if the request hasn't been answered once it is slower than
+most recent requests of the same size, a duplicate is sent and whichever
+answers first is used. A `HedgePolicy` learns the latency threshold from recent
+requests and caps hedges at a share of all requests, so they only add a few
+percent to the average cost.
+Hedging is opt-in: the process-wide policy only exists once
+`BOOKBOT_HEDGE_BUDGET` is set.
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Hashable, Optional
+
+# Hedge requests slower than this percentile of recent ones of the same size
+DEFAULT_HEDGE_PERCENTILE = float(os.environ.get("BOOKBOT_HEDGE_PERCENTILE", 95))
+HEDGE_BUDGET = 0.05  # Hedges allowed per request sent, on average
+# Budget of the process-wide policy; hedging is off (0) unless it is set
+DEFAULT_HEDGE_BUDGET = float(os.environ.get("BOOKBOT_HEDGE_BUDGET", 0))
+LATENCY_WINDOW = 200  # Recent latencies kept for each request size
+MIN_LATENCY_SAMPLES = 20  # Latencies needed before hedging requests of a size
+MAX_HEDGE_BUDGET = 10.0  # Most hedges that can be saved up
+MAX_HEDGE_WORKERS = 64  # Threads sending hedged requests and their duplicates
+
+
+class HedgePolicy:
+    """
+    Decides when a slow request is worth duplicating.
+
+    A single instance is safe to share between threads; share one between every
+    summarizer in the process, so thresholds are learned from all their requests.
+
+    Attributes:
+        percentile: Requests slower than this percentile of recent requests of
+            the same size are hedged (0 to 100).
+        budget_ratio: Hedges earned by each request sent.
+        window: Recent latencies kept for each request size.
+        min_samples: Latencies needed before requests of a size are hedged.
+        executor: Threads that hedged requests and their duplicates are sent
+            from, shared by every request hedged under the policy.
+    """
+
+    def __init__(
+        self,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        budget_ratio: float = HEDGE_BUDGET,
+        window: int = LATENCY_WINDOW,
+        min_samples: int = MIN_LATENCY_SAMPLES,
+    ):
+        """
+        Create a policy with no latencies observed yet.
+
+        Args:
+            percentile: Latency percentile (0 to 100) after which a request
+                is hedged.
+            budget_ratio: Hedges earned by each request sent, i.e. the largest
+                share of requests that may be hedged over time.
+            window: Recent latencies kept for each request size.
+            min_samples: Latencies needed before requests of a size are hedged.
+        """
+        self.percentile = min(100.0, max(0.0, percentile))
+        self.budget_ratio = budget_ratio
+        self.window = window
+        self.min_samples = max(1, min_samples)
+        self._latencies: Dict[Hashable, Deque[float]] = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=MAX_HEDGE_WORKERS, thread_name_prefix="bookbot-hedge"
+        )
+        self._budget = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, key: Hashable, seconds: float) -> None:
+        """
+        Record how long a request took to be answered.
+
+        Args:
+            key: Groups requests expected to take about as long, e.g. their
+                `max_tokens`.
+            seconds: The request's latency.
+        """
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None:
+                latencies = self._latencies[key] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def threshold(self, key: Hashable) -> Optional[float]:
+        """
+        Get how long to wait for a request before hedging it.
+
+        Args:
+            key: The request's group, as passed to `observe`.
+
+        Returns:
+            float: Seconds to wait, or None if too few requests of the group
+                have been observed to tell what is slow.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        rank = math.ceil(self.percentile / 100 * len(latencies))
+        return latencies[min(len(latencies), max(1, rank)) - 1]
+
+    def earn(self) -> None:
+        """Credit the hedge budget for a request being sent."""
+        with self._lock:
+            self._budget = min(MAX_HEDGE_BUDGET, self._budget + self.budget_ratio)
+
+    def spend(self) -> bool:
+        """
+        Take one hedge from the budget.
+
+        Returns:
+            bool: False if the budget is spent and the request must not be hedged.
+        """
+        with self._lock:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            return True
+
+
+_process_hedge_policy = (
+    HedgePolicy(budget_ratio=DEFAULT_HEDGE_BUDGET) if DEFAULT_HEDGE_BUDGET > 0 else None
+)
+
+
+def process_hedge_policy() -> Optional[HedgePolicy]:
+    """
+    Get the process-wide hedging policy, shared by every summarizer.
+
+    Returns:
+        HedgePolicy: The policy, or None unless hedging is turned on by
+            setting `BOOKBOT_HEDGE_BUDGET` (e.g., to 0.05).
+    """
+    return _process_hedge_policy
@@ -0,0 +1,314 @@
+"""
+Background jobs for No Cap BookBot.
+
+Streamlit reruns the whole script whenever the user touches a widget or the
+browser reconnects, so work done inline in the script is lost mid-way. Analyses
+therefore run as jobs on a small worker pool owned by the process: the script
+submits a job, remembers its ID, and on every rerun reads the job's progress and
+partial summary back. Submitting a job that is already queued, running or done
+attaches to it instead of starting the work again.
+
+Each session watching a job checks in on every rerun. A job is cancelled once
+no session wants it anymore: when the last one releases it (because its input
+changed or it started another analysis), or when none has checked in for a
+while (because the tab was closed).
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from src.cancellation import AnalysisCancelled, CancellationToken
+from src.progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 4  # Analyses running at once; the rest wait in the queue
+JOB_RETENTION_SECONDS = 60 * 60  # Keep finished jobs for reruns and reconnects
+JOB_ABANDON_SECONDS = 30.0  # Unfinished jobs no session has checked on are cancelled
+ABANDON_CHECK_SECONDS = 5.0  # How often to look for abandoned jobs
+
+
+class JobStatus(Enum):
+    """Lifecycle of a job."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class Job:
+    """
+    State of one background analysis, shared between its worker and the UI.
+
+    Fields are only written by the worker running the job, and reading them
+    from another thread is always safe, if possibly a moment out of date.
+
+    Attributes:
+        id: Job ID from `make_job_id`.
+        status: Where the job is in its lifecycle.
+        progress: Overall completion, from 0.0 to 1.0.
+        message: Short description of the current step.
+        deltas: Pieces of the final summary, appended as they stream in.
+        details: Other results to show alongside the summary (e.g., stats).
+        error: The exception the job failed with, if it failed.
+        finished_at: When the job finished, as a Unix timestamp.
+        cancellation: Token the job's task should stop on once cancelled.
+    """
+
+    id: str
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = 0.0
+    message: str = ""
+    deltas: List[str] = field(default_factory=list)
+    details: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[Exception] = None
+    finished_at: Optional[float] = None
+    cancellation: CancellationToken = field(default_factory=CancellationToken)
+
+    @property
+    def summary(self) -> str:
+        """The summary streamed so far."""
+        return "".join(self.deltas)
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job is done, has failed or was cancelled."""
+        return self.status in (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class JobProgress(ProgressReporter):
+    """Records progress updates on a job, for the UI to pick up."""
+
+    def __init__(self, job: Job):
+        """
+        Create a reporter for a job.
+
+        Args:
+            job: The job to update.
+        """
+        self.job = job
+
+    def update(self, fraction: float, message: str) -> None:
+        self.job.progress = min(1.0, max(0.0, fraction))
+        self.job.message = message
+
+
+def make_job_id(*parts: str) -> str:
+    """
+    Build a job ID from everything that determines the job's result.
+
+    Args:
+        *parts: Identifying values, such as content, prompt and model hashes.
+
+    Returns:
+        str: Hex SHA-256 digest identifying the job.
+    """
+    payload = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded worker pool and keeps their state for the UI.
+
+    Attributes:
+        retention_seconds: How long finished jobs are kept.
+        abandon_seconds: How long an unfinished job may go without any watcher
+            checking in before it is cancelled.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = JOB_WORKERS,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+        abandon_seconds: float = JOB_ABANDON_SECONDS,
+    ):
+        """
+        Start the worker pool, and a thread that cancels abandoned jobs.
+
+        Args:
+            max_workers: Jobs that may run at once.
+            retention_seconds: How long finished jobs are kept.
+            abandon_seconds: How long an unfinished job may go without any
+                watcher checking in before it is cancelled.
+        """
+        self.retention_seconds = retention_seconds
+        self.abandon_seconds = abandon_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bookbot-job"
+        )
+        self._jobs: Dict[str, Job] = {}
+        # Job ID -> watcher -> when the watcher last checked in (monotonic)
+        self._watchers: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        threading.Thread(
+            target=self._cancel_abandoned_periodically,
+            name="bookbot-job-watchdog",
+            daemon=True,
+        ).start()
+
+    def submit(
+        self, job_id: str, task: Callable[[Job], None], watcher: Optional[str] = None
+    ) -> Job:
+        """
+        Start a job, or attach to the existing job with the same ID.
+
+        A job that failed or was cancelled is started again, so the user can
+        retry; work it finished is usually served from the response cache. So is
+        a job that is still running but has been told to stop, since it would
+        end cancelled.
+
+        Args:
+            job_id: Job ID from `make_job_id`.
+            task: Function doing the work; it receives the job to report
+                progress and results on. Raising marks the job as failed, and
+                raising `AnalysisCancelled` marks it as cancelled.
+            watcher: Optional ID of the session that wants the result (see
+                `watch`). Jobs without watchers are never cancelled.
+
+        Returns:
+            Job: The new or existing job.
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            restart = (
+                job is None
+                or job.status in (JobStatus.FAILED, JobStatus.CANCELLED)
+                # Its task hasn't noticed the cancellation yet, but will
+                or (job.cancellation.cancelled and job.status != JobStatus.DONE)
+            )
+            if restart:
+                job = Job(job_id)
+                self._jobs[job_id] = job
+                self._watchers.pop(job_id, None)
+                self._executor.submit(self._run, job, task)
+            if watcher is not None:
+                self._watchers.setdefault(job_id, {})[watcher] = time.monotonic()
+            return job
+
+    def watch(self, job_id: str, watcher: str) -> Optional[Job]:
+        """
+        Look up a job on behalf of a session that still wants its result.
+
+        Sessions should call this every time they show the job, since an
+        unfinished job that no watcher has checked on within `abandon_seconds`
+        is cancelled.
+
+        Args:
+            job_id: Job ID from `make_job_id`.
+            watcher: ID of the session checking in.
+
+        Returns:
+            Job: The job, or None if it is unknown or has been pruned.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._watchers.setdefault(job_id, {})[watcher] = time.monotonic()
+            return job
+
+    def release(self, job_id: str, watcher: str) -> None:
+        """
+        Stop watching a job, cancelling it if no other session is watching it.
+
+        Args:
+            job_id: Job ID from `make_job_id`.
+            watcher: ID of the session that no longer wants the result.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            watchers = self._watchers.get(job_id, {})
+            watchers.pop(watcher, None)
+            if job is None or watchers:
+                return
+        self._cancel(job, "superseded")
+
+    def cancel_abandoned(self) -> int:
+        """
+        Cancel unfinished jobs that no watcher has checked on recently.
+
+        Returns:
+            int: Number of jobs cancelled.
+        """
+        cutoff = time.monotonic() - self.abandon_seconds
+        with self._lock:
+            abandoned = [
+                self._jobs[job_id]
+                for job_id, watchers in self._watchers.items()
+                if job_id in self._jobs
+                and not self._jobs[job_id].finished
+                and watchers
+                and max(watchers.values()) < cutoff
+            ]
+        return sum(self._cancel(job, "abandoned") for job in abandoned)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Look up a job.
+
+        Args:
+            job_id: Job ID from `make_job_id`.
+
+        Returns:
+            Job: The job, or None if it is unknown or has been pruned.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, task: Callable[[Job], None]) -> None:
+        """Run a job's task on a worker thread and record how it ended."""
+        job.status = JobStatus.RUNNING
+        try:
+            job.cancellation.raise_if_cancelled()
+            task(job)
+        except AnalysisCancelled:
+            logger.info("Job %s cancelled (%s)", job.id[:12], job.cancellation.reason)
+            job.status = JobStatus.CANCELLED
+        except Exception as e:
+            logger.warning("Job %s failed: %s", job.id[:12], e)
+            job.error = e
+            job.status = JobStatus.FAILED
+        else:
+            job.progress = 1.0
+            job.status = JobStatus.DONE
+        finally:
+            job.finished_at = time.time()
+
+    def _cancel(self, job: Job, reason: str) -> bool:
+        """Cancel an unfinished job; returns whether this call cancelled it."""
+        if job.finished or not job.cancellation.cancel(reason):
+            return False
+        logger.info("Cancelling job %s (%s)", job.id[:12], reason)
+        return True
+
+    def _cancel_abandoned_periodically(self) -> None:
+        """Look for abandoned jobs every `ABANDON_CHECK_SECONDS`, forever."""
+        while True:
+            time.sleep(ABANDON_CHECK_SECONDS)
+            try:
+                self.cancel_abandoned()
+            except Exception:  # Keep watching whatever went wrong
+                logger.exception("Failed to cancel abandoned jobs")
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than `retention_seconds`."""
+        cutoff = time.time() - self.retention_seconds
+        stale = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in stale:
+            del self._jobs[job_id]
+            self._watchers.pop(job_id, None)
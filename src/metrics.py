@@ -0,0 +1,471 @@
+"""
+Instrumentation for No Cap BookBot.
+
+Pipeline stages (extraction, chunking, chunk summaries, the reduce tree and the
+Gen Z rewrite) run inside named spans. Each span measures wall time and collects
+the token usage of the model requests made inside it, which is priced with a
+per-model table. Finished spans are logged as one JSON object per line at DEBUG
+level on the `src.metrics` logger and added to per-stage totals, which can be
+read back for a debug panel or exported in the Prometheus text format.
+
+A `Metrics` collector can forward everything to a parent, so a single analysis
+can be inspected on its own while the process keeps running totals.
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.cancellation import AnalysisCancelled
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens: (input, cached input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+BATCH_PRICE_FACTOR = 0.5  # Batch API requests are billed at half price
+
+# StageStats fields exported to Prometheus: (field, metric type, help text)
+PROMETHEUS_SERIES = [
+    ("calls", "counter", "Finished spans"),
+    ("errors", "counter", "Spans that failed"),
+    ("abandoned", "counter", "Spans cut short because their analysis was cancelled"),
+    ("seconds", "counter", "Wall time spent in spans"),
+    ("max_seconds", "gauge", "Longest single span"),
+    ("requests", "counter", "Model requests sent"),
+    ("cache_hits", "counter", "Responses served from the summary cache"),
+    ("coalesced", "counter", "Responses shared from an identical in-flight request"),
+    ("hedged", "counter", "Duplicate requests sent because the first was slow"),
+    ("prompt_tokens", "counter", "Prompt tokens billed"),
+    ("cached_tokens", "counter", "Prompt tokens served from the prompt cache"),
+    ("completion_tokens", "counter", "Completion tokens billed"),
+    ("cost_usd", "counter", "Estimated cost in USD"),
+]
+
+
+@dataclass
+class StageStats:
+    """
+    Running totals for every span with the same name.
+
+    Attributes:
+        calls: Number of finished spans.
+        errors: Spans that ended with an exception, other than cancellation.
+        abandoned: Spans cut short because their analysis was cancelled.
+        seconds: Total wall time.
+        max_seconds: Longest single span.
+        requests: Model requests sent.
+        cache_hits: Model responses served from the summary cache.
+        coalesced: Model responses shared from an identical request that was
+            already in flight.
+        hedged: Duplicate requests sent because the first was slow to answer.
+        prompt_tokens: Prompt tokens billed, including cached ones.
+        cached_tokens: Prompt tokens served from the API's prompt cache.
+        completion_tokens: Completion tokens billed.
+        cost_usd: Estimated cost of the requests.
+    """
+
+    calls: int = 0
+    errors: int = 0
+    abandoned: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    requests: int = 0
+    cache_hits: int = 0
+    coalesced: int = 0
+    hedged: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+
+@dataclass
+class Span:
+    """
+    One timed unit of work and the model usage inside it.
+
+    Attributes:
+        name: Stage name, such as "summarize_chunk".
+        attributes: Extra context logged with the span (e.g., chunk number).
+        seconds: Wall time, set when the span ends.
+        error: Name of the exception the span ended with, if any.
+        abandoned: Whether the span ended because its analysis was cancelled.
+    """
+
+    name: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    seconds: float = 0.0
+    error: Optional[str] = None
+    abandoned: bool = False
+    requests: int = 0
+    cache_hits: int = 0
+    coalesced: int = 0
+    hedged: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+
+class Metrics:
+    """
+    Thread-safe collector of spans and per-stage totals.
+
+    Model usage is attributed to the innermost open span of the calling thread,
+    so work fanned out to a thread pool should open its own span in the worker.
+
+    Attributes:
+        parent: Optional collector that also receives every finished span.
+    """
+
+    def __init__(self, parent: Optional["Metrics"] = None):
+        """
+        Create an empty collector.
+
+        Args:
+            parent: Optional collector that also receives every finished span.
+        """
+        self.parent = parent
+        self._stages: Dict[str, StageStats] = {}
+        self._open = threading.local()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Time a block of work and collect the model usage inside it.
+
+        Args:
+            name: Stage name, such as "summarize_chunk".
+            **attributes: Extra context to log with the span.
+
+        Yields:
+            Span: The open span.
+        """
+        span = Span(name, attributes)
+        stack = self._stack()
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except AnalysisCancelled:
+            span.abandoned = True
+            raise
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.seconds = time.perf_counter() - start
+            stack.remove(span)
+            self.record(span)
+
+    def add_usage(self, model: str, usage: Any, price_factor: float = 1.0) -> None:
+        """
+        Record the token usage of a model request on the current span.
+
+        Args:
+            model: The model the request was sent to.
+            usage: The response's `usage`, as an object or a dict.
+            price_factor: Multiplier on list prices (e.g., BATCH_PRICE_FACTOR).
+        """
+        prompt, cached, completion = _usage_counts(usage)
+        span = self._current_span()
+        span.requests += 1
+        span.prompt_tokens += prompt
+        span.cached_tokens += cached
+        span.completion_tokens += completion
+        span.cost_usd += estimate_cost(model, prompt, cached, completion) * price_factor
+        if not self._stack():
+            self.record(span)
+
+    def add_cache_hit(self) -> None:
+        """Record a model response served from the summary cache."""
+        span = self._current_span()
+        span.cache_hits += 1
+        if not self._stack():
+            self.record(span)
+
+    def add_coalesced(self) -> None:
+        """Record a model response shared from an identical in-flight request."""
+        span = self._current_span()
+        span.coalesced += 1
+        if not self._stack():
+            self.record(span)
+
+    def add_hedged(self) -> None:
+        """Record a duplicate request sent because the first was slow."""
+        span = self._current_span()
+        span.hedged += 1
+        if not self._stack():
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        """
+        Add a finished span to the per-stage totals and log it.
+
+        Args:
+            span: The finished span.
+        """
+        with self._lock:
+            stats = self._stages.setdefault(span.name, StageStats())
+            stats.calls += 1
+            stats.errors += span.error is not None
+            stats.abandoned += span.abandoned
+            stats.seconds += span.seconds
+            stats.max_seconds = max(stats.max_seconds, span.seconds)
+            stats.requests += span.requests
+            stats.cache_hits += span.cache_hits
+            stats.coalesced += span.coalesced
+            stats.hedged += span.hedged
+            stats.prompt_tokens += span.prompt_tokens
+            stats.cached_tokens += span.cached_tokens
+            stats.completion_tokens += span.completion_tokens
+            stats.cost_usd += span.cost_usd
+
+        if self.parent is not None:
+            self.parent.record(span)
+        elif logger.isEnabledFor(logging.DEBUG):
+            record = asdict(span)
+            record.update(record.pop("attributes"))
+            logger.debug(json.dumps(record, default=str))
+
+    def snapshot(self) -> Dict[str, StageStats]:
+        """
+        Get a copy of the per-stage totals.
+
+        Returns:
+            Dict[str, StageStats]: Totals by stage name.
+        """
+        with self._lock:
+            return {name: StageStats(**asdict(s)) for name, s in self._stages.items()}
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """
+        Get the per-stage totals as table rows, e.g. for `st.dataframe`.
+
+        Returns:
+            List[Dict[str, Any]]: One row per stage, in the order stages first ran.
+        """
+        return [{"stage": name, **asdict(s)} for name, s in self.snapshot().items()]
+
+    def merge(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Add per-stage totals collected elsewhere, such as in another process.
+
+        Args:
+            rows: Rows from another collector's `rows`.
+        """
+        with self._lock:
+            for row in rows:
+                row = dict(row)
+                stats = self._stages.setdefault(row.pop("stage"), StageStats())
+                for name, value in row.items():
+                    if name == "max_seconds":
+                        stats.max_seconds = max(stats.max_seconds, value)
+                    else:
+                        setattr(stats, name, getattr(stats, name) + value)
+
+    def totals(self) -> Dict[str, float]:
+        """
+        Sum the model usage over every stage.
+
+        Wall times are left out, since spans nest and overlap.
+
+        Returns:
+            Dict[str, float]: Requests, cache hits, token counts and cost.
+        """
+        totals = dict.fromkeys(
+            (
+                "requests",
+                "cache_hits",
+                "coalesced",
+                "hedged",
+                "prompt_tokens",
+                "cached_tokens",
+                "completion_tokens",
+                "cost_usd",
+            ),
+            0,
+        )
+        for stats in self.snapshot().values():
+            for name in totals:
+                totals[name] += getattr(stats, name)
+        return totals
+
+    def to_prometheus(self, prefix: str = "bookbot_stage") -> str:
+        """
+        Export the per-stage totals in the Prometheus text exposition format.
+
+        Args:
+            prefix: Prefix for every metric name.
+
+        Returns:
+            str: The metrics, ready to serve or write to a textfile collector.
+        """
+        stages = self.snapshot()
+        lines = []
+        for field_name, kind, help_text in PROMETHEUS_SERIES:
+            metric = f"{prefix}_{field_name}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# HELP {metric} {help_text}, by pipeline stage.")
+            lines.append(f"# TYPE {metric} {kind}")
+            for stage, stats in stages.items():
+                value = getattr(stats, field_name)
+                lines.append(f'{metric}{{stage="{stage}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator["Metrics"]:
+        """
+        Make this collector the one used by `current_metrics` in this context.
+
+        Yields:
+            Metrics: This collector.
+        """
+        token = _current_metrics.set(self)
+        try:
+            yield self
+        finally:
+            _current_metrics.reset(token)
+
+    def _stack(self) -> List[Span]:
+        """Get the calling thread's open spans, innermost last."""
+        if not hasattr(self._open, "stack"):
+            self._open.stack = []
+        return self._open.stack
+
+    def _current_span(self) -> Span:
+        """Get the innermost open span, or a one-off span for stray requests."""
+        stack = self._stack()
+        return stack[-1] if stack else Span("model_request")
+
+
+def estimate_cost(model: str, prompt: int, cached: int, completion: int) -> float:
+    """
+    Estimate what a request cost at list prices.
+
+    Args:
+        model: The model the request was sent to.
+        prompt: Prompt tokens, including cached ones.
+        cached: Prompt tokens served from the prompt cache.
+        completion: Completion tokens.
+
+    Returns:
+        float: Estimated cost in USD, or 0.0 for models without a known price.
+    """
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    return (
+        (prompt - cached) * input_price
+        + cached * cached_price
+        + completion * output_price
+    ) / 1_000_000
+
+
+def _usage_counts(usage: Any) -> Tuple[int, int, int]:
+    """
+    Read (prompt, cached, completion) token counts from a usage object or dict.
+
+    Args:
+        usage: The `usage` of a chat completion, or None.
+
+    Returns:
+        Tuple[int, int, int]: Token counts, zero where missing.
+    """
+    if usage is None:
+        return 0, 0, 0
+
+    def get(source: Any, name: str) -> Any:
+        if isinstance(source, dict):
+            return source.get(name)
+        return getattr(source, name, None)
+
+    details = get(usage, "prompt_tokens_details")
+    return (
+        get(usage, "prompt_tokens") or 0,
+        (get(details, "cached_tokens") if details is not None else 0) or 0,
+        get(usage, "completion_tokens") or 0,
+    )
+
+
+_process_metrics = Metrics()
+_current_metrics: contextvars.ContextVar = contextvars.ContextVar(
+    "bookbot_metrics", default=None
+)
+
+
+def process_metrics() -> Metrics:
+    """
+    Get the process-wide collector, which every other collector should feed.
+
+    Returns:
+        Metrics: Running totals for the whole process.
+    """
+    return _process_metrics
+
+
+def current_metrics() -> Metrics:
+    """
+    Get the collector activated in this context, or the process-wide one.
+
+    Returns:
+        Metrics: The collector to record to.
+    """
+    return _current_metrics.get() or _process_metrics
+
+
+def timed_iterator(name: str) -> Callable:
+    """
+    Decorate a generator function so the time spent producing items is a span.
+
+    Only time spent inside the generator counts, not time the consumer spends
+    between items, so streaming stages can be compared with batch ones. The
+    span is recorded on `current_metrics` when the generator is exhausted or
+    closed.
+
+    Args:
+        name: Stage name for the span.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(function: Callable[..., Iterator]) -> Callable[..., Iterator]:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Iterator:
+            span = Span(name)
+            iterator = function(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        span.seconds += time.perf_counter() - start
+                    yield item
+            except BaseException as e:
+                if not isinstance(e, GeneratorExit):
+                    span.error = type(e).__name__
+                raise
+            finally:
+                iterator.close()
+                current_metrics().record(span)
+
+        return wrapper
+
+    return decorator
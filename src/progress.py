@@ -0,0 +1,82 @@
+"""
+Progress reporting for No Cap BookBot.
+
+BookSummarizer reports progress through the small `ProgressReporter` interface so
+the same pipeline can drive a Streamlit progress bar in the web app or plain log
+lines in the headless command-line tool.
+"""
+
+import logging
+from typing import Optional
+
+
+class ProgressReporter:
+    """
+    Receives progress updates from a long-running summarization.
+
+    The base class ignores every update, so it doubles as a no-op reporter.
+    """
+
+    def update(self, fraction: float, message: str) -> None:
+        """
+        Report progress.
+
+        Args:
+            fraction: Overall completion, from 0.0 to 1.0.
+            message: Short description of the current step.
+        """
+
+    def close(self) -> None:
+        """Clear any progress display once the work is done."""
+
+
+class StreamlitProgress(ProgressReporter):
+    """
+    Shows progress as a Streamlit progress bar with a status line underneath.
+
+    The widgets are created on the first update, in whichever Streamlit
+    container is active at that time. Must be used from the script thread.
+    """
+
+    def __init__(self):
+        self._progress_bar = None
+        self._status_text = None
+
+    def update(self, fraction: float, message: str) -> None:
+        import streamlit as st
+
+        if self._progress_bar is None:
+            self._progress_bar = st.progress(0)
+            self._status_text = st.empty()
+        self._progress_bar.progress(min(1.0, max(0.0, fraction)))
+        self._status_text.text(message)
+
+    def close(self) -> None:
+        if self._progress_bar is not None:
+            self._progress_bar.empty()
+            self._status_text.empty()
+
+
+class LoggingProgress(ProgressReporter):
+    """
+    Logs progress messages, for headless runs.
+
+    Consecutive duplicate messages are skipped to keep logs readable.
+    """
+
+    def __init__(self, label: str, logger: Optional[logging.Logger] = None):
+        """
+        Create a reporter for one unit of work.
+
+        Args:
+            label: Prefix for every log line (e.g., the book's file name).
+            logger: Logger to write to; defaults to this module's logger.
+        """
+        self.label = label
+        self.logger = logger or logging.getLogger(__name__)
+        self._last_message = None
+
+    def update(self, fraction: float, message: str) -> None:
+        if message != self._last_message:
+            self.logger.info("%s: %3.0f%% %s", self.label, fraction * 100, message)
+            self._last_message = message
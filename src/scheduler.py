@@ -0,0 +1,343 @@
+"""
+Request scheduling for No Cap BookBot.
+
+Every model request goes through a `RequestScheduler`, which keeps the process
+under the account's requests-per-minute and tokens-per-minute limits with token
+buckets, retries rate-limited (429), server (5xx) and connection errors with
+exponential backoff and jitter, and caps how many retries may be spent overall so
+that an outage doesn't turn into a retry storm. Requests that still fail raise a
+`RequestError` instead of producing a fake summary. Waits for the rate limits and
+between retries end early if the request's analysis is cancelled.
+
+One scheduler is meant to be shared by every summarizer using the same API key in
+a process, so concurrent sessions are paced together.
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+import openai
+
+from src.cancellation import CancellationToken
+from src.chunking import CHARS_PER_TOKEN
+
+T = TypeVar("T")
+
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("BOOKBOT_REQUESTS_PER_MINUTE", 500))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("BOOKBOT_TOKENS_PER_MINUTE", 200000))
+DEFAULT_MAX_ATTEMPTS = 6
+BASE_RETRY_DELAY = 1.0  # Seconds before the first retry, doubled on each attempt
+MAX_RETRY_DELAY = 60.0
+RETRY_BUDGET_RATIO = 0.2  # Retries allowed per request sent, on average
+MIN_RETRY_BUDGET = 10.0  # Retries available before any requests are sent
+MAX_RETRY_BUDGET = 100.0  # Most retries that can be saved up
+
+
+class RequestError(Exception):
+    """
+    Raised when a model request fails for good.
+
+    Attributes:
+        attempts: How many times the request was sent.
+        retryable: Whether the last failure was transient (rate limit, server
+            or connection error), i.e. trying again later may succeed.
+    """
+
+    def __init__(self, message: str, attempts: int = 1, retryable: bool = False):
+        super().__init__(message)
+        self.attempts = attempts
+        self.retryable = retryable
+
+
+class RateLimitedError(RequestError):
+    """Raised when a request is still rate limited after every retry."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a fixed rate per minute.
+
+    Attributes:
+        rate_per_minute: Tokens added to the bucket each minute.
+        capacity: Most tokens the bucket can hold, i.e. the largest burst.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Create a full bucket.
+
+        Args:
+            rate_per_minute: Tokens added to the bucket each minute.
+            capacity: Largest burst; defaults to one minute's worth of tokens.
+        """
+        self.rate_per_minute = max(1.0, rate_per_minute)
+        self.capacity = capacity or self.rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(
+        self, amount: float = 1.0, cancellation: Optional[CancellationToken] = None
+    ) -> None:
+        """
+        Take tokens from the bucket, waiting until enough have accumulated.
+
+        Requests larger than the whole bucket are clamped to its capacity so
+        they can still go through once it is full.
+
+        Args:
+            amount: Number of tokens to take.
+            cancellation: Optional token that ends the wait early.
+
+        Raises:
+            AnalysisCancelled: If `cancellation` is cancelled while waiting.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) * 60.0 / self.rate_per_minute
+            _sleep(wait, cancellation)
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update."""
+        now = time.monotonic()
+        earned = (now - self._updated) * self.rate_per_minute / 60.0
+        self._tokens = min(self.capacity, self._tokens + earned)
+        self._updated = now
+
+
+class RequestScheduler:
+    """
+    Paces model requests and retries transient failures.
+
+    Attributes:
+        requests: Bucket of requests per minute.
+        tokens: Bucket of tokens per minute (prompt plus maximum output).
+        max_attempts: Most times a single request is sent.
+        base_delay: Seconds before the first retry.
+        max_delay: Longest wait between two attempts.
+        retry_budget_ratio: Retries earned by each request sent.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = BASE_RETRY_DELAY,
+        max_delay: float = MAX_RETRY_DELAY,
+        retry_budget_ratio: float = RETRY_BUDGET_RATIO,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            requests_per_minute: Requests allowed per minute.
+            tokens_per_minute: Tokens allowed per minute.
+            max_attempts: Most times a single request is sent.
+            base_delay: Seconds before the first retry.
+            max_delay: Longest wait between two attempts.
+            retry_budget_ratio: Retries earned by each request sent; once the
+                budget is spent, failures are raised without retrying.
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget_ratio = retry_budget_ratio
+        self._retry_budget = MIN_RETRY_BUDGET
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        send: Callable[[], T],
+        tokens: int,
+        cancellation: Optional[CancellationToken] = None,
+    ) -> T:
+        """
+        Send a request once the rate limits allow it, retrying transient errors.
+
+        Args:
+            send: Function that sends the request and returns its response.
+            tokens: Tokens the request counts against the limit (prompt tokens
+                plus `max_tokens`).
+            cancellation: Optional token that stops the request from being sent
+                (or retried) once cancelled.
+
+        Returns:
+            The value returned by `send`.
+
+        Raises:
+            RateLimitedError: If the request is still rate limited after retrying.
+            RequestError: If the request fails for any other reason.
+            AnalysisCancelled: If `cancellation` is cancelled before the request
+                has been answered.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self._wait_for_pause(cancellation)
+            self.requests.acquire(1, cancellation)
+            self.tokens.acquire(tokens, cancellation)
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
+            self._earn_retry()
+
+            try:
+                return send()
+            except Exception as e:
+                retryable = is_retryable(e)
+                if (
+                    not retryable
+                    or attempt == self.max_attempts
+                    or not self._spend_retry()
+                ):
+                    error_type = (
+                        RateLimitedError
+                        if isinstance(e, openai.RateLimitError)
+                        else RequestError
+                    )
+                    raise error_type(str(e), attempt, retryable) from e
+
+                delay = self._backoff(attempt, e)
+                if isinstance(e, openai.RateLimitError):
+                    # Hold back every request, not just this one, until it clears
+                    self._pause(delay)
+                else:
+                    _sleep(delay, cancellation)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Work out how long to wait before retrying.
+
+        Uses the server's Retry-After header when there is one, otherwise
+        exponential backoff with full jitter.
+
+        Args:
+            attempt: Number of the attempt that just failed (1-indexed).
+            error: The error it failed with.
+
+        Returns:
+            float: Seconds to wait.
+        """
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _earn_retry(self) -> None:
+        """Credit the retry budget for a request being sent."""
+        with self._lock:
+            self._retry_budget = min(
+                MAX_RETRY_BUDGET, self._retry_budget + self.retry_budget_ratio
+            )
+
+    def _spend_retry(self) -> bool:
+        """
+        Take one retry from the budget.
+
+        Returns:
+            bool: False if the budget is spent and the request must not retry.
+        """
+        with self._lock:
+            if self._retry_budget < 1:
+                return False
+            self._retry_budget -= 1
+            return True
+
+    def _pause(self, delay: float) -> None:
+        """Hold back every request for `delay` seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def _wait_for_pause(self, cancellation: Optional[CancellationToken]) -> None:
+        """Wait until any rate limit pause has passed."""
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                return
+            _sleep(wait, cancellation)
+
+
+def _sleep(seconds: float, cancellation: Optional[CancellationToken]) -> None:
+    """Sleep, waking up early if `cancellation` is cancelled."""
+    if cancellation is None:
+        time.sleep(seconds)
+    else:
+        cancellation.sleep(seconds)
+
+
+def estimate_request_tokens(prompt: str, max_tokens: int) -> int:
+    """
+    Estimate how many tokens a request counts against the tokens-per-minute limit.
+
+    Like the API's own rate limiter, this uses a character-based estimate of the
+    prompt plus the full `max_tokens`, which is cheaper than tokenizing.
+
+    Args:
+        prompt: The text prompt of the request.
+        max_tokens: Maximum number of tokens in the response.
+
+    Returns:
+        int: Estimated tokens for the request.
+    """
+    return -(-len(prompt) // CHARS_PER_TOKEN) + max_tokens
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Check whether a failed request is worth retrying.
+
+    Args:
+        error: The exception the request raised.
+
+    Returns:
+        bool: True for rate limits, server errors, timeouts and connection errors.
+    """
+    if isinstance(error, openai.RateLimitError):
+        # Running out of credit is reported as a 429 too, but won't clear up
+        return getattr(error, "code", None) != "insufficient_quota"
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500 or error.status_code in (408, 409)
+    return False
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Read the server's requested retry delay from an API error, if any.
+
+    Args:
+        error: The exception the request raised.
+
+    Returns:
+        float: Seconds to wait, or None if the server didn't say.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                retry_at = email.utils.parsedate_to_datetime(value).timestamp()
+                return max(0.0, retry_at - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
@@ -0,0 +1,212 @@
+"""
+Request coalescing for No Cap BookBot.
+
+When several sessions analyze the same book at once (a sample book, or a popular
+upload), they send identical prompts at the same moment. The summary cache only
+helps once the first response is stored, so without coalescing every session
+pays for the same requests. A `SingleFlight` lets one caller per key do the work
+while concurrent callers with the same key wait for, and share, its result.
+
+Within a process, waiting callers block on the leader's call. Processes on the
+same host (e.g., several app replicas sharing one cache directory) can also be
+coalesced through lock files in a shared directory: the leader in each process
+takes the key's file lock before calling, so a process that had to wait finds
+the response in the shared cache instead of requesting it again.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+from src.cancellation import CancellationToken
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; only threads are coalesced there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Directory for lock files shared between processes; unset coalesces per process
+DEFAULT_LOCK_DIR = os.environ.get("BOOKBOT_LOCK_DIR") or None
+WAIT_INTERVAL_SECONDS = 0.1  # How often a waiting caller checks for cancellation
+# Longest a caller waits for someone else's call before making it itself
+MAX_WAIT_SECONDS = float(os.environ.get("BOOKBOT_COALESCE_TIMEOUT", 600))
+
+T = TypeVar("T")
+
+
+class _Call:
+    """A call in flight, which callers with the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time, sharing its outcome with duplicates.
+
+    A single instance is safe to share between threads; share one between every
+    summarizer in the process so their requests are coalesced with each other.
+
+    Attributes:
+        lock_dir: Directory of lock files used to coalesce with other processes,
+            or None to coalesce within this process only.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        """
+        Create a coalescing group.
+
+        Args:
+            lock_dir: Optional directory for lock files shared with other
+                processes on this host. Ignored where file locks are unavailable.
+        """
+        if lock_dir is not None and fcntl is None:
+            logger.warning("File locks are unavailable; coalescing per process only")
+            lock_dir = None
+        if lock_dir is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+
+        self.lock_dir = lock_dir
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: str,
+        function: Callable[[], T],
+        cancellation: Optional[CancellationToken] = None,
+    ) -> Tuple[T, bool]:
+        """
+        Call `function`, unless a call with the same key is already in flight.
+
+        Callers that find a call in flight wait for it and get its result, or
+        its exception. With `lock_dir` set, the call also waits for any process
+        running the same key, so `function` should check the shared cache
+        before doing the expensive work. Waits are cut short if `cancellation`
+        is cancelled, and a caller that has waited `MAX_WAIT_SECONDS` for a
+        call that is stuck stops waiting and calls `function` itself.
+
+        Args:
+            key: Identifies calls that are interchangeable, e.g. a cache key.
+            function: The work to run if no identical call is in flight.
+            cancellation: Optional token of the caller, which stops it waiting.
+
+        Returns:
+            Tuple[T, bool]: The result, and whether it came from another
+                caller's call.
+
+        Raises:
+            AnalysisCancelled: If `cancellation` is cancelled while waiting.
+            Exception: Whatever the call that did the work raised.
+        """
+        cancellation = cancellation or CancellationToken()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            deadline = time.monotonic() + MAX_WAIT_SECONDS
+            while not call.done.wait(WAIT_INTERVAL_SECONDS):
+                cancellation.raise_if_cancelled()
+                if time.monotonic() >= deadline:
+                    logger.warning("Gave up waiting on an identical call; making it")
+                    return function(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            with self._process_lock(key, cancellation):
+                call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    @contextlib.contextmanager
+    def _process_lock(self, key: str, cancellation: CancellationToken) -> Iterator[None]:
+        """
+        Hold the key's lock file, if locks are shared with other processes.
+
+        The holder removes the file before releasing it, so lock files don't
+        pile up. A process that was waiting on a removed file notices, because
+        the path no longer leads to the file it locked, and locks the new one.
+        The lock is polled rather than waited on, so the wait can be cancelled;
+        after `MAX_WAIT_SECONDS` the call goes ahead without it.
+
+        Args:
+            key: The call's key.
+            cancellation: Token that stops the wait for the lock.
+
+        Yields:
+            None: Once no other process holds the key, or it has held it too long.
+
+        Raises:
+            AnalysisCancelled: If `cancellation` is cancelled while waiting.
+        """
+        if self.lock_dir is None:
+            yield
+            return
+
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest() + ".lock"
+        path = os.path.join(self.lock_dir, name)
+        deadline = time.monotonic() + MAX_WAIT_SECONDS
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    break
+                held = False  # Removed by the process that held it; lock the next one
+            except FileNotFoundError:
+                held = False
+            except BlockingIOError:
+                held = True
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+            if held:
+                if time.monotonic() >= deadline:
+                    logger.warning("Gave up waiting on another process; calling anyway")
+                    fd = None
+                    break
+                cancellation.sleep(WAIT_INTERVAL_SECONDS)
+
+        try:
+            yield
+        finally:
+            if fd is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(path)
+                os.close(fd)  # Releases the lock
+
+
+_process_single_flight = SingleFlight(DEFAULT_LOCK_DIR)
+
+
+def process_single_flight() -> SingleFlight:
+    """
+    Get the process-wide coalescing group, shared by every summarizer.
+
+    Returns:
+        SingleFlight: The group, coalescing across processes when
+            `BOOKBOT_LOCK_DIR` is set.
+    """
+    return _process_single_flight
@@ -3,10 +3,115 @@ Text statistics module for No Cap BookBot.
 
 Provides functions for analyzing book text, including word counts and
 identifying the most frequently used words (excluding common stop words).
+
+Statistics come from a `TextProfile`, built in a single pass over the text and
+cached by a hash of the text, so the UI never re-scans the same book and the
+cache doesn't keep whole books alive.
 """
 
+import hashlib
+import heapq
 import re
-from collections import Counter
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import List, Tuple
+
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'is', 'in', 'it', 'of', 'for', 'on',
+    'with', 'as', 'at', 'by', 'to', 'was', 'were', 'be', 'are',
+    'i', 'you', 'he', 'she', 'they', 'we', 'my', 'your', 'his',
+    'her', 'their', 'our', 'this', 'that', 'what', 'which', 'who'
+})
+TOP_WORDS_COUNT = 5
+PROFILE_CACHE_SIZE = 8  # Profiles of recent texts kept
+
+WHITESPACE_WORD = re.compile(r'\S+')
+WORD_CHARACTERS = re.compile(r'\b\w+\b')
+
+
+@dataclass
+class TextProfile:
+    """
+    Everything we need to know about a text's words, computed once.
+
+    Attributes:
+        word_count: Number of whitespace-separated words.
+        word_frequencies: Lowercased word counts, excluding stop words and
+            single-character words.
+        top_words: The most common words as (word, count), most frequent first
+            and alphabetical among ties.
+    """
+
+    word_count: int
+    word_frequencies: Counter
+    top_words: List[Tuple[str, int]]
+
+
+def build_text_profile(book_text: str, top_k: int = TOP_WORDS_COUNT) -> TextProfile:
+    """
+    Build a TextProfile for the given text.
+
+    Word counts are folded to lowercase per distinct word rather than by
+    lowercasing the whole text, and the top words are picked with a heap
+    instead of sorting every distinct word.
+
+    Args:
+        book_text: The text to analyze.
+        top_k: How many of the most common words to keep.
+
+    Returns:
+        TextProfile: The profile of the text.
+    """
+    word_count = sum(1 for _ in WHITESPACE_WORD.finditer(book_text))
+
+    word_frequencies = Counter()
+    for word, count in Counter(WORD_CHARACTERS.findall(book_text)).items():
+        word = word.lower()
+        if word not in STOP_WORDS and len(word) > 1:
+            word_frequencies[word] += count
+
+    top_words = heapq.nsmallest(top_k, word_frequencies.items(), key=lambda x: (-x[1], x[0]))
+
+    return TextProfile(
+        word_count=word_count,
+        word_frequencies=word_frequencies,
+        top_words=top_words,
+    )
+
+
+_profiles: "OrderedDict[bytes, TextProfile]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def get_text_profile(book_text: str) -> TextProfile:
+    """
+    Get the TextProfile for a text, building it only on first use.
+
+    Profiles are cached by a digest of the text rather than the text itself,
+    so the cache holds on to the statistics but not the books.
+
+    Args:
+        book_text: The text to analyze.
+
+    Returns:
+        TextProfile: The (possibly cached) profile of the text.
+    """
+    key = hashlib.blake2b(
+        book_text.encode("utf-8", "surrogatepass"), digest_size=16
+    ).digest()
+    with _profiles_lock:
+        profile = _profiles.get(key)
+        if profile is not None:
+            _profiles.move_to_end(key)
+            return profile
+
+    profile = build_text_profile(book_text)
+    with _profiles_lock:
+        _profiles[key] = profile
+        while len(_profiles) > PROFILE_CACHE_SIZE:
+            _profiles.popitem(last=False)
+    return profile
 
 def get_word_count(book_text: str) -> int:
     """
@@ -18,8 +123,7 @@ def get_word_count(book_text: str) -> int:
     Returns:
         int: The total word count.
     """
-    words = book_text.split()
-    return len(words)
+    return get_text_profile(book_text).word_count
 
 def get_common_words(book_text: str) -> str:
     """
@@ -35,20 +139,7 @@ def get_common_words(book_text: str) -> str:
         str: Formatted markdown string listing the top 5 words and counts,
              or an error message if no valid words are found.
     """
-    stop_words = {
-        'the', 'a', 'an', 'and', 'is', 'in', 'it', 'of', 'for', 'on',
-        'with', 'as', 'at', 'by', 'to', 'was', 'were', 'be', 'are',
-        'i', 'you', 'he', 'she', 'they', 'we', 'my', 'your', 'his',
-        'her', 'their', 'our', 'this', 'that', 'what', 'which', 'who'
-    }
-
-    lower_case_book = book_text.lower()
-    words = re.findall(r'\b\w+\b', lower_case_book)
-    filtered_words = [word for word in words if word not in stop_words and len(word) > 1]
-    word_counts = Counter(filtered_words)
-
-    sorted_words = sorted(word_counts.items(), key=lambda x: (-x[1], x[0]))
-    top_5_words = sorted_words[:5]
+    top_5_words = get_text_profile(book_text).top_words
     if not top_5_words:
         return "Oops fam, looks like I'm cappin'."
 
@@ -56,4 +147,3 @@ def get_common_words(book_text: str) -> str:
     for i, (word, count) in enumerate(top_5_words, 1):
         formatted_lines.append(f"{i}. **{word}**: {count}")
     return "\n".join(formatted_lines)
-
@@ -0,0 +1,478 @@
+"""
+Result storage for No Cap BookBot.
+
+Keeps everything that is expensive to produce — extracted book text, chunk
+summaries, master summaries and the final styled output — somewhere every
+replica of the app can read it, so an analysis done by one replica is reused by
+the others. `Storage` is the common interface; `SQLiteStorage` keeps results in
+a local file (which replicas on one host can share), and `RedisStorage` keeps
+them on a Redis server shared by replicas on any host. `open_storage` picks one
+from a URL, normally the `BOOKBOT_STORAGE_URL` environment variable.
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Sequence
+from urllib.parse import parse_qs, unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "BOOKBOT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "no-cap-bookbot"),
+)
+DEFAULT_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, "summaries.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB of stored summaries
+
+# Where results are stored, e.g. "redis://cache:6379/0"; unset uses the SQLite file
+DEFAULT_STORAGE_URL = os.environ.get("BOOKBOT_STORAGE_URL") or None
+
+REDIS_DEFAULT_PORT = 6379
+REDIS_KEY_PREFIX = "bookbot:"
+REDIS_TIMEOUT_SECONDS = 5.0
+REDIS_MAX_IDLE_CONNECTIONS = 8
+
+ACCESS_TIME_RESOLUTION_SECONDS = 60  # Reads don't update fresher access times
+EVICTION_TARGET = 0.9  # Share of `max_bytes` eviction frees the store down to
+
+
+class Storage:
+    """
+    Base class for result stores. Stores nothing, so every lookup misses.
+
+    Keys and values are strings. Implementations must be safe to share between
+    threads, and should treat their own failures as misses rather than raising,
+    since stored results only ever save work.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a stored value.
+
+        Args:
+            key: The value's key.
+
+        Returns:
+            str: The stored value, or None if there is none.
+        """
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a value, replacing any stored under the same key.
+
+        Args:
+            key: The value's key.
+            value: The value to store.
+        """
+
+    def close(self) -> None:
+        """Release the store's connections."""
+
+
+class RedisError(Exception):
+    """Raised when a Redis server answers a command with an error."""
+
+
+class RedisStorage(Storage):
+    """
+    Stores results on a Redis server, shared by every replica connected to it.
+
+    Speaks the Redis protocol directly, so no client library is needed and any
+    compatible server works. Connections are pooled, and a server that can't be
+    reached is logged and treated as a miss, so an outage slows analyses down
+    rather than failing them.
+
+    Attributes:
+        host: Server host name.
+        port: Server port.
+        db: Database number selected on each connection.
+        prefix: Prepended to every key, so the store can share a database.
+        ttl_seconds: Seconds each value is kept, or None to keep it until the
+            server evicts it.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = REDIS_DEFAULT_PORT,
+        db: int = 0,
+        password: Optional[str] = None,
+        prefix: str = REDIS_KEY_PREFIX,
+        ttl_seconds: Optional[int] = None,
+        timeout: float = REDIS_TIMEOUT_SECONDS,
+    ):
+        """
+        Configure the store; connections are opened when first needed.
+
+        Args:
+            host: Server host name.
+            port: Server port.
+            db: Database number to select.
+            password: Password to authenticate with, if the server requires one.
+            prefix: Prepended to every key.
+            ttl_seconds: Seconds each value is kept, or None for no expiry.
+            timeout: Seconds to wait when connecting or for a reply.
+        """
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self._password = password
+        self._timeout = timeout
+        self._idle: List[_RespConnection] = []
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self._command("GET", self.prefix + key)
+        except (OSError, RedisError) as e:
+            logger.warning(
+                "Couldn't read from Redis at %s:%s: %s", self.host, self.port, e
+            )
+            return None
+        return None if value is None else value.decode("utf-8")
+
+    def set(self, key: str, value: str) -> None:
+        command = ["SET", self.prefix + key, value]
+        if self.ttl_seconds:
+            command += ["EX", str(int(self.ttl_seconds))]
+        try:
+            self._command(*command)
+        except (OSError, RedisError) as e:
+            logger.warning(
+                "Couldn't write to Redis at %s:%s: %s", self.host, self.port, e
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _command(self, *args: str) -> Any:
+        """
+        Send a command on a pooled connection and return the server's reply.
+
+        A pooled connection may have been dropped by the server while idle, so
+        a command that fails on one is retried once on a fresh connection.
+
+        Args:
+            *args: The command name and its arguments.
+
+        Returns:
+            Any: The decoded reply.
+
+        Raises:
+            OSError: If the server can't be reached.
+            RedisError: If the server answers with an error.
+        """
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+
+        if connection is not None:
+            try:
+                return self._run(connection, args)
+            except OSError:
+                pass  # Dropped while idle; try a fresh connection
+        return self._run(self._connect(), args)
+
+    def _run(self, connection: "_RespConnection", args: Sequence[str]) -> Any:
+        """
+        Send a command on a connection, then pool the connection or close it.
+
+        A connection that answered, even with an error, goes back to the pool;
+        any other failure closes it, since it may be left mid-reply.
+        """
+        healthy = False
+        try:
+            reply = connection.command(args)
+            healthy = True
+            return reply
+        except RedisError:
+            healthy = True
+            raise
+        finally:
+            if healthy:
+                self._release(connection)
+            else:
+                connection.close()
+
+    def _connect(self) -> "_RespConnection":
+        """Open a connection, authenticated and on the configured database."""
+        connection = _RespConnection(self.host, self.port, self._timeout)
+        try:
+            if self._password is not None:
+                connection.command(("AUTH", self._password))
+            if self.db:
+                connection.command(("SELECT", str(self.db)))
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def _release(self, connection: "_RespConnection") -> None:
+        """Return a healthy connection to the pool, or close it if the pool is full."""
+        with self._lock:
+            if len(self._idle) < REDIS_MAX_IDLE_CONNECTIONS:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+
+class _RespConnection:
+    """A single connection speaking the Redis serialization protocol (RESP)."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self._socket = socket.create_connection((host, port), timeout)
+        self._reader = self._socket.makefile("rb")
+
+    def command(self, args: Sequence[str]) -> Any:
+        """
+        Send one command and read its reply.
+
+        Raises:
+            OSError: If the connection fails or is closed mid-reply.
+            RedisError: If the server answers with an error; the connection
+                remains usable.
+        """
+        parts = [f"*{len(args)}\r\n".encode("ascii")]
+        for arg in args:
+            data = arg.encode("utf-8")
+            parts.append(f"${len(data)}\r\n".encode("ascii") + data + b"\r\n")
+        self._socket.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def close(self) -> None:
+        self._reader.close()
+        self._socket.close()
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the server")
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise ConnectionError(f"Unexpected reply from the server: {line!r}")
+
+
+class SQLiteStorage(Storage):
+    """
+    SQLite-backed, size-bounded LRU store, kept in a local file.
+
+    A single instance is safe to share between threads, and several processes
+    may point at the same file.
+
+    Attributes:
+        path: Location of the SQLite database file.
+        max_bytes: Total size of stored values before eviction kicks in.
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        Open (or create) the database.
+
+        Args:
+            path: Location of the SQLite database file.
+            max_bytes: Total size of stored values before eviction kicks in.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS summaries_last_access ON summaries (last_access)"
+            )
+            # Total size of the values, kept up to date by triggers so writes
+            # don't have to add up every row (and shared by every process)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total INTEGER NOT NULL
+                )
+                """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS summaries_size_insert
+                AFTER INSERT ON summaries BEGIN
+                    UPDATE summaries_size SET total = total + new.size;
+                END
+                """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS summaries_size_update
+                AFTER UPDATE OF size ON summaries BEGIN
+                    UPDATE summaries_size SET total = total + new.size - old.size;
+                END
+                """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS summaries_size_delete
+                AFTER DELETE ON summaries BEGIN
+                    UPDATE summaries_size SET total = total - old.size;
+                END
+                """)
+            self._conn.execute("""
+                INSERT OR IGNORE INTO summaries_size (id, total)
+                SELECT 0, COALESCE(SUM(size), 0) FROM summaries
+                """)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a value and mark it as recently used.
+
+        The access time is only written when it is more than
+        `ACCESS_TIME_RESOLUTION_SECONDS` old, so repeated hits stay reads.
+
+        Args:
+            key: The value's key.
+
+        Returns:
+            str: The stored value, or None if there is none or the database
+                can't be read.
+        """
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT value, last_access FROM summaries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] > ACCESS_TIME_RESOLUTION_SECONDS:
+                    self._conn.execute(
+                        "UPDATE summaries SET last_access = ? WHERE key = ?", (now, key)
+                    )
+                return row[0]
+        except sqlite3.Error as e:
+            logger.warning("Couldn't read from %s: %s", self.path, e)
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a value, evicting least recently used entries if over budget.
+
+        Args:
+            key: The value's key.
+            value: The value to store.
+        """
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO summaries (key, value, size, last_access)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET value = excluded.value,
+                        size = excluded.size, last_access = excluded.last_access
+                    """,
+                    (key, value, size, time.time()),
+                )
+                self._evict()
+        except sqlite3.Error as e:
+            logger.warning("Couldn't write to %s: %s", self.path, e)
+
+    def _evict(self) -> None:
+        """
+        Delete least recently used entries once the store is over `max_bytes`.
+
+        Entries are deleted until the store is down to `EVICTION_TARGET` of
+        `max_bytes`, so eviction runs once in a while rather than on every write.
+        """
+        total = self._conn.execute("SELECT total FROM summaries_size").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * EVICTION_TARGET
+        rows = self._conn.execute(
+            "SELECT key, size FROM summaries ORDER BY last_access ASC"
+        )
+        stale_keys = []
+        for key, size in rows:
+            if total <= target:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM summaries WHERE key = ?", stale_keys)
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def open_storage(url: Optional[str] = None) -> Storage:
+    """
+    Open the store a URL names.
+
+    Args:
+        url: "redis://[:password@]host[:port][/db][?ttl=seconds]" for a Redis
+            server, or "sqlite:///path/to/file.sqlite3" (or a plain path) for a
+            SQLite file. Defaults to `BOOKBOT_STORAGE_URL`, and failing that to
+            the SQLite file in the cache directory.
+
+    Returns:
+        Storage: The opened store.
+
+    Raises:
+        ValueError: If the URL's scheme isn't supported.
+    """
+    url = url or DEFAULT_STORAGE_URL
+    if not url:
+        return SQLiteStorage()
+
+    parsed = urlsplit(url)
+    if parsed.scheme == "redis":
+        ttl = parse_qs(parsed.query).get("ttl")
+        return RedisStorage(
+            host=parsed.hostname or "127.0.0.1",
+            port=parsed.port or REDIS_DEFAULT_PORT,
+            db=int(parsed.path.lstrip("/") or 0),
+            password=unquote(parsed.password) if parsed.password else None,
+            ttl_seconds=int(ttl[0]) if ttl else None,
+        )
+    if parsed.scheme == "sqlite":
+        return SQLiteStorage(parsed.path)
+    if len(parsed.scheme) <= 1:  # A plain path, or a Windows drive letter
+        return SQLiteStorage(url)
+    raise ValueError(f"Unsupported storage URL scheme: '{parsed.scheme}'")
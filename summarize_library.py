@@ -0,0 +1,478 @@
+"""
+No Cap BookBot - Headless Library Summarizer
+
+Summarizes every EPUB, PDF and TXT file in a directory without the Streamlit UI,
+writing one JSON object per book to a JSONL file. Books are processed across a
+pool of worker processes that share a global cap on concurrent API requests.
+
+Interrupted runs can be resumed: finished books are recorded in a checkpoint file
+and skipped, and chunk summaries already produced for unfinished books are served
+from the persistent summary cache instead of being requested again.
+
+With --batch, every stage is submitted for all books at once through the OpenAI
+Batch API instead, which is cheaper and leaves interactive rate limits alone but
+can take up to a day per stage. Submitted batch jobs are recorded in the
+checkpoint file too, so an interrupted bulk run re-attaches to them.
+
+Usage:
+    python summarize_library.py path/to/books --output summaries.jsonl
+    python summarize_library.py path/to/books --batch
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import openai
+
+import src.extract as extract
+import src.stats as stats
+from src.batch import BatchRunner, BulkSummarizer
+from src.BookSummarizer import BookSummarizer
+from src.chunking import Piece, join_text
+from src.cleanup import CleanupReport, clean_pieces
+from src.hedging import process_hedge_policy
+from src.metrics import Metrics, process_metrics
+from src.progress import LoggingProgress
+from src.prompt import GENZ_PROMPT
+from src.scheduler import (
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_TOKENS_PER_MINUTE,
+    RequestScheduler,
+)
+from src.storage import DEFAULT_CACHE_PATH, DEFAULT_STORAGE_URL, open_storage
+
+logger = logging.getLogger("summarize_library")
+
+# Per-process state for pool workers, set up once by `init_worker`
+_worker_summarizer = None
+
+
+def find_books(directory: str) -> List[str]:
+    """
+    Find every supported book file under a directory.
+
+    Args:
+        directory: Directory to search recursively.
+
+    Returns:
+        List[str]: Paths of EPUB, PDF and TXT files, sorted for a stable order.
+    """
+    books = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in extract.SUPPORTED_FILE_TYPES:
+                books.append(os.path.join(root, name))
+    return sorted(books)
+
+
+def file_sha256(path: str) -> str:
+    """
+    Hash a file's contents, so renamed or moved books are still recognized.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        str: Hex SHA-256 digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """
+    Read the content hashes of books finished by previous runs.
+
+    Args:
+        path: Path to the checkpoint file (one JSON object per line).
+
+    Returns:
+        Set[str]: SHA-256 digests of finished books.
+    """
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                finished.add(json.loads(line)["sha256"])
+            except (ValueError, KeyError):
+                continue  # Ignore a line truncated by an interrupted run
+    return finished
+
+
+def load_batch_jobs(path: str) -> List[Dict[str, str]]:
+    """
+    Read the batch jobs submitted by previous bulk runs.
+
+    Args:
+        path: Path to the checkpoint file (one JSON object per line).
+
+    Returns:
+        List[Dict[str, str]]: Submission records from `BatchRunner.on_submit`,
+            oldest first.
+    """
+    jobs = []
+    if not os.path.exists(path):
+        return jobs
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Ignore a line truncated by an interrupted run
+            if "input_sha256" in record:
+                jobs.append(record)
+    return jobs
+
+
+def append_line(path: str, record: Dict) -> None:
+    """
+    Append a JSON record to a file and flush it to disk.
+
+    Args:
+        path: Path to the JSONL file.
+        record: The record to append.
+    """
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def init_worker(
+    api_key: str,
+    request_slots,
+    cache_path: str,
+    max_concurrency: int,
+    base_url: Optional[str] = None,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+) -> None:
+    """
+    Set up a pool worker with its own summarizer.
+
+    Args:
+        api_key: OpenAI API key for authentication.
+        request_slots: Semaphore shared by all workers that caps concurrent
+            API requests across the whole run.
+        cache_path: Path or URL of the shared result store.
+        max_concurrency: Chunk requests each worker may have in flight.
+        base_url: Optional OpenAI-compatible API endpoint.
+        requests_per_minute: This worker's share of the request rate limit.
+        tokens_per_minute: This worker's share of the token rate limit.
+    """
+    global _worker_summarizer
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(processName)s %(message)s"
+    )
+    # The library pool already uses every core; don't nest PDF process pools
+    extract.PDF_WORKERS = 1
+    _worker_summarizer = BookSummarizer(
+        api_key,
+        max_concurrency=max_concurrency,
+        cache=open_storage(cache_path),
+        request_slots=request_slots,
+        base_url=base_url,
+        scheduler=RequestScheduler(requests_per_minute, tokens_per_minute),
+        hedging=process_hedge_policy(),
+    )
+
+
+def summarize_book(path: str, sha256: str) -> Dict:
+    """
+    Extract and summarize one book; runs inside a pool worker.
+
+    Args:
+        path: Path to the book file.
+        sha256: Content hash of the book file.
+
+    Returns:
+        Dict: The output record for the book, plus its per-stage metrics under
+            "metrics" for the parent process to aggregate.
+    """
+    name = os.path.basename(path)
+    pieces = []
+    report = CleanupReport(_worker_summarizer.model)
+
+    def read_pieces():
+        raw_pieces = extract.iter_text_from_file(path, sections=True)
+        for piece in clean_pieces(raw_pieces, report):
+            pieces.append(piece)
+            yield piece
+
+    metrics = Metrics()
+    _worker_summarizer.metrics = metrics
+    with metrics.activate():
+        summary = _worker_summarizer.process_stream(
+            read_pieces(), GENZ_PROMPT, progress=LoggingProgress(name, logger)
+        )
+    book_text = join_text(pieces)
+    return {
+        "path": path,
+        "sha256": sha256,
+        "words": stats.get_word_count(book_text),
+        "model": _worker_summarizer.model,
+        "summary": summary,
+        "cleanup": report.to_dict(),
+        "usage": metrics.totals(),
+        "metrics": metrics.rows(),
+    }
+
+
+def summarize_in_bulk(
+    args: argparse.Namespace, pending: List[Tuple[str, str]], checkpoint_path: str
+) -> int:
+    """
+    Summarize books through the Batch API, one job per pipeline stage.
+
+    Args:
+        args: Parsed command-line arguments.
+        pending: (path, sha256) of each book still to summarize.
+        checkpoint_path: Checkpoint file of finished books.
+
+    Returns:
+        int: Number of books that failed.
+    """
+    summarizer = BookSummarizer(
+        args.api_key, cache=open_storage(args.cache_path), base_url=args.base_url
+    )
+    # A dedicated client: batch jobs poll for hours, which the shared clients'
+    # idle eviction isn't meant for
+    client = openai.OpenAI(api_key=args.api_key, base_url=args.base_url)
+    runner = BatchRunner(
+        client,
+        summarizer.model,
+        cache=summarizer.cache,
+        poll_interval=args.poll_interval,
+        submitted=load_batch_jobs(checkpoint_path),
+        on_submit=lambda record: append_line(checkpoint_path, record),
+    )
+    bulk = BulkSummarizer(summarizer, runner)
+
+    paths = {sha256: path for path, sha256 in pending}
+    words: Dict[str, int] = {}
+    cleanups: Dict[str, CleanupReport] = {}
+    failures = 0
+
+    def read_books() -> Iterator[Tuple[str, List[Piece]]]:
+        nonlocal failures
+        for path, sha256 in pending:
+            report = CleanupReport(summarizer.model)
+            try:
+                raw_pieces = extract.iter_text_from_file(path, sections=True)
+                pieces = list(clean_pieces(raw_pieces, report))
+            except Exception as e:
+                failures += 1
+                logger.error("%s failed: %s", path, e)
+                continue
+            words[sha256] = stats.get_word_count(join_text(pieces))
+            cleanups[sha256] = report
+            yield sha256, pieces
+
+    summaries = bulk.summarize_books(read_books(), GENZ_PROMPT)
+
+    for sha256, reason in bulk.failures.items():
+        failures += 1
+        logger.error("%s failed: %s", paths[sha256], reason)
+
+    for sha256, summary in summaries.items():
+        path = paths[sha256]
+        append_line(
+            args.output,
+            {
+                "path": path,
+                "sha256": sha256,
+                "words": words[sha256],
+                "model": summarizer.model,
+                "summary": summary,
+                "cleanup": cleanups[sha256].to_dict(),
+            },
+        )
+        append_line(checkpoint_path, {"path": path, "sha256": sha256})
+    logger.info("%d books done", len(summaries))
+
+    return failures
+
+
+def write_metrics(path: str) -> None:
+    """
+    Write the run's per-stage metrics in Prometheus text format, if asked to.
+
+    Args:
+        path: Destination file, or None to skip.
+    """
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(process_metrics().to_prometheus())
+    logger.info("Metrics written to %s", path)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Summarize a directory of EPUB, PDF and TXT books into JSONL."
+    )
+    parser.add_argument("directory", help="Directory containing the books")
+    parser.add_argument(
+        "--output", default="summaries.jsonl", help="JSONL file to append to"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Checkpoint file of finished books (default: <output>.checkpoint)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes extracting and summarizing books",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=16,
+        help="Maximum API requests in flight across all workers",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help="Account request rate limit, shared out between workers",
+    )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=float,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help="Account token rate limit, shared out between workers",
+    )
+    parser.add_argument(
+        "--cache-path",
+        default=DEFAULT_STORAGE_URL or DEFAULT_CACHE_PATH,
+        help="Result store shared by workers and used to resume chunks: a SQLite"
+        " file, or a redis:// URL (default: $BOOKBOT_STORAGE_URL or the cache file)",
+    )
+    parser.add_argument(
+        "--api-key",
+        default=os.environ.get("OPENAI_API_KEY"),
+        help="OpenAI API key (default: $OPENAI_API_KEY)",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=os.environ.get("OPENAI_BASE_URL"),
+        help="OpenAI-compatible API endpoint (default: $OPENAI_BASE_URL)",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Write per-stage timings, token usage and cost here, in Prometheus format",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit every stage through the Batch API instead of live requests",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=60,
+        help="Seconds between Batch API status checks (with --batch)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    """
+    Run the library summarizer.
+
+    Args:
+        argv: Command-line arguments, excluding the program name.
+
+    Returns:
+        int: Process exit code; non-zero if any book failed.
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    if not args.api_key:
+        logger.error("No API key: pass --api-key or set OPENAI_API_KEY")
+        return 2
+
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    finished = load_checkpoint(checkpoint_path)
+
+    pending = []
+    for path in find_books(args.directory):
+        sha256 = file_sha256(path)
+        if sha256 in finished:
+            continue
+        finished.add(sha256)  # Also skips duplicate copies within this run
+        pending.append((path, sha256))
+
+    logger.info(
+        "%d books to summarize (%d already done)",
+        len(pending),
+        len(finished) - len(pending),
+    )
+    if not pending:
+        return 0
+
+    if args.batch:
+        failures = summarize_in_bulk(args, pending, checkpoint_path)
+        write_metrics(args.metrics_file)
+        return 1 if failures else 0
+
+    workers = max(1, min(args.workers, len(pending)))
+    max_concurrency = max(1, args.max_requests // workers)
+    failures = 0
+
+    with multiprocessing.Manager() as manager:
+        request_slots = manager.BoundedSemaphore(args.max_requests)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(
+                args.api_key,
+                request_slots,
+                args.cache_path,
+                max_concurrency,
+                args.base_url,
+                args.requests_per_minute / workers,
+                args.tokens_per_minute / workers,
+            ),
+        ) as executor:
+            futures = {
+                executor.submit(summarize_book, path, sha256): path
+                for path, sha256 in pending
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    failures += 1
+                    logger.error("[%d/%d] %s failed: %s", done, len(futures), path, e)
+                    continue
+
+                process_metrics().merge(record.pop("metrics"))
+                append_line(args.output, record)
+                append_line(checkpoint_path, {"path": path, "sha256": record["sha256"]})
+                logger.info("[%d/%d] %s done", done, len(futures), path)
+
+    write_metrics(args.metrics_file)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
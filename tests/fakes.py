@@ -0,0 +1,29 @@
+"""Fakes shared by the tests, standing in for the OpenAI client."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeClient:
+    """Answers chat completions after the next of a list of delays."""
+
+    def __init__(self, *delays):
+        self.delays = list(delays) or [0.0]
+        self.calls = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, stream=False, **request):
+        with self._lock:
+            call = self.calls
+            self.calls += 1
+            self.prompts.append(messages[0]["content"])
+        time.sleep(self.delays[min(call, len(self.delays) - 1)])
+        content = f"answer {call}"
+        if stream:
+            delta = SimpleNamespace(content=content)
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=delta)])])
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
@@ -0,0 +1,94 @@
+"""Tests for bulk summarization through the Batch API, against the mock server."""
+
+import json
+import os
+
+import pytest
+
+import summarize_library
+from benchmarks.fixtures import synthetic_book, write_fixture
+from benchmarks.mock_server import MockLLMServer
+
+
+class Interrupted(Exception):
+    """Stands in for the run being killed while it waits on a batch job."""
+
+
+@pytest.fixture
+def server():
+    with MockLLMServer(latency=0) as server:
+        yield server
+
+
+@pytest.fixture
+def library(tmp_path):
+    books = tmp_path / "books"
+    books.mkdir()
+    write_fixture(str(books), "short.txt", synthetic_book(2_000, seed=1).encode())
+    write_fixture(str(books), "long.txt", synthetic_book(60_000, seed=2).encode())
+    return books
+
+
+def run_bulk(server, library, tmp_path):
+    return summarize_library.main(
+        [
+            str(library),
+            "--batch",
+            "--api-key",
+            "test",
+            "--base-url",
+            server.url,
+            "--output",
+            str(tmp_path / "summaries.jsonl"),
+            "--cache-path",
+            str(tmp_path / "cache.sqlite3"),
+            "--poll-interval",
+            "0",
+        ]
+    )
+
+
+def read_summaries(tmp_path):
+    with open(tmp_path / "summaries.jsonl", encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    return {os.path.basename(record["path"]): record for record in records}
+
+
+def test_bulk_run_goes_through_every_stage(server, library, tmp_path):
+    assert run_bulk(server, library, tmp_path) == 0
+
+    summaries = read_summaries(tmp_path)
+    assert set(summaries) == {"short.txt", "long.txt"}
+    assert all("no cap" in record["summary"] for record in summaries.values())
+    # Map (chunks and the short book's single request), master, Gen Z rewrite
+    assert server.batches_created == 3
+
+    # A rerun finds every book finished and submits nothing
+    assert run_bulk(server, library, tmp_path) == 0
+    assert server.batches_created == 3
+
+
+def test_interrupted_bulk_run_reattaches_to_its_batch(
+    server, library, tmp_path, monkeypatch
+):
+    def interrupt(seconds):
+        raise Interrupted()
+
+    monkeypatch.setattr("src.batch.time.sleep", interrupt)
+    with pytest.raises(Interrupted):
+        run_bulk(server, library, tmp_path)
+    assert server.batches_created == 1
+
+    monkeypatch.undo()
+    assert run_bulk(server, library, tmp_path) == 0
+
+    # The map job was picked up again instead of being paid for twice
+    assert server.batches_created == 3
+    assert set(read_summaries(tmp_path)) == {"short.txt", "long.txt"}
+    with open(tmp_path / "summaries.jsonl.checkpoint", encoding="utf-8") as file:
+        jobs = [json.loads(line) for line in file if "batch_id" in line]
+    assert [job["batch_id"] for job in jobs] == [
+        "batch-mock-1",
+        "batch-mock-2",
+        "batch-mock-3",
+    ]
@@ -0,0 +1,32 @@
+"""Tests for the benchmark's statistics and baseline comparison."""
+
+from benchmarks.bench_pipeline import compare_to_baseline, percentile
+
+
+def test_percentile_uses_nearest_rank():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+
+    assert percentile(values, 0.5) == 3.0
+    assert percentile(values, 0.95) == 5.0
+    assert percentile(values, 0.0) == 1.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_compare_to_baseline_flags_slowdowns_and_extra_calls():
+    baseline = [
+        {"case": "a", "p50_seconds": 1.0, "llm_calls": 10},
+        {"case": "b", "p50_seconds": 1.0, "llm_calls": 10},
+        {"case": "c", "p50_seconds": 1.0, "llm_calls": 10},
+    ]
+    results = [
+        {"case": "a", "p50_seconds": 1.2, "llm_calls": 10},  # Within the limit
+        {"case": "b", "p50_seconds": 1.5, "llm_calls": 10},
+        {"case": "c", "p50_seconds": 0.5, "llm_calls": 11},
+        {"case": "new", "p50_seconds": 9.0, "llm_calls": 99},  # No baseline
+    ]
+
+    regressions = compare_to_baseline(results, baseline, 1.25)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("b:")
+    assert regressions[1] == "c: 10 -> 11 LLM calls"
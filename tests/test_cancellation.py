@@ -0,0 +1,51 @@
+"""Tests for cooperative cancellation."""
+
+import threading
+import time
+
+import pytest
+
+from src.cancellation import AnalysisCancelled, CancellationToken
+
+
+def test_cancel_runs_the_callbacks_once_and_keeps_the_first_reason():
+    token = CancellationToken()
+    calls = []
+
+    def broken():
+        raise RuntimeError("boom")
+
+    with token.on_cancel(broken), token.on_cancel(lambda: calls.append(1)):
+        assert token.cancel("superseded")
+        assert not token.cancel("abandoned")
+
+    assert calls == [1]  # Despite the broken callback before it
+    assert token.reason == "superseded"
+    with pytest.raises(AnalysisCancelled, match="superseded"):
+        token.raise_if_cancelled()
+
+
+def test_callbacks_are_dropped_once_their_block_ends():
+    token = CancellationToken()
+    calls = []
+    with token.on_cancel(lambda: calls.append(1)):
+        pass
+
+    token.cancel()
+
+    assert calls == []
+    with pytest.raises(AnalysisCancelled):
+        with token.on_cancel(lambda: calls.append(1)):
+            pass
+    assert calls == []
+
+
+def test_sleep_wakes_up_when_cancelled():
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    started = time.monotonic()
+    with pytest.raises(AnalysisCancelled):
+        token.sleep(5)
+
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,146 @@
+"""Tests for token counting and chunking."""
+
+import logging
+import random
+from types import SimpleNamespace
+
+import pytest
+import tiktoken
+
+from src import chunking
+from src.chunking import SectionStart, TokenChunker
+
+
+def test_failed_tokenizer_is_retried_later(monkeypatch):
+    encoding = SimpleNamespace(name="o200k_base")
+    loads = iter([None, encoding])
+    now = [0.0]
+    monkeypatch.setattr(chunking, "_encodings", {})
+    monkeypatch.setattr(chunking, "_load_encoding", lambda model: next(loads))
+    monkeypatch.setattr(chunking.time, "monotonic", lambda: now[0])
+
+    assert chunking.tokenizer_name("gpt-4o-mini") == chunking.ESTIMATED_TOKENIZER
+    now[0] += chunking.ENCODING_RETRY_SECONDS / 2
+    assert chunking.get_encoding("gpt-4o-mini") is None
+
+    now[0] += chunking.ENCODING_RETRY_SECONDS
+    assert chunking.get_encoding("gpt-4o-mini") is encoding
+    assert chunking.tokenizer_name("gpt-4o-mini") == "o200k_base"
+
+
+def test_tokenizer_that_fails_to_load_is_reported(monkeypatch, caplog):
+    def offline(model):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", offline)
+
+    with caplog.at_level(logging.WARNING, logger="src.chunking"):
+        assert chunking._load_encoding("gpt-4o-mini") is None
+
+    assert "estimating token counts" in caplog.text
+
+
+def book_text(seed, paragraphs=300):
+    """Paragraphs of varied length, some far longer than a chunk."""
+    rng = random.Random(seed)
+    words = "the river rose and she watched from the mill while barges passed".split()
+    text = []
+    for _ in range(paragraphs):
+        sentences = rng.choice([1, 2, 5, 40]) if rng.random() < 0.95 else 200
+        text.append(
+            " ".join(
+                " ".join(rng.choices(words, k=rng.randint(3, 25))).capitalize() + "."
+                for _ in range(sentences)
+            )
+        )
+    return "\n\n".join(text) + "\n"
+
+
+def split_randomly(text, seed):
+    """Cut a text into pieces at random points, as pages would."""
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), 200))
+    return [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("boundary", ["paragraph", "sentence"])
+@pytest.mark.parametrize("content_defined", [False, True])
+def test_streamed_chunks_match_the_plan_for_the_whole_text(boundary, content_defined):
+    chunker = TokenChunker(
+        "gpt-4o-mini", 500, 50, boundary=boundary, content_defined=content_defined
+    )
+    for seed in range(3):
+        text = book_text(seed)
+
+        streamed = list(chunker.iter_chunks(split_randomly(text, seed)))
+
+        assert streamed == list(chunker.plan(text))
+
+
+def test_text_without_paragraph_breaks_still_streams():
+    chunker = TokenChunker("gpt-4o-mini", 500, 50)
+    text = book_text(1).replace("\n\n", " ")
+    pieces = split_randomly(text, 1)
+    emitted_before_the_end = 0
+
+    def stream():
+        nonlocal emitted_before_the_end
+        for i, piece in enumerate(pieces):
+            yield piece
+            if i == len(pieces) // 2:
+                emitted_before_the_end = len(chunks)
+
+    chunks = []
+    for chunk in chunker.iter_chunks(stream()):
+        chunks.append(chunk)
+
+    assert chunks == list(chunker.plan(text))
+    assert emitted_before_the_end > 0
+
+
+def test_packed_sections_count_the_breaks_between_them(monkeypatch):
+    monkeypatch.setattr(chunking, "get_encoding", lambda model: None)  # Estimates
+    chunker = TokenChunker("gpt-4o-mini", 10)
+    pieces = [SectionStart("One"), "a" * 20, SectionStart("Two"), "b" * 20]
+
+    chunks = list(chunker.iter_chunks(pieces))
+
+    # Each section is 5 tokens; with the break between them they'd need 11
+    assert chunks == ["a" * 20, "b" * 20]
+
+
+def changed_chunks(chunker, paragraphs, edited):
+    """Indices of the chunks of the edited text that the original doesn't have."""
+    before = set(chunker.plan("\n\n".join(paragraphs)))
+    after = list(chunker.plan("\n\n".join(edited)))
+    edits = [i for i, chunk in enumerate(after) if "flooded" in chunk]
+    return [i for i, chunk in enumerate(after) if chunk not in before], edits
+
+
+def test_edits_only_change_the_chunks_around_them(monkeypatch):
+    monkeypatch.setattr(chunking, "get_encoding", lambda model: None)  # Estimates
+    rng = random.Random(0)
+    words = "the river rose and she watched from the mill while barges passed".split()
+
+    def paragraph():
+        return " ".join(rng.choices(words, k=60)).capitalize() + "."
+
+    # Paragraphs of much the same length, where greedy packing can't recover
+    paragraphs = [paragraph() for _ in range(400)]
+    edited = paragraphs.copy()
+    edited[200] = edited[200].replace(" the ", " the flooded ", 1)
+    edited.insert(5, paragraph() + " The mill flooded.")
+
+    changed, edits = changed_chunks(
+        TokenChunker("gpt-4o-mini", 1000, 50, content_defined=True),
+        paragraphs,
+        edited,
+    )
+    assert len(edits) == 2
+    assert all(min(abs(i - edit) for edit in edits) <= 1 for i in changed)
+
+    # Greedy chunks all shift by the inserted paragraph and never fall back in step
+    changed, _ = changed_chunks(
+        TokenChunker("gpt-4o-mini", 1000, 50), paragraphs, edited
+    )
+    assert len(changed) > 20
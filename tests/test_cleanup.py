@@ -0,0 +1,159 @@
+"""Tests for boilerplate removal, on prose that must survive it."""
+
+from benchmarks.fixtures import make_pdf, synthetic_book
+from src.cleanup import CleanupReport, clean_pieces
+from src.extract import iter_pdf_text
+
+WORDS = "rain river mill barge bridge village night window water stone".split()
+
+
+def sentence(seed):
+    # No digits: headers are matched up to page numbers, so lines must differ by word
+    words = [WORDS[seed // len(WORDS) ** i % len(WORDS)] for i in range(3)]
+    return "The " + " and the ".join(words) + " were all she could see.\n"
+
+
+def page(number, top="", bottom=""):
+    """A page of prose whose lines, headers aside, are all its own."""
+    lines = [top] if top else []
+    lines.extend(sentence(number * 10 + i) for i in range(5))
+    if bottom:
+        lines.append(bottom)
+    return "".join(lines)
+
+
+def clean(pages):
+    report = CleanupReport()
+    return "".join(clean_pieces(pages, report)), report
+
+
+def test_running_header_on_every_page_is_dropped():
+    pages = [page(n, top=f"THE RIVER MILL {n}\n") for n in range(1, 13)]
+
+    text, report = clean(pages)
+
+    assert "THE RIVER MILL" not in text
+    assert report.characters_removed["running_header"] > 0
+    assert text.count(sentence(10)) == 1
+
+
+def test_alternating_left_and_right_headers_are_dropped():
+    pages = [
+        page(n, top="A NOVEL\n" if n % 2 else "THE RIVER MILL\n") for n in range(1, 13)
+    ]
+
+    text, _ = clean(pages)
+
+    assert "A NOVEL" not in text
+    assert "THE RIVER MILL" not in text
+
+
+def test_occasional_dialogue_and_scene_breaks_at_page_edges_are_kept():
+    # Short lines that open or close a few pages of a long book, as dialogue and
+    # scene breaks do, are not headers however often they recur overall
+    pages = []
+    for n in range(1, 41):
+        top = '"No."\n' if n % 5 == 0 else ""
+        bottom = "* * *\n" if n % 4 == 0 else ""
+        pages.append(page(n, top=top, bottom=bottom))
+
+    text, report = clean(pages)
+
+    assert text.count('"No."') == 8
+    assert text.count("* * *") == 10
+    assert "running_header" not in report.characters_removed
+
+
+def test_short_pages_do_not_dilute_a_running_header():
+    pages = [page(n, top="THE RIVER MILL\n") for n in range(1, 13)]
+    pages[5] = "THE RIVER MILL\nThe end of the chapter.\n"
+
+    text, _ = clean(pages)
+
+    assert text.count("THE RIVER MILL") == 0
+
+
+def contents_page():
+    entries = [f"Chapter {n}: The {WORDS[n]} at night ........ {n * 12}\n" for n in range(8)]
+    return "Contents\n\n" + "".join(entries)
+
+
+def test_table_of_contents_in_front_matter_is_dropped():
+    pages = [contents_page()] + [page(n) for n in range(1, 6)]
+
+    text, report = clean(pages)
+
+    assert "Chapter 3" not in text
+    assert report.characters_removed["contents"] > 0
+    assert sentence(10) in text
+
+
+def test_prose_lines_ending_in_numbers_are_kept_past_the_front_matter():
+    # Far into the book, lines ending in a number are prose, not contents
+    lines = [
+        "He was born in 1912\n",
+        "and they gave him Room 101\n",
+        "on the corner of Bridge Street, number 27\n",
+        "where the lease ran until 1950\n",
+        "and the rent was due on the 1\n",
+        "Nobody there had heard of the war.\n",
+    ]
+    pages = [page(n) for n in range(1, 200)] + ["".join(lines)]
+
+    text, report = clean(pages)
+
+    assert "He was born in 1912" in text
+    assert "Room 101" in text
+    assert "contents" not in report.characters_removed
+
+
+def test_titled_contents_later_in_the_book_is_dropped():
+    pages = [page(n) for n in range(1, 200)] + [contents_page()]
+
+    text, report = clean(pages)
+
+    assert "Chapter 3" not in text
+    assert report.characters_removed["contents"] > 0
+
+
+def test_syllable_splits_are_joined_and_compound_hyphens_kept():
+    text, report = clean(
+        [
+            "The well-known road continued past the mill, and she was known there.\n"
+            "It con-\n"
+            "tinued to rain on the well-\n"
+            "known road and on the self-\n"
+            "taught miller, who had an ill-\n"
+            "fated barge. The road was con-\n"
+            "tinued, the barge was differ-\n"
+            "ent, and the mill stood by the road.\n"
+        ]
+    )
+
+    assert "It continued" in text
+    assert "was continued" in text
+    assert "different" in text
+    assert "well-known road and" in text
+    assert "self-taught" in text
+    assert "ill-fated" in text
+    assert report.hyphens_rejoined == 6
+
+
+def test_compound_split_across_pages_keeps_its_hyphen():
+    pages = [page(1) + "A road and a mill, both well-\n", "known to her.\n" + page(2)]
+
+    text, _ = clean(pages)
+
+    assert "both well-known to her." in text
+
+
+def test_typeset_book_loses_only_its_running_headers_and_page_numbers():
+    book = synthetic_book(20_000)
+    pdf = make_pdf(book, running_header="A BENCHMARK BOOK")
+    report = CleanupReport()
+
+    text = "".join(clean_pieces(iter_pdf_text(pdf), report))
+
+    assert "A BENCHMARK BOOK" not in text
+    assert text.split() == book.split()
+    assert set(report.characters_removed) == {"running_header", "page_number"}
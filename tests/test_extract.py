@@ -0,0 +1,137 @@
+"""Tests for extracting PDFs in worker processes, and EPUBs in reading order."""
+
+import glob
+import io
+import os
+import tempfile
+import zipfile
+
+import pymupdf
+import pytest
+
+from src import extract
+from src.chunking import SectionStart, join_text
+
+
+def make_pdf(page_count):
+    doc = pymupdf.open()
+    for number in range(page_count):
+        doc.new_page().insert_text((72, 72), f"This is page {number}.")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_parallel_extraction_matches_reading_every_page():
+    data = make_pdf(30)
+    with pymupdf.open(stream=data, filetype="pdf") as doc:
+        expected = [page.get_text() for page in doc.pages()]
+
+    pages = list(extract._iter_pdf_pages_in_parallel(data, len(expected)))
+
+    assert pages == expected
+    assert not glob.glob(os.path.join(tempfile.gettempdir(), "bookbot-*.pdf"))
+
+
+def test_stopping_parallel_extraction_early_removes_the_temporary_file():
+    data = make_pdf(30)
+
+    pages = extract._iter_pdf_pages_in_parallel(data, 30)
+    assert next(pages).startswith("This is page 0.")
+    pages.close()
+
+    assert not glob.glob(os.path.join(tempfile.gettempdir(), "bookbot-*.pdf"))
+
+
+CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+PACKAGE = """<?xml version="1.0"?>
+<package version="3.0" xmlns="http://www.idpf.org/2007/opf">
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="three" href="text/three.xhtml" media-type="application/xhtml+xml"/>
+    <item id="one" href="text/one.xhtml" media-type="application/xhtml+xml"/>
+    <item id="two" href="text/two.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine toc="ncx">
+    <itemref idref="one"/>
+    <itemref idref="two"/>
+    <itemref idref="three"/>
+  </spine>
+</package>"""
+
+NAV = """<?xml version="1.0"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+  <body>
+    <nav epub:type="toc"><ol>
+      <li><a href="text/one.xhtml">Chapter One</a></li>
+      <li><a href="text/three.xhtml#start">Chapter Three</a></li>
+    </ol></nav>
+  </body>
+</html>"""
+
+NCX = """<?xml version="1.0"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+  <navMap>
+    <navPoint id="p1"><navLabel><text>Chapter One</text></navLabel>
+      <content src="text/one.xhtml"/></navPoint>
+    <navPoint id="p3"><navLabel><text>Chapter Three</text></navLabel>
+      <content src="text/three.xhtml#start"/></navPoint>
+  </navMap>
+</ncx>"""
+
+
+def document(body):
+    return (
+        '<?xml version="1.0"?><html xmlns="http://www.w3.org/1999/xhtml">'
+        "<head><style>p { color: red; }</style></head>"
+        f"<body>{body}</body></html>"
+    )
+
+
+def make_epub(table_of_contents):
+    """A three-chapter EPUB whose archive order differs from its reading order."""
+    package = PACKAGE
+    if table_of_contents == "ncx":  # EPUB 2: no navigation document
+        package = package.replace(' properties="nav"', "")
+    files = {
+        "mimetype": "application/epub+zip",
+        "META-INF/container.xml": CONTAINER,
+        "OEBPS/content.opf": package,
+        "OEBPS/nav.xhtml": NAV,
+        "OEBPS/toc.ncx": NCX,
+        "OEBPS/text/three.xhtml": document('<p id="start">The mill burned.</p>'),
+        "OEBPS/text/one.xhtml": document("<p>The river rose.</p>"),
+        "OEBPS/text/two.xhtml": document(
+            "<p>The barges &amp; boats left.</p><script>track();</script>"
+        ),
+    }
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return data.getvalue()
+
+
+@pytest.mark.parametrize("table_of_contents", ["nav", "ncx"])
+@pytest.mark.parametrize("parser", ["lxml", "fallback"])
+def test_epub_is_read_in_spine_order_with_its_chapters(
+    table_of_contents, parser, monkeypatch
+):
+    if parser == "fallback":
+        monkeypatch.setattr(extract, "lxml", None)
+
+    pieces = list(extract.iter_epub_text(make_epub(table_of_contents), sections=True))
+
+    assert [piece.title for piece in pieces if isinstance(piece, SectionStart)] == [
+        "Chapter One",
+        "Chapter Three",
+    ]
+    text = " ".join(join_text(pieces).split())
+    assert text == "The river rose. The barges & boats left. The mill burned."
@@ -0,0 +1,67 @@
+"""Tests for hedged requests, with a fake client in place of the API."""
+
+import threading
+import time
+
+from src.BookSummarizer import BookSummarizer
+from src.hedging import HedgePolicy
+from src.metrics import Metrics
+from src.singleflight import SingleFlight
+from tests.fakes import FakeClient
+
+
+def trained_policy(budget_ratio, threshold=0.05):
+    """A policy that hedges requests for 100 tokens after `threshold` seconds."""
+    # At the 0th percentile, later (slower) latencies don't raise the threshold
+    policy = HedgePolicy(percentile=0, budget_ratio=budget_ratio, min_samples=1)
+    policy.observe(100, threshold)
+    return policy
+
+
+def summarizer(client, policy, **options):
+    return BookSummarizer(
+        "test",
+        client=client,
+        hedging=policy,
+        metrics=Metrics(),
+        single_flight=SingleFlight(),
+        **options,
+    )
+
+
+def test_slow_request_is_hedged_and_the_first_answer_wins():
+    client = FakeClient(2.0, 0.0)
+    bot = summarizer(client, trained_policy(budget_ratio=1.0))
+
+    started = time.perf_counter()
+    answer = bot.model_response("prompt", 100, 0.0)
+
+    assert answer == "answer 1"
+    assert time.perf_counter() - started < 1.0
+    assert bot.metrics.totals()["hedged"] == 1
+
+
+def test_hedges_stop_when_the_budget_is_spent():
+    client = FakeClient(0.3)
+    bot = summarizer(client, trained_policy(budget_ratio=0.5))
+
+    answers = [bot.model_response(f"prompt {i}", 100, 0.0) for i in range(4)]
+
+    # Each request earns half a hedge, so only every other one is hedged
+    assert len(answers) == 4
+    assert bot.metrics.totals()["hedged"] == 2
+    assert client.calls == 6
+
+
+def test_time_queued_for_a_request_slot_does_not_trigger_a_hedge():
+    client = FakeClient(0.0)
+    slots = threading.Semaphore(1)
+    bot = summarizer(client, trained_policy(budget_ratio=1.0), request_slots=slots)
+
+    slots.acquire()  # Another request holds the only slot for a while
+    threading.Timer(0.5, slots.release).start()
+    answer = bot.model_response("prompt", 100, 0.0)
+
+    assert answer == "answer 0"
+    assert client.calls == 1
+    assert bot.metrics.totals()["hedged"] == 0
@@ -0,0 +1,133 @@
+"""Tests for background jobs and cancelling the ones nobody wants."""
+
+import threading
+import time
+
+from benchmarks.fixtures import synthetic_book
+from src.BookSummarizer import BookSummarizer
+from src.jobs import JobManager, JobStatus
+from src.metrics import Metrics
+from src.prompt import GENZ_PROMPT
+from src.singleflight import SingleFlight
+from tests.fakes import FakeClient
+
+
+def wait_until_finished(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def test_resubmitting_a_job_that_was_told_to_stop_restarts_it():
+    manager = JobManager()
+    started = threading.Event()
+    release_task = threading.Event()
+
+    def slow_to_notice(job):
+        started.set()
+        release_task.wait()  # Doesn't look at the token until it's done
+        job.cancellation.raise_if_cancelled()
+
+    first = manager.submit("job", slow_to_notice, "tab 1")
+    started.wait()
+    manager.release("job", "tab 1")
+    assert first.status == JobStatus.RUNNING and first.cancellation.cancelled
+
+    second = manager.submit("job", lambda job: None, "tab 1")
+    release_task.set()
+
+    assert second is not first
+    assert wait_until_finished(second) == JobStatus.DONE
+    assert wait_until_finished(first) == JobStatus.CANCELLED
+    assert manager.get("job") is second
+
+
+def test_two_watchers_share_one_job():
+    manager = JobManager()
+    runs = []
+
+    def task(job):
+        runs.append(job)
+        job.cancellation.sleep(5)
+
+    first = manager.submit("job", task, "tab 1")
+    second = manager.submit("job", task, "tab 2")
+    assert second is first
+
+    manager.release("job", "tab 1")
+    assert not first.cancellation.cancelled  # Tab 2 still wants it
+
+    manager.release("job", "tab 2")
+    assert wait_until_finished(first) == JobStatus.CANCELLED
+    assert first.cancellation.reason == "superseded"
+    assert len(runs) == 1
+
+
+def test_resubmitting_a_failed_job_restarts_it():
+    manager = JobManager()
+    attempts = []
+
+    def flaky(job):
+        attempts.append(job)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        job.details["result"] = "ok"
+
+    first = manager.submit("job", flaky)
+    assert wait_until_finished(first) == JobStatus.FAILED
+    assert str(first.error) == "boom"
+
+    second = manager.submit("job", flaky)
+
+    assert second is not first
+    assert wait_until_finished(second) == JobStatus.DONE
+    assert second.details["result"] == "ok"
+    assert manager.submit("job", flaky) is second  # Done jobs are attached to
+
+
+def test_job_no_watcher_checks_on_is_cancelled_as_abandoned():
+    manager = JobManager(abandon_seconds=0.1)
+    watched = manager.submit("watched", lambda job: job.cancellation.sleep(5), "tab 1")
+    abandoned = manager.submit("gone", lambda job: job.cancellation.sleep(5), "tab 2")
+    unwatched = manager.submit("headless", lambda job: job.cancellation.sleep(0.3))
+
+    time.sleep(0.2)
+    manager.watch("watched", "tab 1")
+
+    assert manager.cancel_abandoned() == 1
+    assert wait_until_finished(abandoned) == JobStatus.CANCELLED
+    assert abandoned.cancellation.reason == "abandoned"
+    assert not watched.cancellation.cancelled
+    assert wait_until_finished(unwatched) == JobStatus.DONE
+    manager.release("watched", "tab 1")
+
+
+def test_released_job_stops_issuing_requests():
+    manager = JobManager()
+    client = FakeClient(0.05)
+    bot = BookSummarizer(
+        "test",
+        max_concurrency=2,
+        client=client,
+        metrics=Metrics(),
+        single_flight=SingleFlight(),
+    )
+    bot.max_chunk_tokens = 100  # Dozens of chunks
+    bot.overlap_tokens = 0
+    book = synthetic_book(5000)
+
+    def analyze(job):
+        bot.cancellation = job.cancellation
+        job.deltas.extend(bot.process_book(book, GENZ_PROMPT, stream=True))
+
+    job = manager.submit("job", analyze, "tab 1")
+    while client.calls < 4:
+        time.sleep(0.01)
+    manager.release("job", "tab 1")
+
+    assert wait_until_finished(job) == JobStatus.CANCELLED
+    calls = client.calls
+    time.sleep(0.3)
+    assert client.calls == calls  # Requests already running may finish, no more
+    assert calls < len(bot.create_chunks(book))
@@ -0,0 +1,33 @@
+"""Tests for the app's analysis tasks, run outside Streamlit."""
+
+from types import SimpleNamespace
+
+import main
+from src import extract
+from src.BookSummarizer import BookSummarizer
+from src.cache import MemoryCache
+from src.jobs import Job
+from src.metrics import Metrics
+from src.singleflight import SingleFlight
+from tests.fakes import FakeClient
+
+
+def upload(name, data):
+    return SimpleNamespace(name=name, size=len(data), getvalue=lambda: data)
+
+
+def test_upload_stats_do_not_depend_on_the_extraction_cache(monkeypatch):
+    # Too small to hold the book, as for uploads bigger than the cache
+    monkeypatch.setattr(extract, "_extraction_cache", MemoryCache(10))
+    book = "The mill stood by the river. The river ran past the mill.\n" * 50
+    bot = BookSummarizer(
+        "test", client=FakeClient(), metrics=Metrics(), single_flight=SingleFlight()
+    )
+    job = Job("job")
+
+    main.run_upload_analysis(job, bot, upload("book.txt", book.encode("utf-8")))
+
+    word_count, common_words = job.details["stats"]
+    assert word_count == 600
+    assert "mill" in common_words
+    assert job.summary == "answer 0"
@@ -0,0 +1,123 @@
+"""Tests for request retries, on a fake clock."""
+
+import httpx
+import openai
+import pytest
+
+from src import scheduler
+from src.scheduler import RateLimitedError, RequestError, RequestScheduler
+
+
+class FakeClock:
+    """Stands in for the `time` module; sleeping just moves the clock on."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    monkeypatch.setattr(scheduler.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def api_error(error_type, status, headers=None, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers, request=request)
+    body = {"code": code} if code else None
+    return error_type("failed", response=response, body=body)
+
+
+class FakeSender:
+    """Fails with the given errors in turn, then answers."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_rate_limited_request_is_retried_with_backoff(clock):
+    rate_limited = api_error(openai.RateLimitError, 429)
+    send = FakeSender(rate_limited, rate_limited)
+
+    assert RequestScheduler().call(send, 100) == "ok"
+
+    assert send.calls == 3
+    assert clock.sleeps == [1.0, 2.0]  # Doubling, jitter at its upper bound
+
+
+def test_server_can_say_when_to_retry(clock):
+    send = FakeSender(
+        api_error(openai.RateLimitError, 429, {"retry-after": "7"}),
+        api_error(openai.InternalServerError, 503, {"retry-after-ms": "1500"}),
+    )
+
+    assert RequestScheduler().call(send, 100) == "ok"
+
+    assert clock.sleeps == [7.0, 1.5]
+
+
+def test_rate_limit_surfaces_once_the_retry_budget_is_spent(clock, monkeypatch):
+    monkeypatch.setattr(scheduler, "MIN_RETRY_BUDGET", 2.0)
+    requests = RequestScheduler(max_attempts=10, retry_budget_ratio=0.0)
+    send = FakeSender(*[api_error(openai.RateLimitError, 429)] * 10)
+
+    with pytest.raises(RateLimitedError) as raised:
+        requests.call(send, 100)
+
+    assert send.calls == 3  # The first try and the two retries in the budget
+    assert raised.value.attempts == 3
+    assert raised.value.retryable
+
+
+def test_retries_stop_after_the_last_attempt(clock):
+    send = FakeSender(*[api_error(openai.InternalServerError, 500)] * 10)
+
+    with pytest.raises(RequestError) as raised:
+        RequestScheduler(max_attempts=3).call(send, 100)
+
+    assert not isinstance(raised.value, RateLimitedError)
+    assert send.calls == 3 and raised.value.attempts == 3
+
+
+@pytest.mark.parametrize(
+    "error, error_type",
+    [
+        (api_error(openai.BadRequestError, 400), RequestError),
+        (api_error(openai.AuthenticationError, 401), RequestError),
+        (
+            api_error(openai.RateLimitError, 429, code="insufficient_quota"),
+            RateLimitedError,
+        ),
+    ],
+)
+def test_errors_that_wont_clear_up_are_not_retried(clock, error, error_type):
+    send = FakeSender(error)
+
+    with pytest.raises(error_type) as raised:
+        RequestScheduler().call(send, 100)
+
+    assert type(raised.value) is error_type
+    assert send.calls == 1
+    assert raised.value.attempts == 1
+    assert not raised.value.retryable
+    assert clock.sleeps == []
@@ -0,0 +1,94 @@
+"""Tests for coalescing identical calls, within and across processes."""
+
+import fcntl
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+from src import singleflight
+from src.cancellation import AnalysisCancelled, CancellationToken
+from src.singleflight import SingleFlight
+
+
+def cancel_soon(token, seconds=0.2):
+    threading.Timer(seconds, token.cancel).start()
+
+
+def test_concurrent_identical_calls_are_coalesced():
+    group = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        release.wait()
+        return "summary"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(group.do("key", work)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("summary", False)] + [("summary", True)] * 4
+
+
+def test_waiting_caller_stops_when_cancelled():
+    group = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=("key", release.wait))
+    leader.start()
+    time.sleep(0.1)
+    token = CancellationToken()
+    cancel_soon(token)
+
+    started = time.monotonic()
+    with pytest.raises(AnalysisCancelled):
+        group.do("key", lambda: "mine", token)
+
+    assert time.monotonic() - started < 1.0
+    release.set()
+    leader.join()
+
+
+@pytest.fixture
+def held_lock(tmp_path):
+    """The lock file of "key", held as if by another process."""
+    name = hashlib.sha256(b"key").hexdigest() + ".lock"
+    fd = os.open(tmp_path / name, os.O_RDWR | os.O_CREAT, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    yield tmp_path
+    os.close(fd)
+
+
+def test_waiting_for_another_process_can_be_cancelled(held_lock):
+    group = SingleFlight(str(held_lock))
+    token = CancellationToken()
+    cancel_soon(token)
+
+    with pytest.raises(AnalysisCancelled):
+        group.do("key", lambda: "mine", token)
+
+
+def test_lock_held_too_long_by_another_process_is_skipped(held_lock, monkeypatch):
+    monkeypatch.setattr(singleflight, "MAX_WAIT_SECONDS", 0.3)
+    group = SingleFlight(str(held_lock))
+
+    assert group.do("key", lambda: "mine") == ("mine", False)
+
+
+def test_lock_file_is_removed_after_the_call(tmp_path):
+    group = SingleFlight(str(tmp_path))
+
+    assert group.do("key", lambda: "mine") == ("mine", False)
+    assert os.listdir(tmp_path) == []
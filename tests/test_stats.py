@@ -0,0 +1,14 @@
+"""Tests for the cached text statistics."""
+
+from src import stats
+
+
+def test_profiles_are_cached_by_content_without_the_text():
+    text = "The mill and the river. The mill again."
+
+    profile = stats.get_text_profile(text)
+
+    assert stats.get_text_profile("".join(list(text))) is profile
+    assert profile.word_count == 8
+    assert profile.top_words[0] == ("mill", 2)
+    assert text not in vars(profile).values()
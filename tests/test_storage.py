@@ -0,0 +1,128 @@
+"""Tests for the SQLite and Redis result stores, including their failure modes."""
+
+import sqlite3
+
+import pytest
+
+from benchmarks.mock_redis import MockRedisServer
+from src import storage
+from src.storage import SQLiteStorage, open_storage
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SQLiteStorage(str(tmp_path / "cache.sqlite3"), max_bytes=1000)
+    yield store
+    store.close()
+
+
+def stored_size(store):
+    return store._conn.execute("SELECT total FROM summaries_size").fetchone()[0]
+
+
+def test_sqlite_get_and_set(sqlite_store):
+    assert sqlite_store.get("missing") is None
+
+    sqlite_store.set("key", "value")
+    sqlite_store.set("key", "replaced")
+
+    assert sqlite_store.get("key") == "replaced"
+    assert stored_size(sqlite_store) == len("replaced")
+
+
+def test_sqlite_evicts_least_recently_used_entries_in_a_batch(sqlite_store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(storage.time, "time", lambda: now[0])
+    for i in range(10):
+        sqlite_store.set(f"key {i}", "x" * 100)
+        now[0] += 100  # Older than the access time resolution
+    sqlite_store.get("key 0")  # Now the most recently used
+
+    sqlite_store.set("new", "y" * 100)
+
+    # Evicted down to 90% of the budget, oldest first, not just to fit
+    assert sqlite_store.get("key 0") == "x" * 100
+    assert sqlite_store.get("key 1") is None
+    assert sqlite_store.get("key 2") is None
+    assert sqlite_store.get("key 3") == "x" * 100
+    assert stored_size(sqlite_store) == 900
+
+
+def test_sqlite_hits_within_the_resolution_dont_write(sqlite_store):
+    sqlite_store.set("key", "value")
+    changes = sqlite_store._conn.total_changes
+
+    for _ in range(5):
+        assert sqlite_store.get("key") == "value"
+
+    assert sqlite_store._conn.total_changes == changes
+
+
+def test_sqlite_errors_are_misses(sqlite_store, caplog):
+    sqlite_store.set("key", "value")
+    sqlite_store._conn.execute("DROP TABLE summaries")
+
+    assert sqlite_store.get("key") is None
+    sqlite_store.set("key", "value")  # Doesn't raise
+
+    assert "Couldn't read from" in caplog.text
+    assert "Couldn't write to" in caplog.text
+
+
+def test_sqlite_size_total_is_built_for_an_existing_database(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE summaries (key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO summaries VALUES ('old', 'abc', 3, 0)")
+    conn.close()
+
+    store = SQLiteStorage(path, max_bytes=1000)
+    store.set("new", "defg")
+
+    assert stored_size(store) == 7
+    store.close()
+
+
+@pytest.fixture
+def redis_server():
+    with MockRedisServer() as server:
+        yield server
+
+
+def test_redis_get_and_set(redis_server):
+    store = open_storage(redis_server.url)
+
+    assert store.get("missing") is None
+    store.set("key", "value")
+
+    assert store.get("key") == "value"
+    assert redis_server.keys() == [storage.REDIS_KEY_PREFIX + "key"]
+    store.close()
+
+
+def test_redis_error_replies_keep_the_connection(caplog):
+    with MockRedisServer(password="secret") as server:
+        store = open_storage(server.url.replace(":secret@", ""))  # No password
+
+        for _ in range(5):
+            assert store.get("key") is None  # NOAUTH
+            store.set("key", "value")
+
+        assert server.connection_count == 1
+        assert "NOAUTH" in caplog.text
+        store.close()
+
+
+def test_redis_server_that_is_down_is_a_miss(caplog):
+    with MockRedisServer() as server:
+        url = server.url
+    store = open_storage(url)  # Nothing is listening there any more
+
+    assert store.get("key") is None
+    store.set("key", "value")  # Doesn't raise
+
+    assert "Couldn't read from Redis" in caplog.text
+    store.close()
@@ -0,0 +1,85 @@
+"""Tests for the map and reduce stages, with a stub in place of the model."""
+
+import re
+import threading
+import time
+
+from src.BookSummarizer import BookSummarizer
+from src.metrics import Metrics
+from src.singleflight import SingleFlight
+
+
+class StubModel:
+    """
+    Answers prompts by what they ask for, tracking requests in flight.
+
+    Chunk "text N" is summarized as "sN", later chunks answering sooner, and a
+    batch of summaries is combined as "(s1+s2+...)".
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, max_tokens, temperature):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.prompts.append(prompt)
+        try:
+            chunk = re.search(r"text (\d+)", prompt)
+            if chunk:
+                time.sleep(0.05 / int(chunk.group(1)))
+                return "s" + chunk.group(1)
+            time.sleep(0.01)
+            summaries = re.findall(r"Section \d+: (\S+)", prompt)
+            return "(" + "+".join(summaries) + ")"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def summarizer(max_concurrency):
+    bot = BookSummarizer(
+        "test",
+        max_concurrency=max_concurrency,
+        client=object(),
+        metrics=Metrics(),
+        single_flight=SingleFlight(),
+    )
+    bot.model_response = StubModel()
+    return bot
+
+
+def test_chunk_summaries_keep_book_order_with_bounded_concurrency():
+    bot = summarizer(max_concurrency=4)
+    chunks = (f"text {n}" for n in range(1, 41))
+    progress = []
+
+    summaries = bot.summarize_chunks(chunks, lambda *update: progress.append(update))
+
+    # Later chunks answer first, yet come back in book order
+    assert summaries == [f"s{n}" for n in range(1, 41)]
+    assert bot.model_response.max_in_flight == 4
+    assert progress[-1] == (40, 40, True)
+    last_chunk_prompt = bot.model_response.prompts[-1]
+    assert "text 40" in last_chunk_prompt and "end of the book" in last_chunk_prompt
+
+
+def test_tree_reduce_combines_every_group_into_one_master_summary():
+    bot = summarizer(max_concurrency=4)
+    bot.reduce_fan_in = 4
+    summaries = [f"s{n}" for n in range(1, 51)]
+    levels = []
+
+    master = bot.create_master_summary(summaries, lambda *update: levels.append(update))
+
+    # 50 summaries -> 13 batches -> 4 batches -> the master summary
+    assert bot.model_response.max_in_flight <= 4
+    assert len(bot.model_response.prompts) == 13 + 4 + 1
+    assert re.findall(r"s\d+", master) == summaries
+    assert master.count("(") == 13 + 4 + 1
+    assert levels[-1] == (3, 1, 1)
+    assert bot.reduce_levels(50) == 3